@@ -0,0 +1,161 @@
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from emulator import ShellEmulator
+
+"""
+python batch.py start.sh
+python batch.py < start.sh
+python batch.py scripts/*.sh --jobs 8 --bench
+"""
+
+
+def read_script(lines):
+    """Возвращает команды скрипта, пропуская пустые строки и комментарии"""
+    commands = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            commands.append(line)
+    return commands
+
+
+def load_script(path):
+    """Читает команды из файла скрипта"""
+    with open(path, "r", encoding="utf-8") as file:
+        return read_script(file)
+
+
+def run_script(emulator, commands, timings=None, output=None):
+    """
+    Выполняет команды без графического интерфейса.
+
+    Время выполнения каждой команды (в секундах) добавляется в словарь timings
+    по имени команды; вывод пишется в output, если он задан.
+    Возвращает число выполненных команд; команда exit останавливает скрипт.
+    """
+    executed = 0
+    for command in commands:
+        started = time.perf_counter()
+        try:
+            if output is not None:
+                output.write(f"$ {command}\n")
+            for chunk in emulator.stream_command(command):
+                if output is not None:
+                    output.write(chunk)
+            if output is not None:
+                output.write("\n")
+        except SystemExit:
+            return executed + 1
+        finally:
+            if timings is not None:
+                timings.setdefault(command.split()[0], []).append(time.perf_counter() - started)
+        executed += 1
+    return executed
+
+
+def run_script_file(task):
+    """
+    Выполняет один скрипт в собственном экземпляре эмулятора (функция для пула процессов).
+
+    Возвращает имя скрипта, число команд и задержки по типам команд.
+    """
+    script_path, vfs_path, log_dir, use_index = task
+    if log_dir:
+        log_path = os.path.join(log_dir, os.path.basename(script_path) + ".jsonl")
+    else:
+        log_path = os.devnull
+    emulator = ShellEmulator(vfs_path, log_path, log_format="jsonl", use_index=use_index)
+    timings = {}
+    try:
+        executed = run_script(emulator, load_script(script_path), timings)
+    finally:
+        emulator.close()
+    return script_path, executed, timings
+
+
+def percentile(values, fraction):
+    """Перцентиль по методу ближайшего ранга для отсортированного списка"""
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+def format_report(timings, total_commands, elapsed):
+    """Формирует отчёт: общая пропускная способность и p50/p99 по типам команд"""
+    lines = [f"Команд: {total_commands}, время: {elapsed:.3f} с, команд/с: {total_commands / elapsed if elapsed else 0:.1f}"]
+    lines.append(f"{'команда':<10}{'число':>10}{'p50, мс':>12}{'p99, мс':>12}")
+    for cmd in sorted(timings):
+        values = sorted(timings[cmd])
+        lines.append(
+            f"{cmd:<10}{len(values):>10}{percentile(values, 0.5) * 1000:>12.3f}{percentile(values, 0.99) * 1000:>12.3f}"
+        )
+    return "\n".join(lines)
+
+
+def run_parallel(scripts, vfs_path, jobs, log_dir=None, use_index=False):
+    """
+    Выполняет скрипты в пуле процессов, у каждого скрипта свой эмулятор.
+
+    Возвращает объединённые задержки по типам команд, общее число команд и время.
+    """
+    tasks = [(script, vfs_path, log_dir, use_index) for script in scripts]
+    timings = {}
+    total_commands = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for _, executed, script_timings in pool.map(run_script_file, tasks):
+            total_commands += executed
+            for cmd, values in script_timings.items():
+                timings.setdefault(cmd, []).extend(values)
+    return timings, total_commands, time.perf_counter() - started
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Выполнение скриптов эмулятора оболочки без графического интерфейса")
+    parser.add_argument("scripts", nargs="*", help="Файлы скриптов; без них команды читаются из stdin")
+    parser.add_argument("--vfs", default="vfs.tar", help="Архив виртуальной файловой системы")
+    parser.add_argument("--log", default=None, help="Лог-файл при выполнении одного скрипта или stdin")
+    parser.add_argument("--log-dir", default=None, help="Каталог логов при параллельном выполнении")
+    parser.add_argument("--index", action="store_true", help="Загружать ФС через файл-индекс рядом с архивом")
+    parser.add_argument("--jobs", type=int, default=1, help="Число процессов для параллельного выполнения")
+    parser.add_argument("--bench", action="store_true", help="Не печатать вывод команд, вывести отчёт о производительности")
+    args = parser.parse_args(argv)
+    if args.jobs > 1 and not args.scripts:
+        # Команды из stdin — один скрипт, распараллеливать нечего
+        parser.error("--jobs больше 1 требует файлов скриптов; команды из stdin выполняются одним скриптом")
+    return args
+
+
+def main():
+    args = parse_args()
+
+    if args.jobs > 1 or (args.bench and len(args.scripts) > 1):
+        timings, total_commands, elapsed = run_parallel(args.scripts, args.vfs, args.jobs, args.log_dir, args.index)
+        print(format_report(timings, total_commands, elapsed))
+        return
+
+    commands = []
+    if args.scripts:
+        for script in args.scripts:
+            commands.extend(load_script(script))
+    else:
+        commands = read_script(sys.stdin)
+
+    # Без явного лога записи отбрасываются; формат JSON Lines позволяет писать в os.devnull
+    log_format = None if args.log else "jsonl"
+    emulator = ShellEmulator(args.vfs, args.log or os.devnull, log_format=log_format, use_index=args.index)
+    timings = {}
+    started = time.perf_counter()
+    try:
+        executed = run_script(emulator, commands, timings, None if args.bench else sys.stdout)
+    finally:
+        emulator.close()
+    if args.bench:
+        print(format_report(timings, executed, time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+from command_log import open_log, JSON_FORMAT, JSONL_FORMAT
+
+"""
+python bench_log.py
+python bench_log.py --commands 20000 --window 2000 --formats jsonl
+"""
+
+
+def make_entry(i):
+    """Запись лога, похожая на реальную запись эмулятора"""
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "command": "ls",
+        "output": f"file_{i}.txt\nsubdir/",
+        "current_directory": "/",
+    }
+
+
+def run(log_format, commands, window):
+    """
+    Записывает commands записей и возвращает среднюю стоимость одной записи
+    (в микросекундах) для каждого окна из window команд.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log = open_log(os.path.join(tmp_dir, f"bench.{log_format}"), log_format)
+        costs = []
+        start = time.perf_counter()
+        for i in range(1, commands + 1):
+            log.append(make_entry(i))
+            if i % window == 0:
+                now = time.perf_counter()
+                costs.append((now - start) / window * 1e6)
+                start = now
+        log.close()
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк стоимости записи в лог по мере роста сессии")
+    parser.add_argument("--commands", type=int, default=2000, help="Число команд в сессии")
+    parser.add_argument("--window", type=int, default=250, help="Размер окна усреднения")
+    parser.add_argument("--formats", nargs="+", default=[JSON_FORMAT, JSONL_FORMAT], choices=[JSON_FORMAT, JSONL_FORMAT])
+    args = parser.parse_args()
+
+    results = {log_format: run(log_format, args.commands, args.window) for log_format in args.formats}
+
+    print(f"{'команды':>10}" + "".join(f"{log_format + ', мкс':>16}" for log_format in args.formats))
+    for row in range(args.commands // args.window):
+        line = f"{(row + 1) * args.window:>10}"
+        line += "".join(f"{results[log_format][row]:>16.1f}" for log_format in args.formats)
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import json
+import socket
+import sys
+
+"""
+python client.py --unix /tmp/emulator.sock
+echo ls | python client.py --port 8023
+"""
+
+
+class EmulatorClient:
+    """Клиент сервера эмулятора (server.py): отправляет команды и собирает вывод"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.file = sock.makefile("rwb")
+        hello = self.receive()
+        self.session = hello["session"]
+        self.cwd = hello["cwd"]
+        self.closed = False
+
+    @classmethod
+    def connect(cls, unix_path=None, host="127.0.0.1", port=8023):
+        if unix_path:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(unix_path)
+        else:
+            sock = socket.create_connection((host, port))
+        return cls(sock)
+
+    def receive(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("Сервер закрыл соединение")
+        return json.loads(line)
+
+    def stream(self, command):
+        """Отправляет команду и отдаёт порции вывода по мере их получения"""
+        self.file.write(command.encode("utf-8") + b"\n")
+        self.file.flush()
+        while True:
+            message = self.receive()
+            if "chunk" in message:
+                yield message["chunk"]
+            elif message.get("exit"):
+                self.closed = True
+                return
+            elif message.get("done"):
+                self.cwd = message["cwd"]
+                return
+
+    def execute(self, command):
+        """Выполняет команду и возвращает весь её вывод"""
+        return "".join(self.stream(command))
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Клиент сервера эмулятора оболочки")
+    parser.add_argument("--unix", default=None, help="Путь к Unix-сокету")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес TCP-сервера")
+    parser.add_argument("--port", type=int, default=8023, help="Порт TCP-сервера")
+    args = parser.parse_args()
+
+    client = EmulatorClient.connect(args.unix, args.host, args.port)
+    interactive = sys.stdin.isatty()
+    try:
+        while not client.closed:
+            if interactive:
+                print(f"{client.cwd}$ ", end="", flush=True)
+            line = sys.stdin.readline()
+            if not line:
+                break
+            for chunk in client.stream(line.strip()):
+                sys.stdout.write(chunk)
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+
+# Форматы лог-файла
+JSON_FORMAT = "json"
+JSONL_FORMAT = "jsonl"
+
+
+class JsonArrayLog:
+    """Лог в виде JSON-массива: файл перечитывается и перезаписывается на каждую запись"""
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(self.path):
+            with open(self.path, "w") as file:
+                json.dump([], file)
+
+    def append(self, entry):
+        """Добавляет запись в конец массива"""
+        with open(self.path, "r+") as file:
+            logs = json.load(file)
+            logs.append(entry)
+            file.seek(0)
+            json.dump(logs, file, indent=4)
+
+    def flush(self):
+        """Записи сохраняются сразу, буфера нет"""
+
+    def close(self):
+        """Закрывать нечего: файл открывается на каждую запись"""
+
+
+class JsonLinesLog:
+    """
+    Лог в формате JSON Lines: одна запись на строку, файл только дописывается.
+
+    Записи копятся в буфере и сбрасываются на диск, когда их набирается
+    buffer_size, когда с момента первой несохранённой записи прошло
+    flush_interval секунд, либо явно через flush()/close().
+    """
+
+    def __init__(self, path, buffer_size=100, flush_interval=1.0):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def append(self, entry):
+        """Добавляет запись в буфер"""
+        line = json.dumps(entry, ensure_ascii=False)
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.buffer_size:
+                self._flush_locked()
+            elif self.timer is None and self.flush_interval is not None:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """Дописывает накопленные записи в файл"""
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.buffer:
+            return
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("\n".join(self.buffer) + "\n")
+        self.buffer.clear()
+
+    def close(self):
+        """Сбрасывает буфер перед завершением работы"""
+        self.flush()
+
+
+def detect_format(path):
+    """Определяет формат лога по расширению файла"""
+    return JSONL_FORMAT if path.endswith(".jsonl") else JSON_FORMAT
+
+
+def open_log(path, log_format=None, **options):
+    """Создаёт объект лога нужного формата"""
+    log_format = log_format or detect_format(path)
+    if log_format == JSONL_FORMAT:
+        return JsonLinesLog(path, **options)
+    if log_format == JSON_FORMAT:
+        return JsonArrayLog(path)
+    raise ValueError(f"Неизвестный формат лога: {log_format}")
+
+
+def read_log(path):
+    """
+    Читает записи лога в любом из форматов.
+
+    Формат определяется по содержимому: JSON-массив начинается с '[',
+    иначе файл читается построчно как JSON Lines.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        head = file.read(1)
+        while head and head.isspace():
+            head = file.read(1)
+        if not head:
+            return
+        file.seek(0)
+        if head == "[":
+            yield from json.load(file)
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def convert_log(source, destination, log_format=None):
+    """
+    Переписывает лог из любого формата в указанный (по умолчанию — по расширению назначения).
+
+    Результат пишется во временный файл и подменяет назначение целиком, поэтому
+    назначение может совпадать с источником, а при ошибке остаётся прежним.
+    """
+    log_format = log_format or detect_format(destination)
+    if log_format not in (JSON_FORMAT, JSONL_FORMAT):
+        raise ValueError(f"Неизвестный формат лога: {log_format}")
+    entries = read_log(source)
+    tmp_path = destination + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            if log_format == JSONL_FORMAT:
+                for entry in entries:
+                    file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            else:
+                json.dump(list(entries), file, indent=4)
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Конвертация лога эмулятора между форматами JSON и JSON Lines")
+    parser.add_argument("source", help="Исходный лог-файл")
+    parser.add_argument("destination", help="Файл назначения")
+    parser.add_argument("--format", choices=[JSON_FORMAT, JSONL_FORMAT], help="Формат назначения")
+    args = parser.parse_args()
+    convert_log(args.source, args.destination, args.format)
@@ -0,0 +1,98 @@
+import queue
+import threading
+from emulator import CommandCancelled
+
+# Типы сообщений, которые рабочий поток кладёт в очередь вывода
+COMMAND = "command"      # Команда начала выполняться
+OUTPUT = "output"        # Очередная порция вывода
+DONE = "done"            # Команда завершилась
+CANCELLED = "cancelled"  # Команда прервана пользователем
+ERROR = "error"          # Команда завершилась исключением
+EXIT = "exit"            # Эмулятор завершил работу (команда exit)
+
+
+class CommandWorker:
+    """
+    Выполняет команды эмулятора в отдельном потоке.
+
+    Команды обрабатываются строго по очереди, поэтому эмулятор используется
+    только из одного потока. Вывод передаётся порциями через очередь output
+    в виде пар (тип сообщения, данные); интерфейс забирает их сам, не блокируясь.
+
+    У каждой команды свой признак отмены: cancel() выставляет признак только
+    выполняющейся команды, поэтому отмена не переходит на следующую и не
+    теряется при её запуске. Признак проверяется между порциями вывода и внутри
+    долгих обходов эмулятора (ls, chown -R, find, du, tree).
+    """
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+        self.commands = queue.Queue()
+        self.output = queue.Queue()
+        self.current = None  # Признак отмены выполняющейся команды
+        self.closing = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, command):
+        """Ставит команду в очередь на выполнение"""
+        self.commands.put(command)
+
+    def cancel(self):
+        """Прерывает выполняющуюся команду"""
+        token = self.current
+        if token is not None:
+            token.set()
+
+    def stop(self):
+        """Останавливает поток после выполнения уже поставленных команд"""
+        self.commands.put(None)
+
+    def shutdown(self, timeout=None):
+        """
+        Отбрасывает ещё не начатые команды, прерывает текущую и ждёт завершения
+        потока не дольше timeout секунд. Возвращает True, если поток завершился:
+        только после этого эмулятор можно закрывать.
+        """
+        self.closing.set()
+        while True:
+            try:
+                self.commands.get_nowait()
+            except queue.Empty:
+                break
+        self.cancel()
+        self.stop()
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
+
+    def run(self):
+        while True:
+            command = self.commands.get()
+            if command is None:
+                return
+            token = threading.Event()
+            self.current = token
+            # shutdown мог начаться до того, как признак команды стал виден через current
+            if self.closing.is_set():
+                token.set()
+            self.emulator.cancel_token = token
+            self.output.put((COMMAND, command))
+
+            try:
+                chunks = self.emulator.stream_command(command)
+                for chunk in chunks:
+                    if token.is_set():
+                        chunks.close()
+                        raise CommandCancelled()
+                    self.output.put((OUTPUT, chunk))
+                self.output.put((DONE, command))
+            except CommandCancelled:
+                self.output.put((CANCELLED, command))
+            except SystemExit:
+                self.output.put((EXIT, command))
+                return
+            except Exception as e:
+                self.output.put((ERROR, str(e)))
+            finally:
+                self.emulator.cancel_token = None
+                self.current = None
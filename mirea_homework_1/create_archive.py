@@ -1,20 +1,229 @@
-import tarfile
+import argparse
+import bz2
+import gzip
+import io
+import lzma
 import os
+import stat
+import tarfile
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from vfs_index import VFSIndex, DIR, FILE, index_path
+
+try:
+    import zstandard  # Необязательная зависимость: сжатие zstd
+except ImportError:
+    zstandard = None
+
+"""
+python create_archive.py
+python create_archive.py test_vfs vfs.tar
+python create_archive.py big_vfs vfs.tar.gz --jobs 8 --level 6
+python create_archive.py big_vfs vfs.tar.zst  # нужен пакет zstandard
+"""
+
+# Сжатие по расширению архива (как при commit в overlay.py) и zstd
+COMPRESSIONS = {".gz": "gz", ".tgz": "gz", ".bz2": "bz2", ".xz": "xz", ".zst": "zst"}
+
+# Уровни сжатия по умолчанию: как у консольных gzip и zstd, для bz2 и xz — как в стандартной библиотеке
+DEFAULT_LEVELS = {"gz": 6, "bz2": 9, "xz": 6, "zst": 3}
+
+# Сколько байт содержимого файлов может быть прочитано заранее; файлы крупнее
+# не читаются в память, а копируются в архив потоком
+DEFAULT_BUFFER_SIZE = 64 * 1024 * 1024
+
+# Нормализованные права записей
+DIR_MODE = 0o755
+FILE_MODE = 0o644
+EXEC_MODE = 0o755
+
+# Запись исходного каталога: имя в архиве, путь на диске, тип, размер и права
+SourceEntry = namedtuple("SourceEntry", ["name", "path", "type", "size", "mode"])
+
+
+def scan_tree(source_dir):
+    """
+    Записи каталога в порядке архива: обход в глубину, имена внутри каталога
+    отсортированы, каталог идёт перед своим содержимым.
+
+    Символьные ссылки и специальные файлы пропускаются: в виртуальной
+    файловой системе есть только каталоги и обычные файлы.
+    """
+    stack = [("", iter(_sorted_dir(source_dir)))]
+    while stack:
+        prefix, items = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            continue
+        name = prefix + item.name
+        if item.is_dir(follow_symlinks=False):
+            yield SourceEntry(name, item.path, DIR, 0, DIR_MODE)
+            stack.append((name + "/", iter(_sorted_dir(item.path))))
+        elif item.is_file(follow_symlinks=False):
+            info = item.stat(follow_symlinks=False)
+            mode = EXEC_MODE if info.st_mode & stat.S_IXUSR else FILE_MODE
+            yield SourceEntry(name, item.path, FILE, info.st_size, mode)
+
+
+def _sorted_dir(path):
+    with os.scandir(path) as items:
+        return sorted(items, key=lambda item: item.name)
+
+
+def read_file(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def iter_contents(entries, jobs, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Отдаёт (запись, содержимое) в исходном порядке; содержимое файлов читается
+    заранее пулом потоков. Заранее прочитанные данные занимают не больше
+    buffer_size байт; для каталогов и файлов крупнее буфера содержимое — None.
+    """
+    pending = deque()
+    buffered = 0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for entry in entries:
+            prefetch = entry.type == FILE and entry.size <= buffer_size
+            size = entry.size if prefetch else 0
+            while pending and (buffered + size > buffer_size or len(pending) >= jobs * 4):
+                done, future = pending.popleft()
+                buffered -= done.size if future is not None else 0
+                yield done, future.result() if future is not None else None
+            pending.append((entry, pool.submit(read_file, entry.path) if prefetch else None))
+            buffered += size
+        while pending:
+            done, future = pending.popleft()
+            yield done, future.result() if future is not None else None
+
+
+def compression_of(output_path):
+    """Сжатие по расширению архива или None"""
+    return COMPRESSIONS.get(os.path.splitext(output_path)[1])
+
+
+def open_compressed(stack, file, compression, level, jobs):
+    """
+    Поток сжатия поверх открытого файла. Метаданные сжатия не зависят
+    от времени и имени файла (в заголовке gzip время — 0, имени нет).
+    """
+    if compression is None:
+        return file
+    if level is None:
+        level = DEFAULT_LEVELS[compression]
+    if compression == "gz":
+        return stack.enter_context(gzip.GzipFile(filename="", mode="wb", fileobj=file, compresslevel=level, mtime=0))
+    if compression == "bz2":
+        return stack.enter_context(bz2.BZ2File(file, "wb", compresslevel=level))
+    if compression == "xz":
+        return stack.enter_context(lzma.LZMAFile(file, "wb", preset=level))
+    if compression == "zst":
+        if zstandard is None:
+            raise ValueError("для сжатия zstd нужен пакет zstandard (pip install zstandard)")
+        compressor = zstandard.ZstdCompressor(level=level, threads=jobs)
+        return stack.enter_context(compressor.stream_writer(file, closefd=False))
+    raise ValueError(f"неизвестное сжатие: {compression}")
+
+
+def make_info(entry, size, mtime):
+    """Заголовок записи с нормализованными метаданными: владелец 0, время mtime"""
+    info = tarfile.TarInfo(entry.name)
+    info.mtime = mtime
+    info.mode = entry.mode
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    if entry.type == DIR:
+        info.type = tarfile.DIRTYPE
+    else:
+        info.size = size
+    return info
+
+
+def build_archive(source_dir, output_path, compression=None, level=None, jobs=None, mtime=0,
+                  buffer_size=DEFAULT_BUFFER_SIZE, write_index=True):
+    """
+    Создаёт архив виртуальной файловой системы из каталога source_dir.
+
+    Архив воспроизводим: записи идут в порядке scan_tree, для каждого каталога
+    есть отдельная запись, права, владелец и время нормализованы. Содержимое
+    файлов читается параллельно (iter_contents), архив пишется одним потоком
+    и сжимается на лету. Рядом записывается файл-индекс эмулятора (.idx),
+    поэтому при первом запуске архив не нужно просматривать.
+    Возвращает индекс архива.
+    """
+    if not os.path.isdir(source_dir):
+        raise FileNotFoundError(f"Директория {source_dir} не найдена. Убедитесь, что она существует.")
+    jobs = jobs or os.cpu_count() or 1
+    index = VFSIndex()
+    tmp_path = output_path + ".tmp"
+    try:
+        with ExitStack() as stack:
+            raw = stack.enter_context(open(tmp_path, "wb"))
+            stream = open_compressed(stack, raw, compression, level, jobs)
+            tar = stack.enter_context(tarfile.open(fileobj=stream, mode="w|", format=tarfile.PAX_FORMAT))
+            for entry, data in iter_contents(scan_tree(source_dir), jobs, buffer_size):
+                if entry.type == DIR:
+                    tar.addfile(make_info(entry, 0, mtime))
+                    index.add(entry.name, tar.offset, 0, DIR)
+                    continue
+                if data is not None:
+                    info = make_info(entry, len(data), mtime)
+                    tar.addfile(info, io.BytesIO(data))
+                else:
+                    info = make_info(entry, entry.size, mtime)
+                    with open(entry.path, "rb") as file:
+                        tar.addfile(info, file)
+                # Данные записи заканчиваются на границе блока перед текущим смещением
+                blocks = (info.size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE
+                index.add(entry.name, tar.offset - blocks * tarfile.BLOCKSIZE, info.size, FILE)
+    except BaseException:
+        # Недописанный архив не должен остаться рядом с результатом
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+
+    index.compute_totals()
+    if write_index:
+        index.save(index_path(output_path), os.stat(output_path))
+    return index
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Создание воспроизводимого архива виртуальной файловой системы")
+    parser.add_argument("source", nargs="?", default="test_vfs", help="Каталог с файлами и папками для архивации")
+    parser.add_argument("output", nargs="?", default="vfs_new.tar",
+                        help="Файл архива; сжатие по расширению: .gz, .tgz, .bz2, .xz, .zst")
+    parser.add_argument("--compression", choices=sorted(set(COMPRESSIONS.values())) + ["none"],
+                        help="Сжатие независимо от расширения")
+    parser.add_argument("--level", type=int, default=None, help="Уровень сжатия")
+    parser.add_argument("--jobs", type=int, default=None, help="Число потоков чтения файлов (по умолчанию — число ядер)")
+    parser.add_argument("--mtime", type=int, default=int(os.environ.get("SOURCE_DATE_EPOCH", 0)),
+                        help="Время изменения всех записей (по умолчанию SOURCE_DATE_EPOCH или 0)")
+    parser.add_argument("--buffer", type=int, default=DEFAULT_BUFFER_SIZE // 2**20,
+                        help="Объём заранее читаемых данных, МиБ")
+    parser.add_argument("--no-index", action="store_true", help="Не записывать файл-индекс рядом с архивом")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    compression = compression_of(args.output) if args.compression is None else args.compression
+    try:
+        index = build_archive(args.source, args.output, None if compression == "none" else compression,
+                              args.level, args.jobs, args.mtime, args.buffer * 2**20, not args.no_index)
+    except (FileNotFoundError, ValueError) as error:
+        print(error)
+        return 1
+    size, files, dirs = index.total("")
+    print(f"Создан новый архив: {args.output} (файлов: {files}, каталогов: {dirs}, байт: {size})")
+    if not args.no_index:
+        print(f"Индекс: {index_path(args.output)}")
+    return 0
+
 
-# Путь к директории, содержащей файлы и папки для архивации
-vfs_dir = "test_vfs"
-
-# Проверяем, существует ли директория
-if not os.path.exists(vfs_dir):
-    print(f"Директория {vfs_dir} не найдена. Убедитесь, что она существует.")
-else:
-    # Создаём новый tar-архив
-    with tarfile.open("vfs_new.tar", "w") as new_tar:
-        for root, dirs, files in os.walk(vfs_dir):
-            for name in files:
-                filepath = os.path.join(root, name)
-                # Убираем префикс 'test_vfs' для корректной структуры
-                arcname = os.path.relpath(filepath, start=vfs_dir)
-                new_tar.add(filepath, arcname=arcname)
-
-    print("Создан новый архив: vfs_new.tar")
\ No newline at end of file
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,35 +1,77 @@
 import tarfile
-import os
 import calendar
-import json
+import fnmatch
+import os
+import posixpath
+import shlex
 from datetime import datetime
+from command_log import open_log
+from overlay import OverlayFS, OVERLAY
+from owners import OwnerTable
+from vfs_index import VFSIndex, DIR, FILE, normalize_path
+from vfs_reader import ArchiveReader, is_compressed, iter_text, head_range, tail_range, count
+
+# Команды, читающие содержимое файлов
+CONTENT_COMMANDS = ("cat", "head", "tail", "wc")
+# Команды, вывод которых отдаётся порциями по мере готовности
+STREAM_COMMANDS = CONTENT_COMMANDS + ("find", "du", "tree")
+# Сколько строк вывода рекурсивных команд собирается в одну порцию
+LINES_PER_CHUNK = 1000
+# Сколько символов вывода потоковой команды попадает в лог
+LOG_OUTPUT_LIMIT = 64 * 1024
+
+
+class CommandCancelled(Exception):
+    """Команда прервана пользователем (см. CommandWorker.cancel)"""
 
 
 class ShellEmulator:
-    def __init__(self, vfs_path, log_file="log.json"):
+    def __init__(self, vfs_path, log_file="log.json", log_format=None, use_index=False, owners_file=None,
+                 index=None, reader=None, log_options=None):
         self.vfs_path = vfs_path
+        self.use_index = use_index
         self.log_file = log_file
         self.current_dir = "/"
         self.vfs = None
-        self.files_owners = {}
+        self.index = index
+        self.fs = None
+        # Индекс и отображение архива могут быть общими для нескольких сессий (см. server.py);
+        # тогда сессия их не закрывает
+        self.shared = index is not None
+        # Изменённые владельцы сохраняются при закрытии, только если указан owners_file
+        self.owners = OwnerTable(owners_file)
+        # Признак отмены выполняющейся команды (threading.Event); выставляет CommandWorker
+        self.cancel_token = None
         self.load_vfs()
+        self.reader = reader or ArchiveReader(self.vfs_path)
 
-        # Инициализация лог-файла
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, "w") as file:
-                json.dump([], file)
+        # Инициализация лог-файла (формат по умолчанию определяется по расширению)
+        self.log = open_log(self.log_file, log_format, **(log_options or {}))
 
     def load_vfs(self):
-        """Загружает виртуальную файловую систему из архива tar"""
+        """
+        Загружает виртуальную файловую систему из архива tar.
+
+        В режиме use_index архив не открывается целиком: индекс читается из файла
+        рядом с архивом, а при его отсутствии строится одним потоковым проходом.
+        """
         try:
-            self.vfs = tarfile.open(self.vfs_path, "r")
+            if self.shared:
+                pass
+            elif self.use_index:
+                self.index = VFSIndex.load(self.vfs_path)
+            else:
+                self.vfs = tarfile.open(self.vfs_path, "r")
+                # Индекс каталогов строится один раз, команды работают только с ним
+                self.index = VFSIndex.from_tar(self.vfs)
         except FileNotFoundError:
             raise FileNotFoundError(f"Файл {self.vfs_path} не найден.")
         except tarfile.TarError:
             raise tarfile.TarError(f"Ошибка при чтении архива {self.vfs_path}.")
 
-        for member in self.vfs.getmembers():
-            self.files_owners[member.name] = "default_owner"
+        self.owners.load(self.index)
+        # Все изменения идут в слой поверх архива, сам архив не переписывается
+        self.fs = OverlayFS(self.index)
 
     def log_command(self, command, output):
         """Записывает команду и её результат в лог-файл"""
@@ -39,57 +81,263 @@ class ShellEmulator:
             "output": output,
             "current_directory": self.current_dir,
         }
+        self.log.append(log_entry)
+
+    def close(self):
+        """Сохраняет изменённых владельцев, освобождает архив, отображение в память и сбрасывает лог"""
+        self.owners.save()
+        if not self.shared:
+            self.reader.close()
+        if self.vfs is not None:
+            self.vfs.close()
+        self.log.close()
 
-        with open(self.log_file, "r+") as file:
-            logs = json.load(file)
-            logs.append(log_entry)
-            file.seek(0)
-            json.dump(logs, file, indent=4)
+    def check_cancelled(self):
+        """Прерывает команду исключением CommandCancelled, если её отменили"""
+        if self.cancel_token is not None and self.cancel_token.is_set():
+            raise CommandCancelled()
+
+    def checked(self, items):
+        """Перебирает items, проверяя отмену команды каждые LINES_PER_CHUNK элементов"""
+        for position, item in enumerate(items):
+            if position % LINES_PER_CHUNK == 0:
+                self.check_cancelled()
+            yield item
+
+    def resolve_path(self, path):
+        """Возвращает абсолютный нормализованный путь относительно текущего каталога"""
+        return posixpath.normpath(posixpath.join(self.current_dir, path))
 
     def change_directory(self, new_dir):
         """Меняет текущую рабочую директорию в эмуляторе"""
-        if new_dir == "/":
-            self.current_dir = "/"
-        elif new_dir == "..":
-            if self.current_dir != "/":
-                self.current_dir = os.path.dirname(self.current_dir.rstrip("/"))
-                if not self.current_dir:
-                    self.current_dir = "/"
-            elif self.current_dir == "/":
-                return f"Текущий каталог: {self.current_dir}"
-        elif new_dir.startswith("/"):
-            self.current_dir = new_dir
-        else:
-            self.current_dir = os.path.join(self.current_dir, new_dir)
-
-        if not self.directory_exists(self.current_dir):
-            return f"cd: нет такого каталога: {self.current_dir}"
+        target = self.resolve_path(new_dir)
+        if not self.directory_exists(target):
+            return f"cd: нет такого каталога: {target}"
 
+        self.current_dir = target
         return f"Текущий каталог: {self.current_dir}"
 
     def directory_exists(self, dir_path):
         """Проверяет, существует ли каталог в архиве"""
-        dir_path = dir_path.lstrip("/")
-        for member in self.vfs.getmembers():
-            if member.name.lstrip("/") == dir_path or member.name.lstrip("/").startswith(f"{dir_path}/"):
-                return True
-        return False
+        return self.fs.is_dir(dir_path)
 
     def list_files(self, dir_path="/"):
         """Возвращает список файлов в указанной директории"""
-        files = []
-        for member in self.vfs.getmembers():
-            relative_path = member.name.lstrip("/")
-            if relative_path.startswith(dir_path.lstrip("/")) and not member.isdir():
-                files.append(relative_path[len(dir_path.lstrip("/")):].lstrip("/"))
+        entries = self.fs.list_dir(dir_path)
+        if entries is None:
+            return f"ls: нет такого каталога: {dir_path}"
 
+        files = [posixpath.basename(entry.name) + ("/" if entry.type == DIR else "") for entry in self.checked(entries)]
         return "\n".join(files) if files else "Нет файлов в директории"
 
+    def file_entry(self, cmd, path):
+        """Находит обычный файл для команды чтения; возвращает (запись, ошибка)"""
+        entry = self.fs.get(self.resolve_path(path))
+        if entry is None:
+            return None, f"{cmd}: файл '{path}' не найден"
+        if entry.type == DIR:
+            return None, f"{cmd}: '{path}' является каталогом"
+        return entry, None
+
+    def entry_data(self, entry):
+        """Возвращает (данные, начало, конец) файла: из слоя изменений или из архива"""
+        if entry.offset == OVERLAY:
+            data = self.fs.contents[entry.name]
+            return data, 0, len(data)
+        return self.reader.span(entry)
+
+    def read_content(self, args):
+        """Генератор вывода команд cat/head/tail/wc; данные читаются из архива порциями"""
+        cmd, options = args[0], args[1:]
+        lines = 10
+        counters = ""
+        files = []
+        while options:
+            option = options.pop(0)
+            if cmd in ("head", "tail") and option == "-n" and options and options[0].isdigit():
+                lines = int(options.pop(0))
+            elif cmd in ("head", "tail") and option[:1] == "-" and option[1:].isdigit():
+                lines = int(option[1:])
+            elif cmd == "wc" and option in ("-l", "-w", "-c"):
+                counters += option[1]
+            else:
+                files.append(option)
+
+        if not files:
+            yield f"{cmd}: аргумент отсутствует"
+            return
+
+        # Вывод и ошибки разных файлов не сливаются: каждый файл начинается с новой
+        # строки, а у head и tail перед файлом, как в GNU, стоит заголовок ==> путь <==
+        headers = len(files) > 1 and cmd in ("head", "tail")
+        last = None
+        for path in files:
+            entry, error = self.file_entry(cmd, path)
+            separator = "" if last is None or last.endswith("\n") else "\n"
+            if headers and error is None:
+                separator += ("" if last is None else "\n") + f"==> {path} <==\n"
+            if separator:
+                last = separator
+                yield separator
+            if error:
+                last = error
+                yield error
+                continue
+            try:
+                data, start, end = self.entry_data(entry)
+                if cmd == "cat":
+                    chunks = iter_text(data, start, end)
+                elif cmd == "head":
+                    chunks = iter_text(data, *head_range(data, start, end, lines))
+                elif cmd == "tail":
+                    chunks = iter_text(data, *tail_range(data, start, end, lines))
+                else:
+                    line_count, word_count, byte_count = count(data, start, end)
+                    values = {"l": line_count, "w": word_count, "c": byte_count}
+                    chunks = [" ".join(str(values[key]) for key in counters or "lwc") + f" {path}"]
+                for chunk in chunks:
+                    last = chunk
+                    yield chunk
+            except ValueError as e:
+                yield f"{cmd}: {e}"
+                return
+
+    def find(self, args):
+        """Генератор вывода find [путь] [-name шаблон] [-type f|d]"""
+        path, pattern, entry_type = ".", None, None
+        options = args[1:]
+        while options:
+            option = options.pop(0)
+            if option == "-name" and options:
+                pattern = options.pop(0)
+            elif option == "-type" and options and options[0] in (FILE, DIR):
+                entry_type = options.pop(0)
+            elif option.startswith("-"):
+                yield f"find: неизвестный параметр {option}"
+                return
+            else:
+                path = option
+
+        target = self.resolve_path(path)
+        if not self.fs.exists(target):
+            yield f"find: '{path}' не существует"
+            return
+
+        def matches():
+            for entry in self.checked(self.fs.walk(target)):
+                if entry_type and entry.type != entry_type:
+                    continue
+                if pattern and not fnmatch.fnmatchcase(posixpath.basename(entry.name) or "/", pattern):
+                    continue
+                yield "/" + entry.name
+
+        yield from join_lines(matches())
+
+    def disk_usage(self, args):
+        """
+        Генератор вывода du [-s] [путь]: размер в байтах и путь.
+
+        Итоги каталогов посчитаны при загрузке, поэтому du -s стоит O(1),
+        а du без -s — O(1) на каждый выводимый каталог.
+        """
+        summary = "-s" in args[1:]
+        paths = [arg for arg in args[1:] if arg != "-s"] or ["."]
+
+        def lines():
+            for path in paths:
+                target = self.resolve_path(path)
+                entry = self.fs.get(target)
+                if entry is None:
+                    yield f"du: '{path}' не существует"
+                elif entry.type != DIR:
+                    yield f"{entry.size}\t{target}"
+                elif summary:
+                    yield f"{self.fs.total(entry.name)[0]}\t{target}"
+                else:
+                    for item in self.checked(self.fs.walk(target)):
+                        if item.type == DIR:
+                            yield f"{self.fs.total(item.name)[0]}\t/{item.name}"
+
+        yield from join_lines(lines())
+
+    def tree(self, args):
+        """Генератор вывода tree [путь]: дерево каталога и итоговое число каталогов и файлов"""
+        path = args[1] if len(args) > 1 else "."
+        target = self.resolve_path(path)
+        if not self.directory_exists(target):
+            yield f"tree: нет такого каталога: {path}"
+            return
+        root = self.fs.get(target).name
+
+        def lines():
+            yield target
+            stack = [(self.fs.list_dir(root), 0, "")]
+            while stack:
+                entries, position, prefix = stack.pop()
+                if position >= len(entries):
+                    continue
+                stack.append((entries, position + 1, prefix))
+                last = position == len(entries) - 1
+                entry = entries[position]
+                yield prefix + ("└── " if last else "├── ") + posixpath.basename(entry.name)
+                if entry.type == DIR:
+                    stack.append((self.fs.list_dir(entry.name), 0, prefix + ("    " if last else "│   ")))
+            size, files, dirs = self.fs.total(root)
+            yield f"\n{dirs} каталогов, {files} файлов"
+
+        yield from join_lines(lines())
+
+    def stream_command(self, command):
+        """
+        Выполняет команду, отдавая вывод порциями по мере готовности.
+
+        Команды чтения файлов не собирают вывод целиком, поэтому tail большого
+        файла стоит O(размер вывода). В лог попадает не больше LOG_OUTPUT_LIMIT символов.
+        """
+        command = command.replace("cd..", "cd ..")
+        try:
+            args = split_command(command)
+        except ValueError:
+            args = None
+        if not args or args[0] not in STREAM_COMMANDS:
+            yield self.execute_command(command)
+            return
+
+        if args[0] == "find":
+            chunks = self.find(args)
+        elif args[0] == "du":
+            chunks = self.disk_usage(args)
+        elif args[0] == "tree":
+            chunks = self.tree(args)
+        else:
+            chunks = self.read_content(args)
+
+        logged = []
+        produced = 0
+        try:
+            for chunk in chunks:
+                if produced < LOG_OUTPUT_LIMIT:
+                    logged.append(chunk[:LOG_OUTPUT_LIMIT - produced])
+                produced += len(chunk)
+                yield chunk
+        finally:
+            output = "".join(logged)
+            if produced > LOG_OUTPUT_LIMIT:
+                output += "\n[вывод обрезан]"
+            self.log_command(command, output)
+
     def execute_command(self, command):
         """Выполняет команду оболочки"""
         # Заменяем cd.. на cd ..
         command = command.replace("cd..", "cd ..")
-        args = command.split()
+        try:
+            args = split_command(command)
+        except ValueError as e:
+            output = f"{command.split()[0]}: {e}"
+            self.log_command(command, output)
+            return output
+        if args and args[0] in STREAM_COMMANDS:
+            return "".join(self.stream_command(command))
         if not args:
             output = "cd: аргумент отсутствует"
             self.log_command(command, output)
@@ -104,7 +352,10 @@ class ShellEmulator:
                 output = "cd: аргумент отсутствует"
 
         elif cmd == "ls":
-            output = self.list_files(self.current_dir)
+            if len(args) > 1:
+                output = self.list_files(self.resolve_path(args[1]))
+            else:
+                output = self.list_files(self.current_dir)
 
         elif cmd == "cal":
             year = 2024
@@ -112,18 +363,28 @@ class ShellEmulator:
             output = calendar.month(year, month)
 
         elif cmd == "chown":
+            recursive = len(args) > 1 and args[1] == "-R"
+            if recursive:
+                args = args[1:]
             if len(args) != 3:
                 output = "chown: неверное количество аргументов"
             else:
                 file, new_owner = args[1], args[2]
-                if self.change_owner(file, new_owner):
+                if self.change_owner(file, new_owner, recursive):
                     output = f"Права на '{file}' переданы пользователю {new_owner}"
                 else:
                     output = f"chown: файл '{file}' не найден"
 
+        elif cmd in ("touch", "mkdir", "rm", "mv", "echo", "commit"):
+            try:
+                output = self.modify(cmd, args[1:])
+            except ValueError as e:
+                output = f"{cmd}: {e}"
+
         elif cmd == "exit":
             output = "Выход из эмулятора."
             self.log_command(command, output)
+            self.close()
             print(output)
             exit(0)
 
@@ -133,9 +394,108 @@ class ShellEmulator:
         self.log_command(command, output)
         return output
 
-    def change_owner(self, file, new_owner):
-        """Меняет владельца файла в виртуальной файловой системе"""
-        if file in self.files_owners:
-            self.files_owners[file] = new_owner
-            return True
-        return False
+    def modify(self, cmd, args):
+        """
+        Выполняет команды, изменяющие файловую систему: touch, mkdir, rm, mv, echo, commit.
+
+        Изменения попадают только в слой поверх архива; commit записывает
+        новый архив с объединённым содержимым. Ошибки сообщаются через ValueError.
+        """
+        flags = {arg for arg in args if arg in ("-p", "-r", "-R")} if cmd in ("mkdir", "rm") else set()
+        paths = [arg for arg in args if arg not in flags]
+
+        if cmd == "echo":
+            redirect = next((i for i, arg in enumerate(args) if arg in (">", ">>")), None)
+            if redirect is None:
+                return " ".join(args)
+            if redirect != len(args) - 2:
+                raise ValueError("ожидается echo текст > файл")
+            data = (" ".join(args[:redirect]) + "\n").encode("utf-8")
+            target = self.resolve_path(args[-1])
+            entry = self.fs.get(target)
+            if args[redirect] == ">>" and entry is not None and entry.type != DIR:
+                existing, start, end = self.entry_data(entry)
+                data = existing[start:end] + data
+            self.fs.write(target, data)
+            return ""
+
+        if cmd == "commit":
+            if is_compressed(self.vfs_path):
+                raise ValueError("доступно только для несжатых архивов")
+            root, ext = os.path.splitext(self.vfs_path)
+            output_path = paths[0] if paths else f"{root}_commit{ext}"
+            if os.path.abspath(output_path) == os.path.abspath(self.vfs_path):
+                raise ValueError("нельзя перезаписать исходный архив")
+            self.fs.commit(self.vfs_path, output_path)
+            return f"Изменения сохранены в {output_path}"
+
+        if not paths:
+            raise ValueError("аргумент отсутствует")
+        if cmd == "mv":
+            if len(paths) != 2:
+                raise ValueError("неверное количество аргументов")
+            source = self.resolve_path(paths[0])
+            destination = self.fs.move(source, self.resolve_path(paths[1]))
+            self.owners.move(normalize_path(source), destination)
+            return ""
+
+        for path in paths:
+            target = self.resolve_path(path)
+            if cmd == "touch":
+                self.fs.touch(target)
+            elif cmd == "mkdir":
+                self.fs.mkdir(target, parents="-p" in flags)
+            elif cmd == "rm":
+                entry = self.fs.get(target)
+                if entry is not None and entry.type == DIR and not flags:
+                    raise ValueError(f"'{path}' является каталогом, используйте rm -r")
+                self.fs.remove(target, recursive=bool(flags))
+                self.owners.remove(normalize_path(target))
+        return ""
+
+    def change_owner(self, file, new_owner, recursive=False):
+        """
+        Меняет владельца файла в виртуальной файловой системе.
+
+        При recursive владелец меняется у всего поддерева каталога: обход идёт
+        по индексу каталогов и стоит O(размер поддерева).
+        """
+        entry = self.fs.get(self.resolve_path(file))
+        if entry is None:
+            return False
+        if recursive:
+            paths = (item.name for item in self.checked(self.fs.walk(entry.name)))
+        else:
+            paths = (entry.name,)
+        self.owners.set(paths, new_owner)
+        return True
+
+    def get_owner(self, file):
+        """Возвращает владельца файла или None, если файла нет"""
+        entry = self.fs.get(self.resolve_path(file))
+        if entry is None:
+            return None
+        return self.owners.get(entry.name)
+
+
+def split_command(command):
+    """Разбивает команду на слова: кавычки группируют слова и сохраняют пробелы (echo "a  b" > f)"""
+    try:
+        return shlex.split(command)
+    except ValueError:
+        raise ValueError("незакрытая кавычка")
+
+
+def join_lines(lines, lines_per_chunk=None):
+    """Собирает строки генератора в порции вывода, не накапливая весь вывод целиком"""
+    lines_per_chunk = lines_per_chunk or LINES_PER_CHUNK
+    batch = []
+    first = True
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= lines_per_chunk:
+            yield ("" if first else "\n") + "\n".join(batch)
+            batch.clear()
+            first = False
+    if batch:
+        yield ("" if first else "\n") + "\n".join(batch)
@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from batch import load_script
+from server import EmulatorServer, SharedVFS
+
+"""
+python loadgen.py --sessions 1000 --concurrency 200
+python loadgen.py --unix /tmp/emulator.sock --script start.sh
+"""
+
+DEFAULT_COMMANDS = ["ls", "cd subdir", "ls", "cd ..", "mkdir tmp", "echo data > tmp/f.txt", "cat tmp/f.txt", "du -s /"]
+
+
+class Connection:
+    """Асинхронное соединение с сервером эмулятора"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, address):
+        if "unix_path" in address:
+            reader, writer = await asyncio.open_unix_connection(address["unix_path"])
+        else:
+            reader, writer = await asyncio.open_connection(address["host"], address["port"])
+        connection = cls(reader, writer)
+        await connection.receive()  # Приветствие сервера
+        return connection
+
+    async def receive(self):
+        return json.loads(await self.reader.readline())
+
+    async def execute(self, command):
+        self.writer.write(command.encode("utf-8") + b"\n")
+        await self.writer.drain()
+        while True:
+            message = await self.receive()
+            if "done" in message or "exit" in message:
+                return
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def run_session(address, commands):
+    connection = await Connection.open(address)
+    for command in commands:
+        await connection.execute(command)
+    await connection.close()
+
+
+async def measure_throughput(address, commands, sessions, concurrency):
+    """Открывает sessions сессий (не больше concurrency одновременно); возвращает затраченное время"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with semaphore:
+            await run_session(address, commands)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(sessions)))
+    return time.perf_counter() - started
+
+
+async def measure_memory(server, address, sessions):
+    """Память, занятая одной открытой сессией на сервере (только для сервера в этом же процессе)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    connections = [await Connection.open(address) for _ in range(sessions)]
+    for connection in connections:
+        await connection.execute("ls")
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(server.sessions) == sessions
+    for connection in connections:
+        await connection.close()
+    return (after - before) / sessions
+
+
+async def run(args):
+    commands = load_script(args.script) if args.script else DEFAULT_COMMANDS
+    server = shared = tmp_dir = None
+    if args.unix:
+        address = {"unix_path": args.unix}
+    elif args.port:
+        address = {"host": args.host, "port": args.port}
+    else:
+        # Сервер запускается в этом же процессе на временном Unix-сокете
+        tmp_dir = tempfile.TemporaryDirectory()
+        address = {"unix_path": os.path.join(tmp_dir.name, "emulator.sock")}
+        shared = SharedVFS(args.vfs, args.index)
+        server = EmulatorServer(shared)
+        await server.start(**address)
+
+    try:
+        elapsed = await measure_throughput(address, commands, args.sessions, args.concurrency)
+        print(f"Сессий: {args.sessions}, одновременно: {args.concurrency}, команд в сессии: {len(commands)}")
+        print(f"Время: {elapsed:.3f} с, сессий/с: {args.sessions / elapsed:.1f}, "
+              f"команд/с: {args.sessions * len(commands) / elapsed:.1f}")
+        if server is not None:
+            per_session = await measure_memory(server, address, args.concurrency)
+            print(f"Память на открытую сессию: {per_session / 1024:.1f} КиБ "
+                  f"(записей в общем индексе: {len(shared.index.entries)})")
+    finally:
+        if server is not None:
+            await server.close()
+            shared.close()
+            tmp_dir.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера эмулятора оболочки")
+    parser.add_argument("--vfs", default="vfs.tar", help="Архив для сервера в этом же процессе")
+    parser.add_argument("--index", action="store_true", help="Загружать ФС через файл-индекс рядом с архивом")
+    parser.add_argument("--unix", default=None, help="Unix-сокет внешнего сервера")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес внешнего TCP-сервера")
+    parser.add_argument("--port", type=int, default=None, help="Порт внешнего TCP-сервера")
+    parser.add_argument("--script", default=None, help="Скрипт команд для каждой сессии")
+    parser.add_argument("--sessions", type=int, default=500, help="Общее число сессий")
+    parser.add_argument("--concurrency", type=int, default=200, help="Число одновременно открытых сессий")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
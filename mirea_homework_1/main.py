@@ -1,12 +1,28 @@
+import os
+import queue
 import tkinter as tk
+from batch import load_script
 from emulator import ShellEmulator
+from owners import owners_path
+from command_worker import CommandWorker, COMMAND, OUTPUT, DONE, CANCELLED, ERROR, EXIT
 import xml.etree.ElementTree as ET
 
 """
 python -m unittest discover -s tests
 python main.py                       
+python batch.py start.sh
+python create_archive.py test_vfs vfs.tar
 """
 
+# Период опроса очереди вывода рабочего потока, мс
+POLL_INTERVAL_MS = 50
+# Сколько сообщений забирается из очереди за один опрос
+POLL_BATCH = 500
+# Максимальное число строк в поле вывода; старые строки удаляются
+MAX_OUTPUT_LINES = 5000
+# Сколько секунд ждать завершения рабочего потока при закрытии окна
+CLOSE_TIMEOUT = 5
+
 
 def parse_config(config_path):
     """
@@ -17,20 +33,28 @@ def parse_config(config_path):
     """
     tree = ET.parse(config_path)
     root = tree.getroot()
+    vfs_index = root.find("vfs_index")
+    save_owners = root.find("save_owners")
     return {
         "computer_name": root.find("computer_name").text,
         "vfs_path": root.find("vfs_path").text,
         "log_path": root.find("log_path").text,
         "start_script": root.find("start_script").text,
+        # Необязательный флаг: загружать ФС через файл-индекс рядом с архивом
+        "vfs_index": vfs_index is not None and vfs_index.text.strip().lower() == "true",
+        # Необязательный флаг: сохранять изменённых владельцев (chown) в файл рядом с архивом
+        "save_owners": save_owners is not None and save_owners.text.strip().lower() == "true",
     }
 
 
-def create_gui(emulator, computer_name):
+def create_gui(emulator, computer_name, start_script=None):
     """
     Создание графического интерфейса.
 
     :param emulator: Экземпляр эмулятора.
     :param computer_name: Имя компьютера для приглашения.
+    :param start_script: Скрипт, команды которого выполняются при запуске.
+    :return: True, если рабочий поток завершился и эмулятор можно закрыть.
     """
     root = tk.Tk()
     root.title(f"Эмулятор оболочки ({computer_name})")
@@ -43,24 +67,81 @@ def create_gui(emulator, computer_name):
     command_entry = tk.Entry(root, width=80)
     command_entry.pack(pady=10)
 
+    worker = CommandWorker(emulator)
+
     def execute_command():
         """Обработка команды, введённой пользователем."""
         command = command_entry.get()
-        output = emulator.execute_command(command)
-        output_area.insert(tk.END, f"$ {command}\n{output}\n")
+        worker.submit(command)
         command_entry.delete(0, tk.END)
 
+    def trim_output():
+        """Удаляет самые старые строки, чтобы поле вывода не разрасталось бесконечно."""
+        lines = int(output_area.index("end-1c").split(".")[0])
+        if lines > MAX_OUTPUT_LINES:
+            output_area.delete("1.0", f"{lines - MAX_OUTPUT_LINES + 1}.0")
+
+    def poll_output():
+        """Забирает вывод рабочего потока и добавляет его в поле вывода одной вставкой."""
+        parts = []
+        for _ in range(POLL_BATCH):
+            try:
+                kind, data = worker.output.get_nowait()
+            except queue.Empty:
+                break
+            if kind == COMMAND:
+                parts.append(f"$ {data}\n")
+            elif kind == OUTPUT:
+                parts.append(data)
+            elif kind == DONE:
+                parts.append("\n")
+            elif kind == CANCELLED:
+                parts.append("\n^C\n")
+            elif kind == ERROR:
+                parts.append(f"Ошибка: {data}\n")
+            elif kind == EXIT:
+                close()
+                return
+
+        if parts:
+            output_area.insert(tk.END, "".join(parts))
+            trim_output()
+            output_area.see(tk.END)
+        root.after(POLL_INTERVAL_MS, poll_output)
+
+    def close():
+        """Прерывает текущую команду, дожидается остановки рабочего потока и закрывает окно."""
+        worker.shutdown(CLOSE_TIMEOUT)
+        root.destroy()
+
     # Кнопка для выполнения команды
     submit_button = tk.Button(root, text="Выполнить", command=execute_command)
     submit_button.pack()
 
+    # Кнопка для прерывания выполняющейся команды
+    cancel_button = tk.Button(root, text="Прервать", command=worker.cancel)
+    cancel_button.pack()
+
+    # Команды стартового скрипта выполняются до команд пользователя
+    if start_script and os.path.exists(start_script):
+        for command in load_script(start_script):
+            worker.submit(command)
+
+    root.protocol("WM_DELETE_WINDOW", close)
+    root.after(POLL_INTERVAL_MS, poll_output)
     root.mainloop()
+    return not worker.thread.is_alive()
 
 
 if __name__ == "__main__":
     # Парсим конфигурацию
     config = parse_config("config.xml")
     # Инициализируем эмулятор
-    emulator = ShellEmulator(config["vfs_path"], config["log_path"])
+    owners_file = owners_path(config["vfs_path"]) if config["save_owners"] else None
+    emulator = ShellEmulator(config["vfs_path"], config["log_path"], use_index=config["vfs_index"],
+                             owners_file=owners_file)
     # Запускаем GUI
-    create_gui(emulator, config["computer_name"])
+    stopped = create_gui(emulator, config["computer_name"], config["start_script"])
+    # Команда, не успевшая завершиться, ещё читает архив: отображение не закрывается под ней
+    if stopped:
+        emulator.close()
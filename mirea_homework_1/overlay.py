@@ -0,0 +1,263 @@
+import io
+import os
+import posixpath
+import tarfile
+import time
+from vfs_index import VFSEntry, DIR, FILE, normalize_path
+
+# Смещение записей, содержимое которых хранится в слое изменений, а не в архиве
+OVERLAY = -1
+
+
+class OverlayFS:
+    """
+    Слой изменений поверх неизменяемого индекса архива (copy-on-write).
+
+    Новые и изменённые записи хранятся в entries (содержимое созданных файлов —
+    в contents), удалённые записи архива помечаются в whiteouts. Удалённый каталог
+    скрывает всё своё поддерево архива, даже если затем создан заново.
+    Поиск сначала проверяет слой изменений, затем архив. Итоги каталогов
+    складываются из итогов архива и поправок deltas, которые обновляются
+    при каждом изменении за O(глубина пути).
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.entries = {}
+        self.contents = {}
+        self.children = {}
+        self.whiteouts = set()
+        self.deltas = {}
+
+    def hidden(self, path):
+        """Проверяет, скрыт ли путь архива удалением его самого или одного из предков"""
+        if not self.whiteouts:
+            return False
+        while path:
+            if path in self.whiteouts:
+                return True
+            path = posixpath.dirname(path)
+        return False
+
+    def base_entry(self, path):
+        """Видимая запись архива по нормализованному пути"""
+        entry = self.base.entries.get(path)
+        if entry is None or self.hidden(path):
+            return None
+        return entry
+
+    def get(self, path):
+        """Возвращает запись по пути: сначала из слоя изменений, затем из архива"""
+        path = normalize_path(path)
+        entry = self.entries.get(path)
+        if entry is not None:
+            return entry
+        return self.base_entry(path)
+
+    def exists(self, path):
+        return self.get(path) is not None
+
+    def is_dir(self, path):
+        entry = self.get(path)
+        return entry is not None and entry.type == DIR
+
+    def list_dir(self, path):
+        """Возвращает записи непосредственных потомков каталога или None, если каталога нет"""
+        path = normalize_path(path)
+        entry = self.get(path)
+        if entry is None or entry.type != DIR:
+            return None
+
+        result = []
+        if path in self.base.children and not self.hidden(path):
+            for name in self.base.children[path]:
+                child = posixpath.join(path, name)
+                if child not in self.whiteouts and child not in self.entries:
+                    result.append(self.base.entries[child])
+        for name in self.children.get(path, ()):
+            result.append(self.entries[posixpath.join(path, name)])
+        return result
+
+    def walk(self, path):
+        """Генератор видимых записей поддерева в прямом порядке обхода"""
+        entry = self.get(path)
+        if entry is None:
+            return
+        stack = [entry]
+        while stack:
+            entry = stack.pop()
+            yield entry
+            if entry.type == DIR:
+                stack.extend(reversed(self.list_dir(entry.name)))
+
+    def total(self, path):
+        """Итоги (размер, файлы, каталоги) поддерева с учётом изменений"""
+        path = normalize_path(path)
+        size, files, dirs = (0, 0, 0)
+        if path in self.base.totals and not self.hidden(path):
+            size, files, dirs = self.base.totals[path]
+        delta = self.deltas.get(path)
+        if delta:
+            size, files, dirs = size + delta[0], files + delta[1], dirs + delta[2]
+        return size, files, dirs
+
+    def _account(self, path, size, files, dirs):
+        """Прибавляет изменение к итогам всех предков пути"""
+        while path:
+            path = posixpath.dirname(path)
+            delta = self.deltas.setdefault(path, [0, 0, 0])
+            delta[0] += size
+            delta[1] += files
+            delta[2] += dirs
+
+    def _usage(self, entry):
+        """Вклад записи в итоги родителей"""
+        if entry.type == DIR:
+            size, files, dirs = self.total(entry.name)
+            return size, files, dirs + 1
+        return entry.size, 1, 0
+
+    def _put(self, entry, content=None):
+        """Добавляет запись в слой изменений, заменяя существующий файл с тем же путём"""
+        path = entry.name
+        existing = self.get(path)
+        if existing is not None:
+            self._account(path, *(-value for value in self._usage(existing)))
+
+        parent, name = posixpath.split(path)
+        self.entries[path] = entry
+        self.children.setdefault(parent, {})[name] = None
+        if content is not None:
+            self.contents[path] = content
+        if entry.type == DIR:
+            self.children.setdefault(path, {})
+        self._account(path, *self._usage(entry))
+
+    def _require_parent(self, path):
+        parent = posixpath.dirname(path)
+        if not self.is_dir(parent):
+            raise ValueError(f"нет такого каталога: /{parent}")
+
+    def mkdir(self, path, parents=False):
+        """Создаёт каталог; с parents создаёт и недостающих предков"""
+        path = normalize_path(path)
+        if self.exists(path):
+            raise ValueError(f"'/{path}' уже существует")
+        if parents:
+            missing = []
+            parent = posixpath.dirname(path)
+            while not self.exists(parent):
+                missing.append(parent)
+                parent = posixpath.dirname(parent)
+            if not self.is_dir(parent):
+                raise ValueError(f"'/{parent}' не является каталогом")
+            for ancestor in reversed(missing):
+                self._put(VFSEntry(ancestor, 0, 0, DIR))
+        else:
+            self._require_parent(path)
+        self._put(VFSEntry(path, 0, 0, DIR))
+
+    def write(self, path, data):
+        """Создаёт или перезаписывает файл с указанным содержимым"""
+        path = normalize_path(path)
+        if self.is_dir(path):
+            raise ValueError(f"'/{path}' является каталогом")
+        self._require_parent(path)
+        self._put(VFSEntry(path, OVERLAY, len(data), FILE), bytes(data))
+
+    def touch(self, path):
+        """Создаёт пустой файл, если его ещё нет"""
+        if not self.exists(path):
+            self.write(path, b"")
+
+    def remove(self, path, recursive=False):
+        """Удаляет файл или каталог (непустой — только с recursive)"""
+        path = normalize_path(path)
+        entry = self.get(path)
+        if entry is None:
+            raise ValueError(f"'/{path}' не существует")
+        if not path:
+            raise ValueError("нельзя удалить корневой каталог")
+        if entry.type == DIR and self.list_dir(path) and not recursive:
+            raise ValueError(f"каталог '/{path}' не пуст")
+
+        self._account(path, *(-value for value in self._usage(entry)))
+        if self.base_entry(path) is not None:
+            self.whiteouts.add(path)
+
+        # Удаляем из слоя изменений всё поддерево вместе с поправками итогов
+        prefix = path + "/"
+        for mapping in (self.entries, self.contents, self.children, self.deltas):
+            for key in [key for key in mapping if key == path or key.startswith(prefix)]:
+                del mapping[key]
+        parent, name = posixpath.split(path)
+        self.children.get(parent, {}).pop(name, None)
+
+    def move(self, source, destination):
+        """
+        Перемещает файл или каталог.
+
+        Файлы архива не копируются: новая запись ссылается на те же данные в архиве,
+        а старый путь скрывается. Возвращает итоговый путь записи.
+        """
+        source = normalize_path(source)
+        destination = normalize_path(destination)
+        entry = self.get(source)
+        if entry is None:
+            raise ValueError(f"'/{source}' не существует")
+        if self.is_dir(destination):
+            destination = posixpath.join(destination, posixpath.basename(source))
+        if destination == source or destination.startswith(source + "/") or not source:
+            raise ValueError(f"нельзя переместить '/{source}' в '/{destination}'")
+        self._require_parent(destination)
+        existing = self.get(destination)
+        if existing is not None:
+            if existing.type == DIR:
+                raise ValueError(f"'/{destination}' уже существует")
+            self.remove(destination)
+
+        items = list(self.walk(source))
+        for item in items:
+            path = destination + item.name[len(source):]
+            if item.type == DIR:
+                self._put(VFSEntry(path, 0, 0, DIR))
+            else:
+                self._put(VFSEntry(path, item.offset, item.size, FILE), self.contents.get(item.name))
+        self.remove(source, recursive=True)
+        return destination
+
+    def commit(self, vfs_path, output_path):
+        """
+        Записывает новый архив, объединяющий архив и слой изменений, за один проход.
+
+        Записи архива переносятся в исходном порядке (кроме удалённых и заменённых),
+        данные копируются прямо из исходного файла по смещениям индекса; затем
+        дописываются записи слоя изменений. Исходный архив не меняется.
+        """
+        compression = {".gz": "gz", ".tgz": "gz", ".bz2": "bz2", ".xz": "xz"}.get(os.path.splitext(output_path)[1])
+        mode = f"w|{compression}" if compression else "w"
+        mtime = time.time()
+        tmp_path = output_path + ".tmp"
+        with open(vfs_path, "rb") as source, tarfile.open(tmp_path, mode) as tar:
+            for path, entry in self.base.entries.items():
+                if path and path not in self.entries and not self.hidden(path):
+                    self._add_member(tar, entry, source, mtime)
+            for entry in self.entries.values():
+                self._add_member(tar, entry, source, mtime)
+        os.replace(tmp_path, output_path)
+
+    def _add_member(self, tar, entry, source, mtime):
+        info = tarfile.TarInfo(entry.name)
+        info.mtime = mtime
+        if entry.type == DIR:
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            tar.addfile(info)
+            return
+        info.size = entry.size
+        info.mode = 0o644
+        if entry.offset == OVERLAY:
+            tar.addfile(info, io.BytesIO(self.contents[entry.name]))
+        else:
+            source.seek(entry.offset)
+            tar.addfile(info, source)
@@ -0,0 +1,96 @@
+import json
+import os
+
+DEFAULT_OWNER = "default_owner"
+OWNERS_SUFFIX = ".owners"
+
+
+def owners_path(vfs_path):
+    """Путь к файлу с изменёнными владельцами, который хранится рядом с архивом"""
+    return vfs_path + OWNERS_SUFFIX
+
+
+class OwnerTable:
+    """
+    Владельцы файлов виртуальной файловой системы.
+
+    Имена владельцев хранятся один раз в списке names, записи ссылаются на них
+    по номеру. Все записи архива принадлежат DEFAULT_OWNER (номер 0), поэтому
+    хранятся только изменённые записи: разреженный словарь путь -> номер владельца.
+    Изменения сохраняются в файл path, только если он указан: save() вызывается
+    при закрытии эмулятора и записывает файл, если с прошлого сохранения что-то
+    изменилось. При следующей загрузке изменения применяются снова.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.names = [DEFAULT_OWNER]
+        self.ids = {DEFAULT_OWNER: 0}
+        self.overrides = {}
+        self.changed = False
+
+    def intern(self, owner):
+        """Возвращает номер владельца, добавляя имя в таблицу при первом появлении"""
+        owner_id = self.ids.get(owner)
+        if owner_id is None:
+            owner_id = self.ids[owner] = len(self.names)
+            self.names.append(owner)
+        return owner_id
+
+    def get(self, path):
+        """Возвращает владельца записи"""
+        return self.names[self.overrides.get(path, 0)]
+
+    def set(self, paths, owner):
+        """Назначает владельца записям; владелец по умолчанию не хранится"""
+        owner_id = self.intern(owner)
+        for path in paths:
+            if owner_id:
+                self.overrides[path] = owner_id
+            else:
+                self.overrides.pop(path, None)
+        self.changed = True
+
+    def remove(self, path):
+        """
+        Забывает владельцев записи и её поддерева (после rm), чтобы заново
+        созданный путь снова принадлежал владельцу по умолчанию. Стоит O(число изменений).
+        """
+        prefix = path + "/"
+        for key in [key for key in self.overrides if key == path or key.startswith(prefix)]:
+            del self.overrides[key]
+            self.changed = True
+
+    def move(self, source, destination):
+        """Переносит владельцев записи и её поддерева на новый путь (после mv)"""
+        prefix = source + "/"
+        moved = {destination + key[len(source):]: owner_id for key, owner_id in self.overrides.items()
+                 if key == source or key.startswith(prefix)}
+        self.remove(destination)
+        self.remove(source)
+        if moved:
+            self.overrides.update(moved)
+            self.changed = True
+
+    def load(self, index):
+        """Применяет сохранённые изменения к записям, которые есть в индексе"""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        for owner, paths in data.items():
+            self.set((path for path in paths if path in index.entries), owner)
+        self.changed = False
+
+    def save(self):
+        """Сохраняет изменённых владельцев в виде {владелец: [пути]}, если были изменения"""
+        if self.path is None or not self.changed:
+            return
+        data = {}
+        for path, owner_id in self.overrides.items():
+            data.setdefault(self.names[owner_id], []).append(path)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.changed = False
@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from command_worker import OUTPUT, DONE, ERROR
+from emulator import ShellEmulator
+from vfs_index import VFSIndex
+from vfs_reader import ArchiveReader
+
+"""
+python server.py --unix /tmp/emulator.sock
+python server.py --port 8023 --index --log-dir logs
+"""
+
+# Сколько порций вывода команды может ждать отправки клиенту; дальше поток команды ждёт
+CHUNKS_IN_FLIGHT = 16
+# Период сброса логов всех сессий на диск, с
+LOG_FLUSH_INTERVAL = 1.0
+
+
+class SharedVFS:
+    """
+    Неизменяемая часть файловой системы, общая для всех сессий сервера:
+    индекс каталогов и отображение архива в память загружаются один раз.
+    """
+
+    def __init__(self, vfs_path, use_index=False):
+        self.vfs_path = vfs_path
+        if use_index:
+            self.index = VFSIndex.load(vfs_path)
+        else:
+            with tarfile.open(vfs_path, "r") as tar:
+                self.index = VFSIndex.from_tar(tar)
+        self.reader = ArchiveReader(vfs_path)
+
+    def create_session(self, log_file, log_format="jsonl"):
+        """
+        Создаёт эмулятор, который хранит только состояние сессии: каталог, слой изменений, лог.
+        Таймер лога отключён: логи всех сессий сбрасывает сервер (EmulatorServer.flush_logs).
+        """
+        return ShellEmulator(self.vfs_path, log_file, log_format=log_format, index=self.index, reader=self.reader,
+                             log_options={"flush_interval": None})
+
+    def close(self):
+        self.reader.close()
+
+
+class EmulatorServer:
+    """
+    Сервер, обслуживающий много сессий эмулятора в одном процессе на asyncio.
+
+    Протокол построчный: клиент отправляет команду одной строкой, сервер отвечает
+    строками JSON — {"chunk": ...} на каждую порцию вывода и {"done": true, "cwd": ...}
+    в конце. Если команда завершилась исключением, перед {"done": ...} приходит
+    {"error": текст}, и сессия продолжается. Команду exit сервер выполняет сам:
+    отвечает {"exit": true} и закрывает только это соединение.
+    При подключении сервер отправляет {"session": номер, "cwd": "/"}.
+
+    Команды выполняются в пуле потоков (не больше workers одновременно), а цикл
+    событий только пересылает порции вывода, поэтому долгая команда одной сессии
+    (find /, cat большого файла, commit) не останавливает остальные. Команды
+    одной сессии по-прежнему идут строго по очереди.
+    """
+
+    # Очередь входящих соединений: сотни сессий подключаются почти одновременно
+    BACKLOG = 1024
+
+    def __init__(self, shared, log_dir=None, workers=None):
+        self.shared = shared
+        self.log_dir = log_dir
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+        self.server = None
+        self.executor = ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4))
+        self.flusher = None
+
+    def log_path(self, session_id):
+        if self.log_dir is None:
+            return os.devnull
+        return os.path.join(self.log_dir, f"session_{session_id}.jsonl")
+
+    async def handle(self, reader, writer):
+        """Обслуживает одно соединение как отдельную сессию"""
+        session_id = next(self.session_ids)
+        emulator = self.shared.create_session(self.log_path(session_id))
+        self.sessions[session_id] = emulator
+        try:
+            await send(writer, {"session": session_id, "cwd": emulator.current_dir})
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("utf-8", errors="replace").strip()
+                if command.split() == ["exit"]:
+                    # ShellEmulator.execute_command печатает сообщение и завершает процесс
+                    emulator.log_command(command, "Выход из эмулятора.")
+                    await send(writer, {"exit": True})
+                    break
+                await self.run_command(emulator, command, writer)
+                await send(writer, {"done": True, "cwd": emulator.current_dir})
+        except ConnectionError:
+            pass
+        finally:
+            del self.sessions[session_id]
+            emulator.close()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def run_command(self, emulator, command, writer):
+        """
+        Выполняет команду в пуле потоков и пересылает её вывод клиенту.
+        Исключение команды отправляется клиенту сообщением {"error": ...}.
+
+        Поток команды кладёт порции в очередь цикла событий; семафор ограничивает
+        число неотправленных порций, так что медленный клиент притормаживает
+        только свою команду. Если соединение оборвалось, команда прерывается
+        между порциями, и поток дожидается завершения до закрытия эмулятора.
+        """
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue()
+        slots = threading.Semaphore(CHUNKS_IN_FLIGHT)
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                chunks = emulator.stream_command(command)
+                for chunk in chunks:
+                    slots.acquire()
+                    if cancelled.is_set():
+                        chunks.close()
+                        return
+                    loop.call_soon_threadsafe(messages.put_nowait, (OUTPUT, chunk))
+                loop.call_soon_threadsafe(messages.put_nowait, (DONE, None))
+            except Exception as e:
+                loop.call_soon_threadsafe(messages.put_nowait, (ERROR, e))
+
+        task = loop.run_in_executor(self.executor, produce)
+        try:
+            while True:
+                kind, data = await messages.get()
+                if kind == OUTPUT:
+                    await send(writer, {"chunk": data})
+                    slots.release()
+                elif kind == ERROR:
+                    await send(writer, {"error": f"{type(data).__name__}: {data}"})
+                    return
+                else:
+                    return
+        finally:
+            if not task.done():
+                cancelled.set()
+                slots.release(CHUNKS_IN_FLIGHT)
+            await task
+
+    def flush_logs(self):
+        """Сбрасывает на диск логи всех открытых сессий"""
+        for emulator in list(self.sessions.values()):
+            emulator.log.flush()
+
+    async def flush_logs_periodically(self):
+        """Один общий сброс логов вместо отдельного потока-таймера в каждой сессии"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(LOG_FLUSH_INTERVAL)
+            await loop.run_in_executor(self.executor, self.flush_logs)
+
+    async def start(self, host=None, port=None, unix_path=None):
+        """Запускает сервер на Unix-сокете или TCP-порту"""
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self.handle, path=unix_path, backlog=self.BACKLOG)
+        else:
+            self.server = await asyncio.start_server(self.handle, host=host, port=port, backlog=self.BACKLOG)
+        self.flusher = asyncio.create_task(self.flush_logs_periodically())
+        return self.server
+
+    async def close(self):
+        """Останавливает приём соединений, сброс логов и пул потоков команд"""
+        self.server.close()
+        await self.server.wait_closed()
+        if self.flusher is not None:
+            self.flusher.cancel()
+            try:
+                await self.flusher
+            except asyncio.CancelledError:
+                pass
+        self.flush_logs()
+        self.executor.shutdown(wait=True)
+
+    async def serve_forever(self, **address):
+        server = await self.start(**address)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.close()
+
+
+async def send(writer, message):
+    """Отправляет одно сообщение протокола и ждёт, пока клиент его заберёт"""
+    writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Сервер эмулятора оболочки с общей файловой системой для всех сессий")
+    parser.add_argument("--vfs", default="vfs.tar", help="Архив виртуальной файловой системы")
+    parser.add_argument("--index", action="store_true", help="Загружать ФС через файл-индекс рядом с архивом")
+    parser.add_argument("--unix", default=None, help="Путь к Unix-сокету")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес TCP-сервера")
+    parser.add_argument("--port", type=int, default=8023, help="Порт TCP-сервера")
+    parser.add_argument("--log-dir", default=None, help="Каталог логов сессий (по умолчанию логи не пишутся)")
+    parser.add_argument("--workers", type=int, default=None, help="Число потоков, выполняющих команды сессий")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    shared = SharedVFS(args.vfs, args.index)
+    server = EmulatorServer(shared, args.log_dir, args.workers)
+    if args.unix:
+        address = {"unix_path": args.unix}
+    else:
+        address = {"host": args.host, "port": args.port}
+    try:
+        asyncio.run(server.serve_forever(**address))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shared.close()
+
+
+if __name__ == "__main__":
+    main()
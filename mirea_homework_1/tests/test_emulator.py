@@ -1,5 +1,35 @@
 import unittest
+import asyncio
+import io
+import json
+import mmap
+import os
+import tarfile
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+from batch import read_script, run_script, run_parallel, percentile, format_report, parse_args as batch_args
+from command_worker import CommandWorker, COMMAND, OUTPUT, DONE, CANCELLED, EXIT
+from command_log import JsonLinesLog, read_log, convert_log
+import create_archive
+from create_archive import build_archive, compression_of, scan_tree
 from emulator import ShellEmulator
+from loadgen import Connection
+from server import EmulatorServer, SharedVFS
+import vfs_index
+from vfs_index import VFSIndex, index_path
+from vfs_reader import ArchiveReader, iter_bytes, iter_text, tail_range
+
+
+def make_tar(path, files, mode="w"):
+    """Создаёт архив tar с указанными файлами (имя -> содержимое)."""
+    with tarfile.open(path, mode) as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
 
 
 class TestShellEmulator(unittest.TestCase):
@@ -54,5 +84,911 @@ class TestShellEmulator(unittest.TestCase):
         self.assertIn("chown: файл 'nonexistent_file' не найден", result)  # Проверка на ошибку для несуществующего файла
 
 
+class TestDirectoryIndex(unittest.TestCase):
+    def setUp(self):
+        """Создаёт архив с каталогами, имена которых являются префиксами друг друга."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar")
+        make_tar(vfs_path, {
+            "root.txt": b"",
+            "sub/a.txt": b"",
+            "subdir/b.txt": b"",
+            "subdir/deep/c.txt": b"",
+        })
+        self.emulator = ShellEmulator(vfs_path, os.path.join(self.tmp_dir.name, "log.json"))
+
+    def tearDown(self):
+        self.emulator.vfs.close()
+        self.tmp_dir.cleanup()
+
+    # Листинг содержит только непосредственных потомков, каталоги помечены '/'
+    def test_ls_direct_children(self):
+        self.assertEqual(self.emulator.execute_command("ls").split("\n"), ["root.txt", "sub/", "subdir/"])
+
+    # Каталог 'sub' не должен включать содержимое 'subdir'
+    def test_ls_no_prefix_match(self):
+        self.assertEqual(self.emulator.execute_command("ls /sub"), "a.txt")
+        self.assertEqual(self.emulator.execute_command("ls /subdir").split("\n"), ["b.txt", "deep/"])
+
+    # Префикс имени каталога не считается каталогом
+    def test_cd_prefix_is_not_directory(self):
+        result = self.emulator.execute_command("cd /subd")
+        self.assertIn("cd: нет такого каталога", result)
+        self.assertEqual(self.emulator.current_dir, "/")  # Текущий каталог не меняется
+
+    # Файл не является каталогом
+    def test_cd_into_file(self):
+        result = self.emulator.execute_command("cd root.txt")
+        self.assertIn("cd: нет такого каталога", result)
+
+    # Переходы с нормализацией пути
+    def test_cd_normalized(self):
+        self.emulator.execute_command("cd subdir/deep/../deep")
+        self.assertEqual(self.emulator.current_dir, "/subdir/deep")
+        self.assertEqual(self.emulator.execute_command("ls"), "c.txt")
+
+
+class TestJsonLinesLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp_dir.name, "log.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_lines(self):
+        if not os.path.exists(self.log_path):
+            return []
+        with open(self.log_path, encoding="utf-8") as file:
+            return file.read().splitlines()
+
+    # Буфер сбрасывается при достижении размера
+    def test_flush_by_size(self):
+        log = JsonLinesLog(self.log_path, buffer_size=3, flush_interval=None)
+        log.append({"n": 1})
+        log.append({"n": 2})
+        self.assertEqual(self.read_lines(), [])
+        log.append({"n": 3})
+        self.assertEqual(len(self.read_lines()), 3)
+
+    # Буфер сбрасывается по времени
+    def test_flush_by_time(self):
+        log = JsonLinesLog(self.log_path, buffer_size=100, flush_interval=0.05)
+        log.append({"n": 1})
+        deadline = time.monotonic() + 2
+        while not self.read_lines() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.read_lines()), 1)
+        log.close()
+
+    # Эмулятор дописывает записи, а exit сбрасывает буфер
+    def test_emulator_appends_and_flushes_on_exit(self):
+        emulator = ShellEmulator("vfs.tar", self.log_path)
+        emulator.execute_command("ls")
+        emulator.execute_command("cal")
+        with self.assertRaises(SystemExit):
+            emulator.execute_command("exit")
+        entries = list(read_log(self.log_path))
+        self.assertEqual([entry["command"] for entry in entries], ["ls", "cal", "exit"])
+
+    # Чтение и конвертация лога в формате JSON-массива
+    def test_convert_json_array(self):
+        source = os.path.join(self.tmp_dir.name, "log.json")
+        emulator = ShellEmulator("vfs.tar", source)
+        emulator.execute_command("ls")
+        emulator.execute_command("cd subdir")
+        convert_log(source, self.log_path)
+        self.assertEqual(list(read_log(self.log_path)), list(read_log(source)))
+
+        back = os.path.join(self.tmp_dir.name, "back.json")
+        convert_log(self.log_path, back)
+        self.assertEqual(list(read_log(back)), list(read_log(source)))
+
+    # Конвертация на месте не теряет записи, а неизвестный формат не трогает назначение
+    def test_convert_in_place(self):
+        source = os.path.join(self.tmp_dir.name, "log.json")
+        with open(source, "w") as file:
+            json.dump([{"command": "ls"}, {"command": "cal"}], file)
+        convert_log(source, source, "jsonl")
+        self.assertEqual(list(read_log(source)), [{"command": "ls"}, {"command": "cal"}])
+
+        with self.assertRaises(ValueError):
+            convert_log(source, source, "xml")
+        self.assertEqual(list(read_log(source)), [{"command": "ls"}, {"command": "cal"}])
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["log.json"])
+
+
+class TestIndexedLoading(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp_dir.name, "log.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def make_emulator(self, vfs_path):
+        return ShellEmulator(vfs_path, self.log_path, use_index=True)
+
+    # Сжатый архив индексируется потоковым проходом, рядом сохраняется индекс
+    def test_compressed_archive_creates_index(self):
+        vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar.gz")
+        make_tar(vfs_path, {"a.txt": b"hello", "dir/b.txt": b"world!"}, mode="w:gz")
+        emulator = self.make_emulator(vfs_path)
+
+        self.assertTrue(os.path.exists(index_path(vfs_path)))
+        self.assertEqual(emulator.execute_command("ls").split("\n"), ["a.txt", "dir/"])
+        self.assertEqual(emulator.index.get("dir/b.txt").size, 6)
+
+    # Повторный запуск читает индекс и не проходит по архиву
+    def test_index_is_reused(self):
+        vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar")
+        make_tar(vfs_path, {"a.txt": b"hello", "dir/b.txt": b"world!"})
+        first = self.make_emulator(vfs_path)
+
+        with patch.object(VFSIndex, "from_stream", side_effect=AssertionError("архив не должен читаться")):
+            second = self.make_emulator(vfs_path)
+        self.assertEqual(second.index.entries, first.index.entries)
+        self.assertEqual(second.execute_command("cd dir"), "Текущий каталог: /dir")
+
+    # Смещения из индекса указывают на данные файла в архиве
+    def test_index_offsets(self):
+        vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar")
+        make_tar(vfs_path, {"a.txt": b"hello", "dir/b.txt": b"world!"})
+        entry = self.make_emulator(vfs_path).index.get("dir/b.txt")
+        with open(vfs_path, "rb") as file:
+            file.seek(entry.offset)
+            self.assertEqual(file.read(entry.size), b"world!")
+
+    # Индекс перестраивается, если архив изменился
+    def test_stale_index_is_rebuilt(self):
+        vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar")
+        make_tar(vfs_path, {"a.txt": b"hello"})
+        self.make_emulator(vfs_path)
+
+        make_tar(vfs_path, {"a.txt": b"hello", "new.txt": b"!"})
+        stat = os.stat(vfs_path)
+        os.utime(vfs_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        emulator = self.make_emulator(vfs_path)
+        self.assertIn("new.txt", emulator.execute_command("ls"))
+
+    # Оборванный или испорченный индекс перестраивается по архиву
+    def test_corrupt_index_is_rebuilt(self):
+        vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar")
+        make_tar(vfs_path, {"a.txt": b"hello", "dir/b.txt": b"world!"})
+        expected = self.make_emulator(vfs_path).index.entries
+        with open(index_path(vfs_path), "rb") as file:
+            data = file.read()
+        header_end = data.index(b"\n") + 1
+
+        for damaged in (data[:-8], data[:header_end] + b"F\tx\t5\ta.txt\n", data[:header_end] + b"F\t0\n",
+                        data[:header_end] + "F\t0\t5\tф\n".encode()):
+            with self.subTest(damaged=damaged[header_end:]):
+                with open(index_path(vfs_path), "wb") as file:
+                    file.write(damaged)
+                self.assertIsNone(VFSIndex.read(index_path(vfs_path)))
+                self.assertEqual(self.make_emulator(vfs_path).index.entries, expected)
+
+    # Имена с управляющими и не-ASCII символами сохраняются без искажений
+    def test_index_escapes_names(self):
+        vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar")
+        make_tar(vfs_path, {"tab\tname.txt": b"", "файл.txt": b""})
+        self.make_emulator(vfs_path)
+        index = VFSIndex.read(index_path(vfs_path))
+        self.assertTrue(index.exists("tab\tname.txt"))
+        self.assertTrue(index.exists("файл.txt"))
+
+
+class TestContentCommands(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar")
+        self.big = b"".join(b"line %d\n" % i for i in range(100000))
+        make_tar(self.vfs_path, {
+            "lines.txt": b"one\ntwo words\nthree\n",
+            "no_newline.txt": b"a\nb",
+            "dir/utf.txt": "привет, мир\n".encode("utf-8"),
+            "big.log": self.big,
+        })
+        self.emulator = ShellEmulator(self.vfs_path, os.path.join(self.tmp_dir.name, "log.jsonl"))
+
+    def tearDown(self):
+        self.emulator.close()
+        self.tmp_dir.cleanup()
+
+    def test_cat(self):
+        self.assertEqual(self.emulator.execute_command("cat lines.txt"), "one\ntwo words\nthree\n")
+        self.assertEqual(self.emulator.execute_command("cat dir/utf.txt"), "привет, мир\n")
+
+    def test_head_tail(self):
+        self.assertEqual(self.emulator.execute_command("head -n 2 lines.txt"), "one\ntwo words\n")
+        self.assertEqual(self.emulator.execute_command("tail -n 2 lines.txt"), "two words\nthree\n")
+        self.assertEqual(self.emulator.execute_command("tail -1 no_newline.txt"), "b")
+        self.assertEqual(self.emulator.execute_command("tail -n 5 lines.txt"), "one\ntwo words\nthree\n")
+        self.assertEqual(self.emulator.execute_command("head -n 0 lines.txt"), "")
+
+    def test_wc(self):
+        self.assertEqual(self.emulator.execute_command("wc lines.txt"), "3 4 20 lines.txt")
+        self.assertEqual(self.emulator.execute_command("wc -l big.log"), "100000 big.log")
+
+    # Слова и многобайтные символы на границе порций не искажаются
+    def test_chunk_boundaries(self):
+        reader = ArchiveReader(self.vfs_path)
+        data, start, end = reader.span(self.emulator.index.get("dir/utf.txt"))
+        text = "".join(iter_text(data, start, end, chunk_size=3))
+        self.assertEqual(text, "привет, мир\n")
+
+        entry = self.emulator.index.get("lines.txt")
+        chunks = [(type(chunk), chunk.tobytes()) for chunk in iter_bytes(*reader.span(entry), chunk_size=5)]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual({kind for kind, _ in chunks}, {memoryview})
+        self.assertEqual(b"".join(chunk for _, chunk in chunks), b"one\ntwo words\nthree\n")
+        # Все порции освобождены, отображение закрывается без BufferError
+        reader.close()
+
+    # Сессии сервера открывают общий архив одновременно, но отображение создаётся один раз
+    def test_concurrent_open(self):
+        reader = ArchiveReader(self.vfs_path)
+        original = mmap.mmap
+        calls = []
+
+        def slow_mmap(*args, **kwargs):
+            calls.append(args)
+            time.sleep(0.05)
+            return original(*args, **kwargs)
+
+        with patch("vfs_reader.mmap.mmap", side_effect=slow_mmap):
+            threads = [threading.Thread(target=reader.open) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+        reader.close()
+
+    # Большой файл отдаётся порциями, а tail читает только хвост
+    def test_streaming(self):
+        chunks = list(self.emulator.stream_command("cat big.log"))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks).encode(), self.big)
+
+        entry = self.emulator.index.get("big.log")
+        start, end = tail_range(*self.emulator.reader.span(entry), 3)
+        self.assertEqual(end - start, len(b"line 99997\nline 99998\nline 99999\n"))
+        self.assertEqual(self.emulator.execute_command("tail -n 3 big.log"), "line 99997\nline 99998\nline 99999\n")
+
+    def test_errors(self):
+        self.assertIn("cat: файл 'missing.txt' не найден", self.emulator.execute_command("cat missing.txt"))
+        self.assertIn("является каталогом", self.emulator.execute_command("cat dir"))
+        self.assertIn("аргумент отсутствует", self.emulator.execute_command("cat"))
+
+    # Вывод нескольких файлов и ошибки разделяются переводом строки
+    def test_several_files(self):
+        self.assertEqual(self.emulator.execute_command("cat no_newline.txt missing.txt lines.txt"),
+                         "a\nb\ncat: файл 'missing.txt' не найден\none\ntwo words\nthree\n")
+        self.assertEqual(self.emulator.execute_command("cat lines.txt dir/utf.txt"),
+                         "one\ntwo words\nthree\nпривет, мир\n")
+        self.assertEqual(self.emulator.execute_command("wc -l lines.txt no_newline.txt"),
+                         "3 lines.txt\n1 no_newline.txt")
+        self.assertEqual(self.emulator.execute_command("head -n 1 lines.txt no_newline.txt"),
+                         "==> lines.txt <==\none\n\n==> no_newline.txt <==\na\n")
+
+    # Сжатые архивы не отображаются в память
+    def test_compressed_archive(self):
+        gz_path = os.path.join(self.tmp_dir.name, "vfs.tar.gz")
+        make_tar(gz_path, {"a.txt": b"hello"}, mode="w:gz")
+        emulator = ShellEmulator(gz_path, os.path.join(self.tmp_dir.name, "log.jsonl"), use_index=True)
+        self.assertIn("несжатых архивов", emulator.execute_command("cat a.txt"))
+        emulator.close()
+
+
+class TestCommandWorker(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.emulator = ShellEmulator("vfs.tar", os.path.join(self.tmp_dir.name, "log.jsonl"))
+        self.worker = CommandWorker(self.emulator)
+
+    def tearDown(self):
+        self.worker.stop()
+        self.worker.thread.join(timeout=5)
+        self.emulator.close()
+        self.tmp_dir.cleanup()
+
+    def collect(self, until):
+        """Забирает сообщения рабочего потока до сообщения указанного типа."""
+        messages = []
+        while True:
+            message = self.worker.output.get(timeout=5)
+            messages.append(message)
+            if message[0] == until:
+                return messages
+
+    # Вывод команды приходит через очередь, команды выполняются по порядку
+    def test_commands_are_streamed(self):
+        self.worker.submit("ls")
+        self.worker.submit("cd subdir")
+        messages = self.collect(DONE) + self.collect(DONE)
+        self.assertEqual(messages[0], (COMMAND, "ls"))
+        self.assertIn("file.txt", messages[1][1])
+        self.assertEqual(messages[3], (COMMAND, "cd subdir"))
+        self.assertEqual(self.emulator.current_dir, "/subdir")
+
+    # Выполняющаяся команда прерывается между порциями вывода
+    def test_cancel(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_stream(command):
+            started.set()
+            release.wait(5)
+            for i in range(1000):
+                yield f"chunk {i}\n"
+
+        self.emulator.stream_command = slow_stream
+        self.worker.submit("cat huge")
+        started.wait(5)
+        self.worker.cancel()
+        release.set()
+        messages = self.collect(CANCELLED)
+        self.assertNotIn(OUTPUT, [kind for kind, _ in messages])
+
+    # Команда без потокового вывода (ls большого каталога) прерывается внутри обхода
+    def test_cancel_listing(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def huge_dir(path):
+            for i in range(5000):
+                if i == 1:
+                    started.set()
+                    release.wait(5)
+                yield SimpleNamespace(name=f"/big/file{i}", type="file")
+
+        with patch.object(self.emulator.fs, "list_dir", huge_dir):
+            self.worker.submit("ls big")
+            started.wait(5)
+            self.worker.cancel()
+            release.set()
+            messages = self.collect(CANCELLED)
+        self.assertEqual(messages, [(COMMAND, "ls big"), (CANCELLED, "ls big")])
+
+        # Отмена относится только к прерванной команде
+        self.worker.submit("ls")
+        self.assertIn("file.txt", self.collect(DONE)[1][1])
+
+    # shutdown отбрасывает очередь, прерывает текущую команду и дожидается потока
+    def test_shutdown(self):
+        started = threading.Event()
+
+        def slow_stream(command):
+            started.set()
+            for i in range(1000):
+                time.sleep(0.001)
+                yield f"chunk {i}\n"
+
+        self.emulator.stream_command = slow_stream
+        self.worker.submit("cat huge")
+        self.worker.submit("ls")
+        started.wait(5)
+        self.assertTrue(self.worker.shutdown(timeout=5))
+        kinds = []
+        while not self.worker.output.empty():
+            kinds.append(self.worker.output.get_nowait())
+        self.assertEqual(kinds[-1], (CANCELLED, "cat huge"))
+
+    # Команда exit завершает рабочий поток
+    def test_exit(self):
+        self.worker.submit("exit")
+        self.assertEqual(self.collect(EXIT)[-1], (EXIT, "exit"))
+        self.worker.thread.join(timeout=5)
+        self.assertFalse(self.worker.thread.is_alive())
+
+
+class TestBatchRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_script(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    # Пустые строки и комментарии пропускаются
+    def test_read_script(self):
+        self.assertEqual(read_script(["ls\n", "\n", "# комментарий\n", "  cd subdir \n"]), ["ls", "cd subdir"])
+
+    # Команды выполняются без GUI, вывод и задержки собираются
+    def test_run_script(self):
+        emulator = ShellEmulator("vfs.tar", os.devnull, log_format="jsonl")
+        output = io.StringIO()
+        timings = {}
+        executed = run_script(emulator, ["ls", "cd subdir", "ls", "exit", "ls"], timings, output)
+        emulator.close()
+
+        self.assertEqual(executed, 4)  # После exit команды не выполняются
+        self.assertIn("$ cd subdir\nТекущий каталог: /subdir\n", output.getvalue())
+        self.assertEqual(len(timings["ls"]), 2)
+        self.assertEqual(set(timings), {"ls", "cd", "exit"})
+
+    # Скрипты выполняются параллельно, у каждого свой эмулятор
+    def test_run_parallel(self):
+        first = self.write_script("first.sh", "cd subdir\nls\n")
+        second = self.write_script("second.sh", "ls\ncal\nls\n")
+        timings, total_commands, elapsed = run_parallel([first, second], os.path.abspath("vfs.tar"), jobs=2)
+        self.assertEqual(total_commands, 5)
+        self.assertEqual(len(timings["ls"]), 3)
+        self.assertIn("команд/с", format_report(timings, total_commands, elapsed))
+
+    # --jobs больше 1 без файлов скриптов отклоняется, а не выполняет 0 команд
+    def test_jobs_require_scripts(self):
+        with patch("sys.stderr", io.StringIO()) as stderr, self.assertRaises(SystemExit):
+            batch_args(["--jobs", "2"])
+        self.assertIn("--jobs", stderr.getvalue())
+        self.assertEqual(batch_args(["--jobs", "2", "a.sh"]).jobs, 2)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.99), 7)
+
+
+class TestRecursiveCommands(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar")
+        make_tar(vfs_path, {
+            "a.txt": b"12345",
+            "docs/readme.md": b"123",
+            "docs/guide/intro.md": b"1234567",
+            "docs/guide/notes.txt": b"12",
+            "src/main.py": b"1",
+        })
+        self.emulator = ShellEmulator(vfs_path, os.path.join(self.tmp_dir.name, "log.jsonl"))
+
+    def tearDown(self):
+        self.emulator.close()
+        self.tmp_dir.cleanup()
+
+    # Итоги по каталогам считаются один раз при загрузке
+    def test_totals(self):
+        totals = self.emulator.index.totals
+        self.assertEqual(totals[""], (18, 5, 3))
+        self.assertEqual(totals["docs"], (12, 3, 1))
+        self.assertEqual(totals["docs/guide"], (9, 2, 0))
+
+    def test_du(self):
+        self.assertEqual(self.emulator.execute_command("du -s docs"), "12\t/docs")
+        self.assertEqual(self.emulator.execute_command("du -s a.txt src"), "5\t/a.txt\n1\t/src")
+        self.assertEqual(
+            self.emulator.execute_command("du docs").split("\n"), ["12\t/docs", "9\t/docs/guide"]
+        )
+        self.assertIn("не существует", self.emulator.execute_command("du -s missing"))
+
+    def test_find(self):
+        self.assertEqual(
+            self.emulator.execute_command("find / -name *.md").split("\n"),
+            ["/docs/readme.md", "/docs/guide/intro.md"],
+        )
+        self.assertEqual(self.emulator.execute_command("find docs -type d").split("\n"), ["/docs", "/docs/guide"])
+        self.emulator.execute_command("cd docs")
+        self.assertEqual(self.emulator.execute_command("find -name notes.txt"), "/docs/guide/notes.txt")
+
+    # Шаблон в кавычках разбирается так же, как в оболочке
+    def test_find_quoted_pattern(self):
+        expected = ["/docs/readme.md", "/docs/guide/intro.md"]
+        self.assertEqual(self.emulator.execute_command("find / -name '*.md'").split("\n"), expected)
+        self.assertEqual("".join(self.emulator.stream_command('find / -name "*.md"')).split("\n"), expected)
+        self.assertEqual(self.emulator.execute_command("find / -name '*.md"), "find: незакрытая кавычка")
+
+    def test_tree(self):
+        expected = """/docs
+├── readme.md
+└── guide
+    ├── intro.md
+    └── notes.txt
+
+1 каталогов, 3 файлов"""
+        self.assertEqual(self.emulator.execute_command("tree docs"), expected)
+
+    # Вывод отдаётся порциями, а не одной строкой
+    def test_find_is_streamed(self):
+        with patch("emulator.LINES_PER_CHUNK", 2):
+            chunks = list(self.emulator.stream_command("find /"))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks).split("\n")[:3], ["/", "/a.txt", "/docs"])
+
+
+class TestOwners(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar")
+        make_tar(self.vfs_path, {"a.txt": b"", "dir/b.txt": b"", "dir/sub/c.txt": b"", "other/d.txt": b""})
+        self.emulator = self.make_emulator()
+
+    def tearDown(self):
+        self.emulator.close()
+        self.tmp_dir.cleanup()
+
+    def make_emulator(self):
+        return ShellEmulator(self.vfs_path, os.path.join(self.tmp_dir.name, "log.jsonl"),
+                             owners_file=self.owners_file)
+
+    @property
+    def owners_file(self):
+        return os.path.join(self.tmp_dir.name, "vfs.tar.owners")
+
+    # Хранятся только изменённые записи, имена владельцев не дублируются
+    def test_sparse_overrides(self):
+        self.assertEqual(self.emulator.owners.overrides, {})
+        self.emulator.execute_command("chown a.txt alice")
+        self.emulator.execute_command("chown dir/b.txt alice")
+        self.assertEqual(self.emulator.owners.names, ["default_owner", "alice"])
+        self.assertEqual(self.emulator.owners.overrides, {"a.txt": 1, "dir/b.txt": 1})
+        self.assertEqual(self.emulator.get_owner("/a.txt"), "alice")
+        self.assertEqual(self.emulator.get_owner("other/d.txt"), "default_owner")
+
+    # Путь разрешается относительно текущего каталога
+    def test_chown_relative(self):
+        self.emulator.execute_command("cd dir")
+        result = self.emulator.execute_command("chown b.txt bob")
+        self.assertIn("переданы пользователю bob", result)
+        self.assertEqual(self.emulator.get_owner("/dir/b.txt"), "bob")
+
+    # chown -R меняет владельца всего поддерева и не затрагивает остальное
+    def test_chown_recursive(self):
+        result = self.emulator.execute_command("chown -R dir carol")
+        self.assertIn("переданы пользователю carol", result)
+        for path in ("dir", "dir/b.txt", "dir/sub", "dir/sub/c.txt"):
+            self.assertEqual(self.emulator.get_owner(path), "carol")
+        self.assertEqual(self.emulator.get_owner("other/d.txt"), "default_owner")
+        self.assertIn("не найден", self.emulator.execute_command("chown -R missing carol"))
+
+    # Изменения сохраняются при закрытии и применяются при следующей загрузке
+    def test_persisted(self):
+        self.emulator.execute_command("chown -R dir carol")
+        self.emulator.execute_command("chown dir/b.txt default_owner")
+        self.assertFalse(os.path.exists(self.owners_file))
+        self.emulator.close()
+        reloaded = self.make_emulator()
+        self.assertEqual(reloaded.get_owner("dir/sub/c.txt"), "carol")
+        self.assertEqual(reloaded.get_owner("dir/b.txt"), "default_owner")
+        self.assertNotIn("dir/b.txt", reloaded.owners.overrides)
+        reloaded.close()
+
+    # Без owners_file владельцы не сохраняются
+    def test_not_persisted_by_default(self):
+        emulator = ShellEmulator(self.vfs_path, os.path.join(self.tmp_dir.name, "log.jsonl"))
+        emulator.execute_command("chown a.txt alice")
+        emulator.close()
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ["log.jsonl", "vfs.tar"])
+
+    # rm забывает владельцев поддерева, mv переносит их на новый путь
+    def test_rm_and_mv(self):
+        self.emulator.execute_command("chown -R dir carol")
+        self.emulator.execute_command("chown a.txt alice")
+        self.emulator.execute_command("mv dir other")
+        self.assertEqual(self.emulator.get_owner("other/dir/sub/c.txt"), "carol")
+        self.assertNotIn("dir/b.txt", self.emulator.owners.overrides)
+        self.emulator.execute_command("rm a.txt")
+        self.emulator.execute_command("touch a.txt")
+        self.assertEqual(self.emulator.get_owner("a.txt"), "default_owner")
+        self.emulator.execute_command("rm -r other")
+        self.emulator.execute_command("mkdir other")
+        self.assertEqual(self.emulator.owners.overrides, {})
+
+
+class TestOverlay(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar")
+        make_tar(self.vfs_path, {
+            "a.txt": b"base a\n",
+            "dir/b.txt": b"base b\n",
+            "dir/sub/c.txt": b"ccc",
+        })
+        with open(self.vfs_path, "rb") as file:
+            self.original = file.read()
+        self.emulator = ShellEmulator(self.vfs_path, os.path.join(self.tmp_dir.name, "log.jsonl"))
+
+    def tearDown(self):
+        self.emulator.close()
+        self.tmp_dir.cleanup()
+
+    def run_commands(self, *commands):
+        return [self.emulator.execute_command(command) for command in commands]
+
+    def test_touch_mkdir_echo(self):
+        self.run_commands("mkdir new", "touch new/empty.txt", "echo hello world > new/hi.txt", "echo again >> new/hi.txt")
+        self.assertEqual(self.emulator.execute_command("ls new").split("\n"), ["empty.txt", "hi.txt"])
+        self.assertEqual(self.emulator.execute_command("cat new/hi.txt"), "hello world\nagain\n")
+        self.assertEqual(self.emulator.execute_command("echo just text"), "just text")
+        self.assertIn("нет такого каталога", self.emulator.execute_command("mkdir x/y"))
+        self.emulator.execute_command("mkdir -p x/y/z")
+        self.assertTrue(self.emulator.directory_exists("/x/y/z"))
+
+    # Кавычки сохраняют пробелы и не попадают в файл
+    def test_quoted_arguments(self):
+        self.run_commands('echo "a  b" > quoted.txt', "touch 'my file.txt'", "echo 'x > y'")
+        self.assertEqual(self.emulator.execute_command("cat quoted.txt"), "a  b\n")
+        self.assertIn("my file.txt", self.emulator.execute_command("ls").split("\n"))
+        self.assertEqual(self.emulator.execute_command("echo 'x  >  y'"), "x  >  y")
+        self.assertEqual(self.emulator.execute_command('echo "open'), "echo: незакрытая кавычка")
+
+    # Изменение файла архива: новое содержимое в слое, архив не трогается
+    def test_append_to_base_file(self):
+        self.emulator.execute_command("echo more >> a.txt")
+        self.assertEqual(self.emulator.execute_command("cat a.txt"), "base a\nmore\n")
+        self.assertEqual(self.emulator.execute_command("du -s /"), f"{7 + 5 + 7 + 3}\t/")
+
+    def test_rm(self):
+        self.assertIn("используйте rm -r", self.emulator.execute_command("rm dir"))
+        self.emulator.execute_command("rm a.txt")
+        self.assertEqual(self.emulator.execute_command("ls"), "dir/")
+        self.assertIn("не найден", self.emulator.execute_command("cat a.txt"))
+
+        self.emulator.execute_command("rm -r dir")
+        self.assertEqual(self.emulator.execute_command("ls"), "Нет файлов в директории")
+        self.assertEqual(self.emulator.execute_command("du -s /"), "0\t/")
+
+        # Заново созданный каталог не показывает удалённое содержимое архива
+        self.emulator.execute_command("mkdir dir")
+        self.assertEqual(self.emulator.execute_command("ls dir"), "Нет файлов в директории")
+        self.assertIn("нет такого каталога", self.emulator.execute_command("cd dir/sub"))
+
+    def test_mv(self):
+        self.emulator.execute_command("mv a.txt dir/renamed.txt")
+        self.assertEqual(self.emulator.execute_command("cat dir/renamed.txt"), "base a\n")
+        self.assertIn("не найден", self.emulator.execute_command("cat a.txt"))
+
+        self.emulator.execute_command("mkdir target")
+        self.emulator.execute_command("mv dir target")
+        self.assertEqual(self.emulator.execute_command("ls"), "target/")
+        self.assertEqual(self.emulator.execute_command("cat target/dir/sub/c.txt"), "ccc")
+        self.assertEqual(self.emulator.fs.total("target"), (17, 3, 2))
+        self.assertIn("нельзя переместить", self.emulator.execute_command("mv target target/dir"))
+
+    # Итоги du и tree учитывают изменения
+    def test_totals_follow_changes(self):
+        self.run_commands("echo 12345 > dir/sub/new.txt", "rm dir/b.txt")
+        self.assertEqual(self.emulator.fs.total("dir"), (3 + 6, 2, 1))
+        self.assertEqual(self.emulator.fs.total(""), (7 + 3 + 6, 3, 2))
+        self.assertTrue(self.emulator.execute_command("tree dir").endswith("1 каталогов, 2 файлов"))
+
+    # commit записывает объединённый архив, исходный архив не меняется
+    def test_commit(self):
+        self.run_commands("rm -r dir/sub", "echo new > dir/new.txt", "mv a.txt moved.txt", "mkdir empty")
+        committed = os.path.join(self.tmp_dir.name, "out.tar")
+        self.assertIn("Изменения сохранены", self.emulator.execute_command(f"commit {committed}"))
+
+        with open(self.vfs_path, "rb") as file:
+            self.assertEqual(file.read(), self.original)
+        with tarfile.open(committed) as tar:
+            names = {member.name: member for member in tar.getmembers()}
+            self.assertEqual(set(names), {"dir", "dir/b.txt", "dir/new.txt", "moved.txt", "empty"})
+            self.assertTrue(names["empty"].isdir())
+            self.assertEqual(tar.extractfile("moved.txt").read(), b"base a\n")
+            self.assertEqual(tar.extractfile("dir/new.txt").read(), b"new\n")
+        self.assertIn("нельзя перезаписать", self.emulator.execute_command(f"commit {self.vfs_path}"))
+
+
+class TestEmulatorServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        vfs_path = os.path.join(self.tmp_dir.name, "vfs.tar")
+        make_tar(vfs_path, {"a.txt": b"hello\n", "dir/b.txt": b""})
+        self.shared = SharedVFS(vfs_path)
+        self.server = EmulatorServer(self.shared)
+        self.address = {"unix_path": os.path.join(self.tmp_dir.name, "emulator.sock")}
+        await self.server.start(**self.address)
+
+    async def asyncTearDown(self):
+        await self.server.close()
+        self.shared.close()
+        self.tmp_dir.cleanup()
+
+    async def execute(self, connection, command):
+        """Отправляет команду и собирает ответ сервера."""
+        connection.writer.write(command.encode("utf-8") + b"\n")
+        await connection.writer.drain()
+        chunks = []
+        while True:
+            message = await connection.receive()
+            if "chunk" in message:
+                chunks.append(message["chunk"])
+            else:
+                return "".join(chunks), message
+
+    # Сессии разделяют индекс, но каталог и слой изменений у каждой свои
+    async def test_sessions_are_isolated(self):
+        first = await Connection.open(self.address)
+        second = await Connection.open(self.address)
+
+        output, message = await self.execute(first, "cd dir")
+        self.assertEqual(message, {"done": True, "cwd": "/dir"})
+        await self.execute(first, "touch only_first.txt")
+        output, _ = await self.execute(second, "ls")
+        self.assertEqual(output.split("\n"), ["a.txt", "dir/"])
+        output, _ = await self.execute(second, "ls dir")
+        self.assertEqual(output, "b.txt")
+        output, _ = await self.execute(second, "cat a.txt")
+        self.assertEqual(output, "hello\n")
+
+        emulators = list(self.server.sessions.values())
+        self.assertEqual(len(emulators), 2)
+        self.assertIs(emulators[0].index, emulators[1].index)
+        self.assertIsNot(emulators[0].fs, emulators[1].fs)
+
+        await first.close()
+        await second.close()
+
+    # exit закрывает сессию, но не общий архив
+    async def test_exit(self):
+        first = await Connection.open(self.address)
+        _, message = await self.execute(first, "exit")
+        self.assertEqual(message, {"exit": True})
+        await first.close()
+
+        second = await Connection.open(self.address)
+        output, _ = await self.execute(second, "cat a.txt")
+        self.assertEqual(output, "hello\n")
+        await second.close()
+
+    # exit выполняет сервер: эмулятор не печатает сообщение и не завершает процесс
+    async def test_exit_does_not_print(self):
+        connection = await Connection.open(self.address)
+        with patch("builtins.print") as printed, patch("builtins.exit") as exited:
+            _, message = await self.execute(connection, "exit")
+        self.assertEqual(message, {"exit": True})
+        printed.assert_not_called()
+        exited.assert_not_called()
+        await connection.close()
+
+    # Исключение команды приходит клиенту сообщением, а сессия продолжается
+    async def test_command_error(self):
+        connection = await Connection.open(self.address)
+        emulator = self.server.sessions[1]
+        with patch.object(emulator, "stream_command", side_effect=RuntimeError("сбой")):
+            _, message = await self.execute(connection, "ls")
+        self.assertEqual(message, {"error": "RuntimeError: сбой"})
+        self.assertEqual(await connection.receive(), {"done": True, "cwd": "/"})
+        output, _ = await self.execute(connection, "cat a.txt")
+        self.assertEqual(output, "hello\n")
+        await connection.close()
+
+    # Долгая команда одной сессии выполняется в пуле потоков и не задерживает другие сессии
+    async def test_slow_command_does_not_block_others(self):
+        first = await Connection.open(self.address)
+        second = await Connection.open(self.address)
+        release = threading.Event()
+        slow = self.server.sessions[1]
+        original = slow.stream_command
+
+        def blocking(command):
+            release.wait(5)
+            yield from original(command)
+
+        slow.stream_command = blocking
+        first.writer.write(b"cat a.txt\n")
+        await first.writer.drain()
+        output, _ = await asyncio.wait_for(self.execute(second, "cat a.txt"), 2)
+        self.assertEqual(output, "hello\n")
+        release.set()
+        output, message = await self.execute(first, "")
+        self.assertEqual(output, "hello\n")
+        await first.close()
+        await second.close()
+
+    # Логи сессий сбрасывает общий цикл сервера, а не поток-таймер в каждой сессии
+    async def test_shared_log_flush(self):
+        log_dir = os.path.join(self.tmp_dir.name, "logs")
+        os.makedirs(log_dir)
+        self.server.log_dir = log_dir
+        connection = await Connection.open(self.address)
+        await self.execute(connection, "ls")
+        emulator = next(iter(self.server.sessions.values()))
+        self.assertIsNone(emulator.log.timer)
+        with patch("server.LOG_FLUSH_INTERVAL", 0.01):
+            self.server.flusher.cancel()
+            self.server.flusher = asyncio.create_task(self.server.flush_logs_periodically())
+            await asyncio.sleep(0.1)
+        self.assertEqual(len(list(read_log(os.path.join(log_dir, "session_1.jsonl")))), 1)
+        await connection.close()
+
+
+class TestArchiveBuilder(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp_dir.name, "src")
+        self.files = {
+            "b.txt": b"bbb\n",
+            "a/z.txt": b"z" * 1000,
+            "a/sub/deep.txt": b"deep\n",
+            "a-b.txt": b"",
+            "файл.txt": "привет\n".encode("utf-8"),
+        }
+        for name, data in self.files.items():
+            path = os.path.join(self.source, *name.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(data)
+        os.makedirs(os.path.join(self.source, "empty"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def output(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    # Каталоги — отдельные записи, порядок отсортирован, метаданные нормализованы
+    def test_members(self):
+        vfs_path = self.output("vfs.tar")
+        build_archive(self.source, vfs_path, jobs=2)
+        with tarfile.open(vfs_path) as tar:
+            members = tar.getmembers()
+            self.assertEqual([(m.name, m.isdir()) for m in members], [
+                ("a", True), ("a/sub", True), ("a/sub/deep.txt", False), ("a/z.txt", False),
+                ("a-b.txt", False), ("b.txt", False), ("empty", True), ("файл.txt", False),
+            ])
+            self.assertEqual({(m.mtime, m.uid, m.gid, m.uname, m.gname) for m in members}, {(0, 0, 0, "", "")})
+            self.assertEqual(tar.extractfile("a/z.txt").read(), self.files["a/z.txt"])
+        self.assertEqual([entry.name for entry in scan_tree(self.source)], [m.name for m in members])
+
+    # Повторная сборка даёт побайтно тот же архив, в том числе сжатый
+    def test_reproducible(self):
+        for name in ("vfs.tar", "vfs.tar.gz", "vfs.tar.xz"):
+            first, second = self.output("1-" + name), self.output("2-" + name)
+            build_archive(self.source, first, compression=compression_of(name), jobs=4)
+            os.utime(os.path.join(self.source, "b.txt"), (1, 1))
+            build_archive(self.source, second, compression=compression_of(name), jobs=1, buffer_size=10)
+            with open(first, "rb") as a, open(second, "rb") as b:
+                self.assertEqual(a.read(), b.read(), name)
+
+    # Файл-индекс совпадает с построенным по архиву, и эмулятор использует его
+    def test_index(self):
+        vfs_path = self.output("vfs.tar")
+        index = build_archive(self.source, vfs_path, jobs=2, buffer_size=100)
+        self.assertEqual(index.entries, VFSIndex.from_stream(vfs_path).entries)
+        with patch.object(VFSIndex, "from_stream", side_effect=AssertionError("архив не должен читаться")):
+            emulator = ShellEmulator(vfs_path, self.output("log.jsonl"), use_index=True)
+        self.assertEqual(emulator.execute_command("cat a/sub/deep.txt"), "deep\n")
+        self.assertEqual(emulator.execute_command("ls empty"), "Нет файлов в директории")
+        emulator.close()
+
+    # Индекс архива zstd перестраивается потоковым проходом, если файла-индекса нет
+    @unittest.skipIf(create_archive.zstandard is None, "нужен пакет zstandard")
+    def test_zstd_index_rebuilt(self):
+        vfs_path = self.output("vfs.tar.zst")
+        index = build_archive(self.source, vfs_path, compression="zst", jobs=2)
+        os.remove(index_path(vfs_path))
+        self.assertEqual(VFSIndex.load(vfs_path).entries, index.entries)
+        self.assertTrue(os.path.exists(index_path(vfs_path)))
+        emulator = ShellEmulator(vfs_path, self.output("log.jsonl"), use_index=True)
+        self.assertEqual(emulator.execute_command("ls a").split("\n"), ["sub/", "z.txt"])
+        emulator.close()
+
+    # Без пакета zstandard архив zstd не читается, а ошибка объясняет почему
+    def test_zstd_without_package(self):
+        vfs_path = self.output("vfs.tar.zst")
+        with open(vfs_path, "wb") as file:
+            file.write(vfs_index.ZSTD_MAGIC + bytes(64))
+        with patch("vfs_index.zstandard", None):
+            with self.assertRaisesRegex(tarfile.ReadError, "zstandard"):
+                VFSIndex.from_stream(vfs_path)
+
+    def test_cli(self):
+        vfs_path = self.output("vfs.tar.gz")
+        with patch("builtins.print"):
+            self.assertEqual(create_archive.main([self.source, vfs_path, "--jobs", "2"]), 0)
+            self.assertEqual(create_archive.main([self.output("missing"), vfs_path]), 1)
+            self.assertEqual(create_archive.main([self.source, self.output("vfs.tar.zst"), "--compression", "zst"]),
+                             0 if create_archive.zstandard is not None else 1)
+        self.assertTrue(os.path.exists(index_path(vfs_path)))
+        self.assertFalse(os.path.exists(self.output("vfs.tar.zst.tmp")))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,254 @@
+import json
+import os
+import posixpath
+import tarfile
+from collections import namedtuple
+
+try:
+    import zstandard  # Необязательная зависимость: чтение архивов zstd
+except ImportError:
+    zstandard = None
+
+# Типы записей индекса
+FILE = "f"
+DIR = "d"
+
+# Запись индекса: нормализованный путь, смещение данных в архиве, размер и тип
+VFSEntry = namedtuple("VFSEntry", ["name", "offset", "size", "type"])
+
+# Версия формата файла-индекса; при изменении формата старые индексы перестраиваются
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx"
+# Сигнатура сжатия zstd: tarfile его не распознаёт, поток распаковывается пакетом zstandard
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def normalize_path(path):
+    """Приводит путь к виду ключа индекса: без ведущего и замыкающего '/', корень — пустая строка"""
+    path = posixpath.normpath("/" + path)
+    return path.lstrip("/")
+
+
+class VFSIndex:
+    """
+    Индекс каталогов виртуальной файловой системы.
+
+    Строится один раз при загрузке архива: для каждого каталога хранится список
+    непосредственных потомков, поэтому проверка существования стоит O(глубина пути),
+    а листинг — O(число результатов). Для каждого каталога также один раз
+    считаются суммарный размер и число файлов и каталогов во всём поддереве.
+    """
+
+    def __init__(self):
+        self.entries = {"": VFSEntry("", 0, 0, DIR)}
+        self.children = {"": []}
+        self.totals = {}
+
+    @classmethod
+    def from_tar(cls, tar):
+        """Строит индекс по открытому архиву tar за один проход по его элементам"""
+        index = cls()
+        for member in tar:
+            index.add(member.name, member.offset_data, member.size, DIR if member.isdir() else FILE)
+        index.compute_totals()
+        return index
+
+    @classmethod
+    def from_stream(cls, vfs_path):
+        """
+        Строит индекс за один последовательный проход по архиву (в том числе сжатому, включая zstd).
+
+        Архив читается в потоковом режиме, а прочитанные заголовки сразу
+        отбрасываются, поэтому в памяти остаётся только сам индекс.
+        Смещения считаются в распакованном потоке tar.
+        """
+        index = cls()
+        with open(vfs_path, "rb") as raw:
+            zstd = raw.read(len(ZSTD_MAGIC)) == ZSTD_MAGIC
+            raw.seek(0)
+            if zstd:
+                if zstandard is None:
+                    raise tarfile.ReadError("для чтения архива zstd нужен пакет zstandard (pip install zstandard)")
+                stream = zstandard.ZstdDecompressor().stream_reader(raw)
+                tar = tarfile.open(fileobj=stream, mode="r|")
+            else:
+                tar = tarfile.open(fileobj=raw, mode="r|*")
+            with tar:
+                member = tar.next()
+                while member is not None:
+                    index.add(member.name, member.offset_data, member.size, DIR if member.isdir() else FILE)
+                    tar.members.clear()
+                    member = tar.next()
+        index.compute_totals()
+        return index
+
+    @classmethod
+    def load(cls, vfs_path):
+        """
+        Загружает индекс из файла рядом с архивом.
+
+        Если файла нет или он устарел (изменились время модификации или размер
+        архива), индекс строится заново потоковым проходом и сохраняется.
+        """
+        stat = os.stat(vfs_path)
+        index = cls.read(index_path(vfs_path), stat)
+        if index is None:
+            index = cls.from_stream(vfs_path)
+            try:
+                index.save(index_path(vfs_path), stat)
+            except OSError:
+                pass  # Каталог архива может быть недоступен для записи
+        return index
+
+    @classmethod
+    def read(cls, path, stat=None):
+        """Читает файл-индекс; возвращает None, если его нет или он не соответствует архиву"""
+        try:
+            file = open(path, "r", encoding="ascii")
+        except FileNotFoundError:
+            return None
+
+        # Оборванная или испорченная строка (в том числе не-ASCII байты) — повод перестроить индекс
+        with file:
+            try:
+                header = json.loads(file.readline())
+                if not isinstance(header, dict) or header.get("version") != INDEX_VERSION:
+                    return None
+                if stat is not None and (header.get("mtime_ns"), header.get("size")) != (stat.st_mtime_ns, stat.st_size):
+                    return None
+
+                index = cls()
+                for line in file:
+                    if not line.endswith("\n"):
+                        return None  # Запись оборвана посередине
+                    entry_type, offset, size, name = line[:-1].split("\t", 3)
+                    index.add(_unescape(name), int(offset), int(size), entry_type)
+            except ValueError:
+                return None
+        index.compute_totals()
+        return index
+
+    def save(self, path, stat):
+        """
+        Сохраняет индекс: строка-заголовок с версией и параметрами архива,
+        затем по строке на запись: тип, смещение данных, размер, имя.
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="ascii") as file:
+            file.write(json.dumps({"version": INDEX_VERSION, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}) + "\n")
+            for entry in self.entries.values():
+                if entry.name:
+                    file.write(f"{entry.type}\t{entry.offset}\t{entry.size}\t{_escape(entry.name)}\n")
+        os.replace(tmp_path, path)
+
+    def add(self, name, offset=0, size=0, entry_type=FILE):
+        """Добавляет запись в индекс, создавая недостающие родительские каталоги"""
+        path = normalize_path(name)
+        if not path:
+            return
+        parent, base = posixpath.split(path)
+        if not self._ensure_dir(parent):
+            return
+
+        existing = self.entries.get(path)
+        if existing is None:
+            self.children[parent].append(base)
+        elif existing.type != entry_type:
+            # Конфликт файла и каталога с одним именем: оставляем первую запись
+            return
+
+        self.entries[path] = VFSEntry(path, offset, size, entry_type)
+        if entry_type == DIR:
+            self.children.setdefault(path, [])
+
+    def _ensure_dir(self, path):
+        """Создаёт неявные каталоги для пути; возвращает False, если путь занят файлом"""
+        missing = []
+        while path not in self.entries:
+            missing.append(path)
+            path = posixpath.dirname(path)
+        if self.entries[path].type != DIR:
+            return False
+
+        for path in reversed(missing):
+            parent, base = posixpath.split(path)
+            self.children[parent].append(base)
+            self.entries[path] = VFSEntry(path, 0, 0, DIR)
+            self.children[path] = []
+        return True
+
+    def compute_totals(self):
+        """
+        Считает для каждого каталога (размер, число файлов, число каталогов) поддерева.
+
+        Родитель всегда добавляется в индекс раньше потомков, поэтому при обходе
+        записей в обратном порядке итоги каталога готовы до того, как они
+        прибавляются к родителю: один проход O(число записей).
+        """
+        totals = {path: [0, 0, 0] for path in self.children}
+        for path, entry in reversed(self.entries.items()):
+            if not path:
+                continue
+            parent = totals[posixpath.dirname(path)]
+            if entry.type == DIR:
+                size, files, dirs = totals[path]
+                parent[0] += size
+                parent[1] += files
+                parent[2] += dirs + 1
+            else:
+                parent[0] += entry.size
+                parent[1] += 1
+        self.totals = {path: tuple(values) for path, values in totals.items()}
+
+    def total(self, path):
+        """Итоги (размер, файлы, каталоги) поддерева каталога"""
+        return self.totals.get(normalize_path(path), (0, 0, 0))
+
+    def get(self, path):
+        """Возвращает запись по пути или None"""
+        return self.entries.get(normalize_path(path))
+
+    def exists(self, path):
+        """Проверяет, существует ли файл или каталог"""
+        return normalize_path(path) in self.entries
+
+    def is_dir(self, path):
+        """Проверяет, является ли путь каталогом"""
+        entry = self.entries.get(normalize_path(path))
+        return entry is not None and entry.type == DIR
+
+    def list_dir(self, path):
+        """Возвращает записи непосредственных потомков каталога или None, если каталога нет"""
+        path = normalize_path(path)
+        names = self.children.get(path)
+        if names is None:
+            return None
+        return [self.entries[posixpath.join(path, name)] for name in names]
+
+    def walk(self, path):
+        """Генератор записей поддерева в прямом порядке обхода (сам каталог — первым)"""
+        path = normalize_path(path)
+        entry = self.entries.get(path)
+        if entry is None:
+            return
+        stack = [entry]
+        while stack:
+            entry = stack.pop()
+            yield entry
+            if entry.type == DIR:
+                names = self.children[entry.name]
+                stack.extend(self.entries[posixpath.join(entry.name, name)] for name in reversed(names))
+
+
+def index_path(vfs_path):
+    """Путь к файлу-индексу, который хранится рядом с архивом"""
+    return vfs_path + INDEX_SUFFIX
+
+
+def _escape(name):
+    """Экранирует имя так, чтобы оно помещалось в одну ASCII-строку"""
+    return name.encode("unicode_escape").decode("ascii")
+
+
+def _unescape(name):
+    return name.encode("ascii").decode("unicode_escape")
@@ -0,0 +1,130 @@
+import codecs
+import mmap
+import threading
+
+# Размер порции, которой данные файла отдаются наружу
+CHUNK_SIZE = 64 * 1024
+
+# Сигнатуры сжатых архивов: gzip, bzip2, xz, zstd
+COMPRESSED_MAGIC = (b"\x1f\x8b", b"BZh", b"\xfd7zXZ\x00", b"\x28\xb5\x2f\xfd")
+
+
+def is_compressed(path):
+    """Проверяет по сигнатуре, сжат ли архив"""
+    with open(path, "rb") as file:
+        head = file.read(6)
+    return head.startswith(COMPRESSED_MAGIC)
+
+
+class ArchiveReader:
+    """
+    Доступ к содержимому файлов прямо в отображённом в память несжатом архиве tar.
+
+    Данные файла лежат в архиве непрерывно начиная со смещения из индекса, поэтому
+    файл не извлекается: span() возвращает сам mmap и границы данных, а функции
+    ниже работают с этим диапазоном, просматривая только нужную его часть.
+
+    Сервер разделяет один объект между сессиями в разных потоках, поэтому
+    отображение создаётся под блокировкой и ровно один раз.
+    """
+
+    def __init__(self, vfs_path):
+        self.vfs_path = vfs_path
+        self.file = None
+        self.map = None
+        self.lock = threading.Lock()
+
+    def open(self):
+        """Отображает архив в память при первом обращении"""
+        archive = self.map
+        if archive is not None:
+            return archive
+        with self.lock:
+            if self.map is None:
+                if is_compressed(self.vfs_path):
+                    raise ValueError("чтение содержимого доступно только для несжатых архивов")
+                self.file = open(self.vfs_path, "rb")
+                self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self.map
+
+    def close(self):
+        with self.lock:
+            if self.map is not None:
+                self.map.close()
+                self.file.close()
+                self.map = None
+                self.file = None
+
+    def span(self, entry):
+        """Возвращает (данные, начало, конец) для записи индекса"""
+        return self.open(), entry.offset, entry.offset + entry.size
+
+
+# Функции ниже принимают буфер (mmap или bytes) и диапазон [start, end) в нём
+
+def iter_bytes(data, start, end, chunk_size=CHUNK_SIZE):
+    """
+    Отдаёт байты диапазона порциями memoryview без копирования.
+
+    Порция действительна только до следующего шага итерации, затем она
+    освобождается. После обхода (или закрытия генератора) у mmap не остаётся
+    экспортированных буферов, и его можно закрыть.
+    """
+    with memoryview(data) as view:
+        for pos in range(start, end, chunk_size):
+            with view[pos:min(pos + chunk_size, end)] as chunk:
+                yield chunk
+
+
+def iter_text(data, start, end, chunk_size=CHUNK_SIZE):
+    """Отдаёт диапазон как текст UTF-8 порциями, не разрывая многобайтные символы"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in iter_bytes(data, start, end, chunk_size):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def head_range(data, start, end, lines):
+    """Диапазон первых lines строк; просматриваются только эти строки"""
+    pos = start
+    for _ in range(lines):
+        newline = data.find(b"\n", pos, end)
+        if newline < 0:
+            return start, end
+        pos = newline + 1
+    return start, pos
+
+
+def tail_range(data, start, end, lines):
+    """Диапазон последних lines строк; поиск идёт с конца данных"""
+    if lines <= 0:
+        return end, end
+
+    # Завершающий перевод строки не начинает новую строку
+    search_end = end - 1 if end > start and data[end - 1] == 10 else end
+    for _ in range(lines):
+        newline = data.rfind(b"\n", start, search_end)
+        if newline < 0:
+            return start, end
+        search_end = newline
+    return search_end + 1, end
+
+
+def count(data, start, end):
+    """Подсчитывает строки, слова и байты одним проходом по порциям"""
+    lines = words = 0
+    in_word = False
+    for view in iter_bytes(data, start, end):
+        # Для split нужен bytes, поэтому здесь порция копируется
+        chunk = view.tobytes()
+        lines += chunk.count(b"\n")
+        words += len(chunk.split())
+        # Слово, разрезанное границей порций, посчитано дважды
+        if in_word and not chunk[:1].isspace():
+            words -= 1
+        in_word = not chunk[-1:].isspace()
+    return lines, words, end - start
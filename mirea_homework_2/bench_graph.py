@@ -0,0 +1,147 @@
+import argparse
+import os
+import random
+import time
+import tracemalloc
+from commit_dag import CommitDAG
+from commit_table import CommitTable, format_date
+from graphviz import Digraph
+from graph_render import GraphView, write_dot
+
+"""
+python bench_graph.py
+python bench_graph.py --sizes 10000 100000 --scan-limit 0
+"""
+
+
+def synthetic_log(size, merge_every=10, seed=1):
+    """
+    История из size коммитов в формате iter_commit_log: основная линия,
+    каждый merge_every-й коммит — слияние с одним из недавних коммитов.
+    """
+    rng = random.Random(seed)
+    timestamp = 1609459200
+    hashes = []
+    for i in range(size):
+        commit = f"{rng.getrandbits(160):040x}"
+        parents = [hashes[-1]] if hashes else []
+        if i % merge_every == 0 and len(hashes) > merge_every:
+            parents.append(hashes[-rng.randint(2, merge_every)])
+        hashes.append(commit)
+        timestamp += rng.randint(1, 3600)
+        yield commit, parents, timestamp
+
+
+def measure(build):
+    """
+    Время построения и объём памяти, занятый результатом. Строки хешей
+    создаются заново при каждом построении, как при чтении вывода git.
+    """
+    tracemalloc.start()
+    result = build()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+
+    start = time.perf_counter()
+    result = build()
+    return result, time.perf_counter() - start, memory
+
+
+def build_tuples(log):
+    """Прежнее представление: список кортежей строк"""
+    return [(commit, format_date(timestamp), parents) for commit, parents, timestamp in log]
+
+
+def linear_scan_edges(commits):
+    """Прежний поиск родителя просмотром всего списка на каждое ребро"""
+    edges = 0
+    for i, (commit, date, parent_commits) in enumerate(commits):
+        for parent in parent_commits:
+            parent_index = next((index for index, c in enumerate(commits) if c[0] == parent), None)
+            if parent_index is not None:
+                edges += 1
+    return edges
+
+
+def build_digraph(table):
+    """Прежнее построение графа: объект graphviz.Digraph со всеми узлами и рёбрами в памяти"""
+    dot = Digraph(comment="Git Commit Dependencies")
+    for i in range(len(table)):
+        dot.node(str(i), f"Commit: {table.oid(i)}\nDate: {table.date(i)}")
+    for parent, child in table.edges():
+        dot.edge(str(parent), str(child))
+    return dot
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def stream_dot(table, **options):
+    """Потоковая запись DOT без построения Digraph"""
+    with open(os.devnull, "w") as file:
+        write_dot(GraphView(table, **options), file)
+
+
+def ancestry_queries(dag, count=10_000, seed=2):
+    """Среднее время проверки is_ancestor для случайных пар коммитов, в микросекундах"""
+    rng = random.Random(seed)
+    pairs = [(rng.randrange(len(dag)), rng.randrange(len(dag))) for _ in range(count)]
+    start = time.perf_counter()
+    for a, b in pairs:
+        dag.is_ancestor(a, b)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def run(size, scan_limit, graph_limit):
+    table, table_time, table_memory = measure(lambda: CommitTable.from_log(synthetic_log(size)))
+    tuples, tuples_time, tuples_memory = measure(lambda: build_tuples(synthetic_log(size)))
+    row = {
+        "size": size,
+        "table_time": table_time,
+        "table_memory": table_memory,
+        "tuples_time": tuples_time,
+        "tuples_memory": tuples_memory,
+        "edges_time": timed(lambda: sum(1 for _ in table.edges())),
+        "scan_time": timed(linear_scan_edges, tuples) if size <= scan_limit else None,
+        "graph_time": timed(build_digraph, table) if size <= graph_limit else None,
+        "stream_time": timed(stream_dot, table),
+        "collapsed_time": timed(lambda: stream_dot(table, collapse_chains=True)),
+    }
+    start = time.perf_counter()
+    dag = CommitDAG(table)
+    row["dag_time"] = time.perf_counter() - start
+    row["ancestor_us"] = ancestry_queries(dag)
+    return row
+
+
+def format_optional(value):
+    return f"{value:>12.3f}" if value is not None else f"{'-':>12}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк хранения коммитов и построения графа зависимостей")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Число коммитов")
+    parser.add_argument("--scan-limit", type=int, default=10_000,
+                        help="Наибольший размер, для которого измеряется прежний линейный поиск родителей")
+    parser.add_argument("--graph-limit", type=int, default=100_000,
+                        help="Наибольший размер, для которого строится граф graphviz")
+    args = parser.parse_args()
+
+    print(f"{'коммиты':>10}{'таблица, с':>12}{'таблица, МиБ':>14}{'кортежи, с':>12}{'кортежи, МиБ':>14}"
+          f"{'рёбра, с':>12}{'перебор, с':>12}{'Digraph, с':>12}{'поток DOT, с':>14}{'свёрнутый, с':>14}"
+          f"{'DAG, с':>10}{'предок, мкс':>13}")
+    for size in args.sizes:
+        row = run(size, args.scan_limit, args.graph_limit)
+        print(f"{row['size']:>10}{row['table_time']:>12.3f}{row['table_memory'] / 2**20:>14.1f}"
+              f"{row['tuples_time']:>12.3f}{row['tuples_memory'] / 2**20:>14.1f}"
+              f"{row['edges_time']:>12.3f}{format_optional(row['scan_time'])}{format_optional(row['graph_time'])}"
+              f"{row['stream_time']:>14.3f}{row['collapsed_time']:>14.3f}"
+              f"{row['dag_time']:>10.3f}{row['ancestor_us']:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+from array import array
+from typing import List, Optional, Tuple
+from commit_table import CommitTable
+
+# Версия формата файла кеша: при изменении формата старый кеш игнорируется
+CACHE_VERSION = 1
+DAG_FILE = "dag.bin"
+
+
+class CommitCache:
+    """
+    Кеш разобранной истории репозиториев на диске.
+
+    Для каждого репозитория хранится каталог с файлом dag.bin — таблицей
+    CommitTable всех ранее прочитанных коммитов и списком вершин (tips), из
+    которых они были получены, — и готовыми графами (DOT или JSON) по вершине.
+    Таблица всегда замкнута по предкам: вместе с коммитом в ней есть все его
+    предки, поэтому новой вершине достаточно дочитать коммиты, недостижимые
+    из сохранённых вершин.
+
+    Формат dag.bin: первая строка — заголовок JSON с размерами массивов,
+    за ней подряд байты массивов таблицы.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def repo_dir(self, repo_path: str) -> str:
+        """Каталог кеша репозитория: имя — хеш абсолютного пути к нему"""
+        key = hashlib.sha1(os.path.realpath(repo_path).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, repo_path: str) -> Tuple[CommitTable, List[str]]:
+        """
+        Таблица коммитов и вершины из кеша; пустая таблица, если кеша нет,
+        он устарел или повреждён (обрезан, испорчен заголовок или размеры).
+        """
+        path = os.path.join(self.repo_dir(repo_path), DAG_FILE)
+        if not os.path.isfile(path):
+            return CommitTable(), []
+        try:
+            with open(path, "rb") as file:
+                loaded = read_table(file)
+        except (ValueError, KeyError, TypeError, EOFError):
+            return CommitTable(), []
+        return loaded if loaded is not None else (CommitTable(), [])
+
+    def save(self, repo_path: str, table: CommitTable, tips: List[str]) -> None:
+        """Записывает таблицу атомарно: через временный файл и переименование"""
+        directory = self.repo_dir(repo_path)
+        os.makedirs(directory, exist_ok=True)
+        header = {
+            "version": CACHE_VERSION,
+            "byteorder": sys.byteorder,
+            "repository": os.path.realpath(repo_path),
+            "oid_size": table.oid_size,
+            "count": len(table),
+            "parents": len(table.parent_indexes),
+            "external": len(table.external),
+            "tips": tips,
+        }
+        path = os.path.join(directory, DAG_FILE)
+        with open(path + ".tmp", "wb") as file:
+            file.write(json.dumps(header).encode("utf-8") + b"\n")
+            file.write(table.oids)
+            for column in (table.timestamps, table.parent_offsets, table.parent_indexes):
+                column.tofile(file)
+            file.write(table.external)
+        os.replace(path + ".tmp", path)
+
+    def graph_path(self, repo_path: str, tip: str, variant: str = "") -> str:
+        name = f"{tip}-{variant}" if variant else tip
+        return os.path.join(self.repo_dir(repo_path), f"{name}.graph")
+
+    def get_graph(self, repo_path: str, tip: str, variant: str = "") -> Optional[str]:
+        """
+        Путь к сохранённому исходному тексту графа (DOT или JSON) для вершины
+        или None. variant отличает графы с разными параметрами отрисовки.
+        """
+        path = self.graph_path(repo_path, tip, variant)
+        return path if os.path.isfile(path) else None
+
+    def put_graph(self, repo_path: str, tip: str, source_file: str, variant: str = "") -> None:
+        """Копирует файл с исходным текстом графа в кеш"""
+        path = self.graph_path(repo_path, tip, variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(source_file, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+
+def read_table(file) -> Optional[Tuple[CommitTable, List[str]]]:
+    """
+    Читает dag.bin; None, если кеш другой версии. Размеры массивов сверяются
+    с заголовком, поэтому обрезанный или испорченный файл даёт ValueError или EOFError.
+    """
+    header = json.loads(file.readline())
+    if header.get("version") != CACHE_VERSION or header.get("byteorder") != sys.byteorder:
+        return None
+    count = header["count"]
+    table = CommitTable(header["oid_size"])
+    table.oids = read_bytes(file, count * table.oid_size)
+    table.timestamps = read_array(file, count)
+    table.parent_offsets = read_array(file, count + 1)
+    table.parent_indexes = read_array(file, header["parents"])
+    table.external = read_bytes(file, header["external"])
+    if file.read(1) or table.parent_offsets[-1] != len(table.parent_indexes):
+        raise ValueError("повреждённый файл кеша")
+    tips = header["tips"]
+    if not isinstance(tips, list) or not all(isinstance(tip, str) for tip in tips):
+        raise ValueError("повреждённый список вершин")
+    size = table.oid_size
+    table.index = {bytes(table.oids[i * size:(i + 1) * size]): i for i in range(count)}
+    return table, tips
+
+
+def read_bytes(file, size: int) -> bytearray:
+    data = file.read(size)
+    if len(data) != size:
+        raise EOFError("файл кеша обрезан")
+    return bytearray(data)
+
+
+def read_array(file, count: int) -> array:
+    column = array("q")
+    column.fromfile(file, count)
+    return column
@@ -0,0 +1,229 @@
+import heapq
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from commit_table import CommitTable
+
+# Флаги обхода при поиске общих предков
+PARENT1 = 1
+PARENT2 = 2
+STALE = 4
+
+SECONDS_PER_DAY = 86400
+
+
+class CommitDAG:
+    """
+    Граф коммитов для запросов о предках без повторного обращения к git.
+
+    Строится по CommitTable (родители раньше потомков) за несколько линейных
+    проходов и хранит массивы:
+    - generation — номер поколения: 1 для корней, иначе 1 + максимум по родителям;
+      предок всегда имеет меньший номер, чем потомок;
+    - children — потомки в виде смещений и номеров (как родители в таблице);
+    - pre, post, low — метки обхода в глубину по потомкам (индекс в духе GRAIL).
+      Если b лежит в поддереве обхода a (pre[a] <= pre[b] и post[b] <= post[a]),
+      то a — предок b. Если интервал [low[b], post[b]] не вложен в [low[a], post[a]],
+      то a точно не предок b. Остальные случаи проверяются обходом от b
+      по родителям с отсечением по тем же меткам и поколениям.
+    """
+
+    def __init__(self, table: CommitTable):
+        self.table = table
+        n = len(table)
+        self.generation = array("q", bytes(8 * n))
+        offsets = table.parent_offsets
+        parent_indexes = table.parent_indexes
+        child_count = array("q", bytes(8 * (n + 1)))
+        for i in range(n):
+            generation = 0
+            for k in range(offsets[i], offsets[i + 1]):
+                parent = parent_indexes[k]
+                if parent >= 0:
+                    child_count[parent + 1] += 1
+                    if self.generation[parent] > generation:
+                        generation = self.generation[parent]
+            self.generation[i] = generation + 1
+
+        # Потомки: смещения — накопленные суммы числа потомков
+        for i in range(n):
+            child_count[i + 1] += child_count[i]
+        self.child_offsets = child_count
+        self.child_indexes = array("q", bytes(8 * child_count[n]))
+        fill = array("q", child_count[:n])
+        for parent, child in table.edges():
+            self.child_indexes[fill[parent]] = child
+            fill[parent] += 1
+
+        self._label()
+
+    def _label(self) -> None:
+        """Метки pre/post одного обхода в глубину по потомкам и low — минимум post среди потомков"""
+        n = len(self.table)
+        self.pre = array("q", [-1]) * n
+        self.post = array("q", bytes(8 * n))
+        clock = 0
+        counter = 0
+        offsets = self.child_offsets
+        children = self.child_indexes
+        for root in range(n):
+            if self.pre[root] >= 0:
+                continue
+            self.pre[root] = clock
+            clock += 1
+            stack = [[root, offsets[root]]]
+            while stack:
+                top = stack[-1]
+                node, k = top
+                if k < offsets[node + 1]:
+                    top[1] += 1
+                    child = children[k]
+                    if self.pre[child] < 0:
+                        self.pre[child] = clock
+                        clock += 1
+                        stack.append([child, offsets[child]])
+                else:
+                    stack.pop()
+                    self.post[node] = counter
+                    counter += 1
+
+        # Потомки идут в таблице позже предков, поэтому low считается обратным проходом
+        self.low = array("q", self.post)
+        for i in range(n - 1, -1, -1):
+            low = self.low[i]
+            for k in range(offsets[i], offsets[i + 1]):
+                child_low = self.low[children[k]]
+                if child_low < low:
+                    low = child_low
+            self.low[i] = low
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def index(self, commit: str) -> int:
+        """Номер коммита по полному хешу"""
+        i = self.table.find(commit)
+        if i is None:
+            raise ValueError(f"Коммит {commit} отсутствует в графе")
+        return i
+
+    def parents(self, i: int) -> List[int]:
+        return [parent for parent in self.table.parents(i) if parent >= 0]
+
+    def children(self, i: int) -> array:
+        return self.child_indexes[self.child_offsets[i]:self.child_offsets[i + 1]]
+
+    def _may_reach(self, a: int, b: int) -> bool:
+        """Ложь, если a точно не предок b (по меткам и поколениям)"""
+        return (self.generation[a] < self.generation[b]
+                and self.low[a] <= self.low[b] and self.post[b] <= self.post[a])
+
+    def is_ancestor(self, a: int, b: int) -> bool:
+        """Является ли коммит a предком коммита b (или совпадает с ним)"""
+        if a == b:
+            return True
+        if not self._may_reach(a, b):
+            return False
+        if self.pre[a] <= self.pre[b] and self.post[b] <= self.post[a]:
+            return True  # b в поддереве обхода a
+        seen = {b}
+        stack = [b]
+        while stack:
+            for parent in self.parents(stack.pop()):
+                if parent == a:
+                    return True
+                if parent not in seen and self._may_reach(a, parent):
+                    seen.add(parent)
+                    stack.append(parent)
+        return False
+
+    def merge_bases(self, a: int, b: int) -> List[int]:
+        """
+        Лучшие общие предки a и b — общие предки, не являющиеся предками
+        других общих предков (как git merge-base --all).
+
+        Обход, как в git: коммиты берутся в порядке убывания поколения и помечаются
+        флагами стороны; найденный общий предок помечает своих предков как
+        устаревших, обход заканчивается, когда в очереди остались только они.
+        Если один коммит — предок другого, ответ даёт индекс без обхода.
+        """
+        if self.is_ancestor(a, b):
+            return [a]
+        if self.is_ancestor(b, a):
+            return [b]
+        flags = {a: PARENT1, b: PARENT2}
+        queue = [(-self.generation[a], a), (-self.generation[b], b)]
+        heapq.heapify(queue)
+        # Коммит может стоять в очереди несколько раз: queued — число его записей,
+        # active — число записей не устаревших коммитов (без пересчёта очереди)
+        queued = Counter({a: 1, b: 1})
+        active = 2
+        candidates = []
+        while active:
+            _, node = heapq.heappop(queue)
+            queued[node] -= 1
+            node_flags = flags[node]
+            if not node_flags & STALE:
+                active -= 1
+                if node_flags & (PARENT1 | PARENT2) == PARENT1 | PARENT2:
+                    candidates.append(node)
+                    node_flags |= STALE
+                    flags[node] = node_flags
+                    active -= queued[node]
+            for parent in self.parents(node):
+                parent_flags = flags.get(parent, 0)
+                if parent_flags & node_flags == node_flags:
+                    continue  # Флаги уже переданы
+                if node_flags & STALE and not parent_flags & STALE:
+                    active -= queued[parent]
+                flags[parent] = parent_flags | node_flags
+                heapq.heappush(queue, (-self.generation[parent], parent))
+                queued[parent] += 1
+                if not flags[parent] & STALE:
+                    active += 1
+        # Убираем кандидатов, которые являются предками других кандидатов
+        return sorted(c for c in candidates
+                      if not any(other != c and self.is_ancestor(c, other) for other in candidates))
+
+    def between(self, a: Optional[int], b: int) -> List[int]:
+        """Коммиты, достижимые из b, но не из a (как a..b в git), от новых к старым"""
+        result = []
+        seen = {b}
+        stack = [b]
+        while stack:
+            node = stack.pop()
+            if a is not None and self.is_ancestor(node, a):
+                continue
+            result.append(node)
+            for parent in self.parents(node):
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+        result.sort(reverse=True)
+        return result
+
+    def throughput(self, commits: Optional[List[int]] = None) -> List[Tuple[str, int]]:
+        """Число коммитов по дням (UTC) для всех коммитов или для списка номеров"""
+        timestamps = self.table.timestamps
+        days = Counter(timestamps[i] // SECONDS_PER_DAY
+                       for i in (range(len(self)) if commits is None else commits))
+        return [(datetime.utcfromtimestamp(day * SECONDS_PER_DAY).strftime("%Y-%m-%d"), count)
+                for day, count in sorted(days.items())]
+
+    def stats(self) -> Dict[str, int]:
+        """Общие сведения о графе: коммиты, слияния, корни, вершины, длина самого длинного пути"""
+        merges = roots = heads = 0
+        for i in range(len(self)):
+            parents = len(self.parents(i))
+            merges += parents > 1
+            roots += parents == 0
+            heads += self.child_offsets[i] == self.child_offsets[i + 1]
+        return {
+            "commits": len(self),
+            "merges": merges,
+            "roots": roots,
+            "heads": heads,
+            "edges": len(self.child_indexes),
+            "max_generation": max(self.generation, default=0),
+        }
@@ -0,0 +1,147 @@
+from array import array
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Формат даты коммита в узлах графа
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def format_date(timestamp: int) -> str:
+    """Преобразует метку времени коммита в строку даты (UTC)"""
+    return datetime.utcfromtimestamp(timestamp).strftime(DATE_FORMAT)
+
+
+class CommitTable(Sequence):
+    """
+    Компактная таблица коммитов в виде параллельных массивов.
+
+    Коммит с номером i хранится так:
+    - oids — двоичные хеши подряд, хеш i занимает байты [i * oid_size, (i + 1) * oid_size);
+    - timestamps[i] — время коммита;
+    - parent_indexes[parent_offsets[i]:parent_offsets[i + 1]] — номера родителей.
+
+    Родители добавляются раньше потомков, поэтому их номера известны сразу.
+    Родитель вне таблицы (например, за границей выборки) хранится в external
+    и кодируется отрицательным номером -1 - k.
+
+    Для совместимости с прежним списком кортежей элемент таблицы —
+    (хеш, дата, хеши родителей); строки создаются только при обращении.
+    """
+
+    def __init__(self, oid_size: int = 20):
+        self.oid_size = oid_size
+        self.oids = bytearray()
+        self.timestamps = array("q")
+        self.parent_offsets = array("q", [0])
+        self.parent_indexes = array("q")
+        self.external = bytearray()
+        self.index = {}  # Двоичный хеш -> номер коммита
+
+    @classmethod
+    def from_log(cls, log: Iterable[Tuple[str, List[str], int]]) -> "CommitTable":
+        """Строит таблицу из (хеш, хеши родителей, время), родители — раньше потомков"""
+        table = None
+        for commit, parents, timestamp in log:
+            if table is None:
+                table = cls(len(commit) // 2)
+            table.append(commit, parents, timestamp)
+        return table if table is not None else cls()
+
+    def append(self, commit: str, parents: List[str], timestamp: int) -> int:
+        """Добавляет коммит и возвращает его номер"""
+        oid = bytes.fromhex(commit)
+        number = len(self.timestamps)
+        self.index[oid] = number
+        self.oids += oid
+        self.timestamps.append(timestamp)
+        for parent in parents:
+            parent_oid = bytes.fromhex(parent)
+            parent_index = self.index.get(parent_oid)
+            if parent_index is None:
+                parent_index = -1 - len(self.external) // self.oid_size
+                self.external += parent_oid
+            self.parent_indexes.append(parent_index)
+        self.parent_offsets.append(len(self.parent_indexes))
+        return number
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("номер коммита вне таблицы")
+        return self.oid(i), self.date(i), self.parent_oids(i)
+
+    def find(self, commit: str) -> Optional[int]:
+        """Номер коммита по хешу или None"""
+        return self.index.get(bytes.fromhex(commit))
+
+    def oid(self, i: int) -> str:
+        """Шестнадцатеричный хеш коммита"""
+        if i < 0:
+            start = (-1 - i) * self.oid_size
+            return self.external[start:start + self.oid_size].hex()
+        start = i * self.oid_size
+        return self.oids[start:start + self.oid_size].hex()
+
+    def date(self, i: int) -> str:
+        return format_date(self.timestamps[i])
+
+    def parents(self, i: int) -> array:
+        """Номера родителей коммита (отрицательные — родители вне таблицы)"""
+        return self.parent_indexes[self.parent_offsets[i]:self.parent_offsets[i + 1]]
+
+    def parent_oids(self, i: int) -> List[str]:
+        return [self.oid(parent) for parent in self.parents(i)]
+
+    def edges(self) -> Iterator[Tuple[int, int]]:
+        """Рёбра (родитель, потомок) между коммитами таблицы"""
+        offsets = self.parent_offsets
+        parent_indexes = self.parent_indexes
+        for child in range(len(self)):
+            for k in range(offsets[child], offsets[child + 1]):
+                parent = parent_indexes[k]
+                if parent >= 0:
+                    yield parent, child
+
+    def ancestors(self, i: int) -> bytearray:
+        """Отметки коммитов, достижимых из коммита i (включая его самого)"""
+        mask = bytearray(len(self))
+        mask[i] = 1
+        stack = [i]
+        while stack:
+            for parent in self.parents(stack.pop()):
+                if parent >= 0 and not mask[parent]:
+                    mask[parent] = 1
+                    stack.append(parent)
+        return mask
+
+    def select(self, mask: bytearray) -> "CommitTable":
+        """
+        Новая таблица из отмеченных коммитов в том же порядке. Отмеченные коммиты
+        должны включать всех своих предков из таблицы (как результат ancestors).
+        """
+        table = CommitTable(self.oid_size)
+        size = self.oid_size
+        renumber = array("q", bytes(8 * len(self)))
+        for i in range(len(self)):
+            if not mask[i]:
+                continue
+            renumber[i] = len(table.timestamps)
+            oid = bytes(self.oids[i * size:(i + 1) * size])
+            table.index[oid] = renumber[i]
+            table.oids += oid
+            table.timestamps.append(self.timestamps[i])
+            for parent in self.parents(i):
+                if parent >= 0:
+                    table.parent_indexes.append(renumber[parent])
+                else:
+                    table.parent_indexes.append(-1 - len(table.external) // size)
+                    table.external += bytes.fromhex(self.oid(parent))
+            table.parent_offsets.append(len(table.parent_indexes))
+        return table
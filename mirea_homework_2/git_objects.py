@@ -0,0 +1,595 @@
+"""
+Чтение коммитов прямо из каталога .git без запуска git.
+
+Поддерживаются неупакованные объекты (objects/xx/...), pack-файлы с индексом
+.idx версии 2 (включая дельты) и файлы commit-graph (одиночный и цепочка).
+Pack-файлы, индексы и commit-graph отображаются в память.
+"""
+import bisect
+import glob
+import heapq
+import mmap
+import os
+import struct
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Типы объектов в pack-файле
+OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+OFS_DELTA = 6
+REF_DELTA = 7
+
+# Размер порции распаковки, если данные не уместились в первую порцию
+INFLATE_CHUNK = 64 * 1024
+
+PACK_INDEX_MAGIC = b"\xfftOc"
+COMMIT_GRAPH_MAGIC = b"CGPH"
+# Значения номера родителя в commit-graph
+GRAPH_PARENT_NONE = 0x70000000
+GRAPH_EXTRA_EDGES = 0x80000000
+# Размер хеша по версии хеш-функции commit-graph: SHA-1 и SHA-256
+GRAPH_HASH_SIZES = {1: 20, 2: 32}
+
+
+def map_file(path: str) -> mmap.mmap:
+    """Отображает файл в память только для чтения"""
+    with open(path, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def inflate(data, pos: int, size: int) -> bytes:
+    """
+    Распаковывает поток zlib, начинающийся с позиции pos.
+
+    Длина сжатых данных заранее неизвестна, поэтому сначала берётся порция
+    чуть больше ожидаемого размера, а при необходимости — следующие.
+    """
+    decompressor = zlib.decompressobj()
+    step = size + 64
+    chunks = []
+    while not decompressor.eof:
+        chunk = data[pos:pos + step]
+        if not chunk:
+            raise ValueError("Повреждённый объект: поток zlib обрывается")
+        chunks.append(decompressor.decompress(chunk))
+        pos += step
+        step = INFLATE_CHUNK
+    return b"".join(chunks)
+
+
+def read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Читает размер из заголовка дельты (по 7 бит, младшие первыми)"""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Восстанавливает объект из базового объекта и дельты"""
+    _, pos = read_varint(delta, 0)  # Размер базового объекта
+    size, pos = read_varint(delta, pos)
+    result = bytearray()
+    while pos < len(delta):
+        opcode = delta[pos]
+        pos += 1
+        if opcode & 0x80:
+            # Копирование диапазона из базового объекта
+            offset = length = 0
+            for i in range(4):
+                if opcode & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if opcode & (0x10 << i):
+                    length |= delta[pos] << (8 * i)
+                    pos += 1
+            result += base[offset:offset + (length or 0x10000)]
+        elif opcode:
+            # Вставка opcode байт из самой дельты
+            result += delta[pos:pos + opcode]
+            pos += opcode
+        else:
+            raise ValueError("Повреждённая дельта: нулевая команда")
+    if len(result) != size:
+        raise ValueError("Повреждённая дельта: неверный размер результата")
+    return bytes(result)
+
+
+def parse_commit(data: bytes) -> Tuple[List[bytes], int]:
+    """Возвращает двоичные хеши родителей и время коммита из заголовка объекта"""
+    parents = []
+    timestamp = 0
+    end = data.find(b"\n\n")
+    for line in data[:end if end >= 0 else len(data)].split(b"\n"):
+        if line.startswith(b"parent "):
+            parents.append(bytes.fromhex(line[7:].decode()))
+        elif line.startswith(b"committer "):
+            timestamp = int(line.rsplit(b" ", 2)[1])
+    return parents, timestamp
+
+
+class PackFile:
+    """Pack-файл и его индекс .idx версии 2, отображённые в память"""
+
+    def __init__(self, index_path: str, hash_size: int = 20):
+        self.hash_size = hash_size
+        self.index = map_file(index_path)
+        self.pack = map_file(index_path[:-len(".idx")] + ".pack")
+        if self.index[:4] != PACK_INDEX_MAGIC or struct.unpack(">I", self.index[4:8])[0] != 2:
+            raise ValueError(f"Неподдерживаемая версия индекса: {index_path}")
+        self.fanout = struct.unpack(">256I", self.index[8:8 + 256 * 4])
+        self.count = self.fanout[255]
+        self.names = 8 + 256 * 4
+        self.offsets = self.names + self.count * (self.hash_size + 4)
+        self.large_offsets = self.offsets + self.count * 4
+
+    def close(self):
+        self.index.close()
+        self.pack.close()
+
+    def find(self, oid: bytes) -> Optional[int]:
+        """Смещение объекта в pack-файле или None; двоичный поиск внутри корзины fanout"""
+        low = self.fanout[oid[0] - 1] if oid[0] else 0
+        high = self.fanout[oid[0]]
+        size = self.hash_size
+        while low < high:
+            middle = (low + high) // 2
+            start = self.names + middle * size
+            name = self.index[start:start + size]
+            if name < oid:
+                low = middle + 1
+            elif name > oid:
+                high = middle
+            else:
+                return self.offset(middle)
+        return None
+
+    def offset(self, i: int) -> int:
+        start = self.offsets + i * 4
+        offset = struct.unpack(">I", self.index[start:start + 4])[0]
+        if offset & 0x80000000:
+            start = self.large_offsets + (offset & 0x7FFFFFFF) * 8
+            offset = struct.unpack(">Q", self.index[start:start + 8])[0]
+        return offset
+
+    def read(self, offset: int, resolve_ref) -> Tuple[str, bytes]:
+        """
+        Читает объект по смещению, применяя цепочку дельт.
+        resolve_ref(oid) возвращает базовый объект дельты REF_DELTA.
+        """
+        data = self.pack
+        byte = data[offset]
+        pos = offset + 1
+        kind = (byte >> 4) & 7
+        size = byte & 0x0F
+        shift = 4
+        while byte & 0x80:
+            byte = data[pos]
+            pos += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+
+        if kind == OFS_DELTA:
+            byte = data[pos]
+            pos += 1
+            distance = byte & 0x7F
+            while byte & 0x80:
+                byte = data[pos]
+                pos += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7F)
+            base_type, base = self.read(offset - distance, resolve_ref)
+            return base_type, apply_delta(base, inflate(data, pos, size))
+        if kind == REF_DELTA:
+            base_oid = bytes(data[pos:pos + self.hash_size])
+            pos += self.hash_size
+            base_type, base = resolve_ref(base_oid)
+            return base_type, apply_delta(base, inflate(data, pos, size))
+        if kind not in OBJECT_TYPES:
+            raise ValueError(f"Неизвестный тип объекта в pack-файле: {kind}")
+        return OBJECT_TYPES[kind], inflate(data, pos, size)
+
+
+class CommitGraph:
+    """
+    Файлы commit-graph: родители и время коммитов без распаковки объектов.
+
+    Цепочка файлов (commit-graphs/commit-graph-chain) рассматривается как один
+    список коммитов: номера в каждом следующем слое продолжают предыдущие.
+    """
+
+    def __init__(self, paths: List[str]):
+        self.layers = []
+        self.starts = []
+        total = 0
+        for path in paths:
+            layer = self._load(path)
+            self.layers.append(layer)
+            self.starts.append(total)
+            total += layer["count"]
+        self.count = total
+
+    @classmethod
+    def open(cls, objects_dir: str) -> Optional["CommitGraph"]:
+        """Находит commit-graph в каталоге объектов; None, если его нет"""
+        single = os.path.join(objects_dir, "info", "commit-graph")
+        if os.path.isfile(single):
+            return cls([single])
+        chain = os.path.join(objects_dir, "info", "commit-graphs", "commit-graph-chain")
+        if os.path.isfile(chain):
+            with open(chain) as file:
+                hashes = [line.strip() for line in file if line.strip()]
+            return cls([os.path.join(os.path.dirname(chain), f"graph-{name}.graph") for name in hashes])
+        return None
+
+    @staticmethod
+    def _load(path: str) -> dict:
+        data = map_file(path)
+        if data[:4] != COMMIT_GRAPH_MAGIC or data[4] != 1:
+            data.close()
+            raise ValueError(f"Неподдерживаемый формат commit-graph: {path}")
+        hash_size = GRAPH_HASH_SIZES[data[5]]
+        chunks = {}
+        for i in range(data[6]):
+            start = 8 + i * 12
+            chunks[bytes(data[start:start + 4])] = struct.unpack(">Q", data[start + 4:start + 12])[0]
+        fanout = chunks[b"OIDF"]
+        return {
+            "data": data,
+            "hash_size": hash_size,
+            "count": struct.unpack(">I", data[fanout + 255 * 4:fanout + 256 * 4])[0],
+            "fanout": struct.unpack(">256I", data[fanout:fanout + 256 * 4]),
+            "oids": chunks[b"OIDL"],
+            "commits": chunks[b"CDAT"],
+            "edges": chunks.get(b"EDGE"),
+        }
+
+    def close(self):
+        for layer in self.layers:
+            layer["data"].close()
+
+    def _layer(self, position: int) -> Tuple[dict, int]:
+        i = bisect.bisect_right(self.starts, position) - 1
+        return self.layers[i], position - self.starts[i]
+
+    def find(self, oid: bytes) -> Optional[int]:
+        """Номер коммита в commit-graph или None"""
+        for layer, start in zip(self.layers, self.starts):
+            data = layer["data"]
+            size = layer["hash_size"]
+            low = layer["fanout"][oid[0] - 1] if oid[0] else 0
+            high = layer["fanout"][oid[0]]
+            while low < high:
+                middle = (low + high) // 2
+                name = data[layer["oids"] + middle * size:layer["oids"] + (middle + 1) * size]
+                if name < oid:
+                    low = middle + 1
+                elif name > oid:
+                    high = middle
+                else:
+                    return start + middle
+        return None
+
+    def oid(self, position: int) -> bytes:
+        layer, i = self._layer(position)
+        size = layer["hash_size"]
+        start = layer["oids"] + i * size
+        return bytes(layer["data"][start:start + size])
+
+    def commit(self, position: int) -> Tuple[List[int], int]:
+        """Номера родителей и время коммита"""
+        layer, i = self._layer(position)
+        data = layer["data"]
+        start = layer["commits"] + i * (layer["hash_size"] + 16) + layer["hash_size"]
+        first, second, generation, low = struct.unpack(">IIII", data[start:start + 16])
+        timestamp = ((generation & 0x3) << 32) | low
+
+        parents = []
+        if first != GRAPH_PARENT_NONE:
+            parents.append(first)
+        if second & GRAPH_EXTRA_EDGES:
+            # Третий и следующие родители лежат в списке EDGE
+            pos = layer["edges"] + (second & 0x7FFFFFFF) * 4
+            while True:
+                edge = struct.unpack(">I", data[pos:pos + 4])[0]
+                parents.append(edge & 0x7FFFFFFF)
+                if edge & GRAPH_EXTRA_EDGES:
+                    break
+                pos += 4
+        elif second != GRAPH_PARENT_NONE:
+            parents.append(second)
+        return parents, timestamp
+
+
+class Repository:
+    """Репозиторий git, объекты которого читаются без запуска git"""
+
+    def __init__(self, repo_path: str):
+        self.git_dir = self.find_git_dir(repo_path)
+        common = os.path.join(self.git_dir, "commondir")
+        if os.path.isfile(common):
+            # Рабочее дерево git worktree: объекты и ссылки лежат в общем каталоге
+            with open(common) as file:
+                self.common_dir = os.path.normpath(os.path.join(self.git_dir, file.read().strip()))
+        else:
+            self.common_dir = self.git_dir
+        self.objects_dir = os.path.join(self.common_dir, "objects")
+        self.hash_size = self._read_hash_size()
+        self.packs = [PackFile(path, self.hash_size) for path in sorted(glob.glob(os.path.join(self.objects_dir, "pack", "*.idx")))]
+        self.graph = CommitGraph.open(self.objects_dir)
+        self.shallow = self._read_shallow()
+        self._packed_refs = None
+
+    @staticmethod
+    def find_git_dir(repo_path: str) -> str:
+        dot_git = os.path.join(repo_path, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git
+        if os.path.isfile(dot_git):
+            # Подмодуль или рабочее дерево: файл .git указывает на каталог репозитория
+            with open(dot_git) as file:
+                content = file.read().strip()
+            if content.startswith("gitdir:"):
+                return os.path.normpath(os.path.join(repo_path, content[len("gitdir:"):].strip()))
+        if os.path.isfile(os.path.join(repo_path, "HEAD")) and os.path.isdir(os.path.join(repo_path, "objects")):
+            return repo_path  # Голый репозиторий
+        raise ValueError(f"Не найден репозиторий git: {repo_path}")
+
+    def close(self):
+        for pack in self.packs:
+            pack.close()
+        if self.graph is not None:
+            self.graph.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read_hash_size(self) -> int:
+        """Размер хеша: 32 байта для репозиториев с objectformat = sha256, иначе 20"""
+        path = os.path.join(self.common_dir, "config")
+        if os.path.isfile(path):
+            with open(path) as file:
+                for line in file:
+                    key, _, value = line.partition("=")
+                    if key.strip().lower() == "objectformat" and value.strip().lower() == "sha256":
+                        return 32
+        return 20
+
+    def _read_shallow(self) -> set:
+        path = os.path.join(self.common_dir, "shallow")
+        if not os.path.isfile(path):
+            return set()
+        with open(path) as file:
+            return {bytes.fromhex(line.strip()) for line in file if line.strip()}
+
+    # Ссылки
+
+    def packed_refs(self) -> Dict[str, str]:
+        if self._packed_refs is None:
+            self._packed_refs = {}
+            path = os.path.join(self.common_dir, "packed-refs")
+            if os.path.isfile(path):
+                with open(path) as file:
+                    for line in file:
+                        if not line.strip() or line[0] in "#^":
+                            continue
+                        value, name = line.split()
+                        self._packed_refs[name] = value
+        return self._packed_refs
+
+    def list_refs(self) -> List[str]:
+        """Имена всех ссылок refs/... (неупакованных и из packed-refs)"""
+        names = set(name for name in self.packed_refs() if name.startswith("refs/"))
+        refs_dir = os.path.join(self.common_dir, "refs")
+        for directory, _, files in os.walk(refs_dir):
+            for name in files:
+                path = os.path.relpath(os.path.join(directory, name), self.common_dir)
+                names.add(path.replace(os.sep, "/"))
+        return sorted(names)
+
+    def read_ref(self, name: str) -> Optional[str]:
+        """Значение ссылки (с разыменованием символьных ссылок) или None"""
+        for _ in range(10):
+            base = self.git_dir if "/" not in name else self.common_dir
+            path = os.path.join(base, name)
+            if os.path.isfile(path):
+                with open(path) as file:
+                    value = file.read().strip()
+            else:
+                value = self.packed_refs().get(name)
+                if value is None:
+                    return None
+            if not value.startswith("ref:"):
+                return value
+            name = value[len("ref:"):].strip()
+        raise ValueError(f"Слишком длинная цепочка символьных ссылок: {name}")
+
+    def resolve(self, rev: str) -> bytes:
+        """Хеш коммита для имени ссылки, тега, ветки или полного хеша"""
+        value = None
+        if len(rev) == self.hash_size * 2 and all(c in "0123456789abcdef" for c in rev.lower()):
+            value = rev.lower()
+        else:
+            # Порядок поиска имён такой же, как в git (gitrevisions); прямо в каталоге
+            # репозитория ищутся только ссылки вида HEAD, ORIG_HEAD
+            names = [f"refs/{rev}", f"refs/tags/{rev}", f"refs/heads/{rev}", f"refs/remotes/{rev}", f"refs/remotes/{rev}/HEAD"]
+            if rev.startswith("refs/") or rev.replace("_", "").isupper():
+                names.insert(0, rev)
+            for name in names:
+                value = self.read_ref(name)
+                if value is not None:
+                    break
+        if value is None:
+            raise ValueError(f"Ревизия не найдена: {rev}")
+
+        oid = bytes.fromhex(value)
+        # Аннотированный тег указывает на другой объект
+        kind, data = self.read_object(oid)
+        while kind == "tag":
+            oid = bytes.fromhex(data[len(b"object "):data.index(b"\n")].decode())
+            kind, data = self.read_object(oid)
+        if kind != "commit":
+            raise ValueError(f"Ревизия {rev} указывает не на коммит, а на {kind}")
+        return oid
+
+    # Объекты
+
+    def read_object(self, oid: bytes) -> Tuple[str, bytes]:
+        """Тип и содержимое объекта"""
+        for pack in self.packs:
+            offset = pack.find(oid)
+            if offset is not None:
+                return pack.read(offset, self.read_object)
+
+        hex_oid = oid.hex()
+        path = os.path.join(self.objects_dir, hex_oid[:2], hex_oid[2:])
+        if not os.path.isfile(path):
+            raise ValueError(f"Объект не найден: {hex_oid}")
+        with open(path, "rb") as file:
+            raw = zlib.decompress(file.read())
+        header, _, data = raw.partition(b"\0")
+        return header.split(b" ")[0].decode(), data
+
+    def commit(self, oid: bytes) -> Tuple[List[bytes], int]:
+        """Родители и время коммита: из commit-graph, если он там есть, иначе из объекта"""
+        if oid in self.shallow:
+            # Граница неполного клона: родители коммита отсутствуют
+            _, timestamp = self._commit(oid)
+            return [], timestamp
+        return self._commit(oid)
+
+    def _commit(self, oid: bytes) -> Tuple[List[bytes], int]:
+        if self.graph is not None:
+            position = self.graph.find(oid)
+            if position is not None:
+                parents, timestamp = self.graph.commit(position)
+                return [self.graph.oid(parent) for parent in parents], timestamp
+        kind, data = self.read_object(oid)
+        if kind != "commit":
+            raise ValueError(f"Объект {oid.hex()} не является коммитом")
+        return parse_commit(data)
+
+    def iter_commits(self, rev: str, known=()) -> Iterator[Tuple[bytes, List[bytes], int]]:
+        """
+        Все коммиты, достижимые из ревизии, от старых к новым: каждый коммит
+        выдаётся после всех своих родителей (обход в глубину, обратный порядок).
+
+        known — двоичные хеши уже известных коммитов вместе со всеми их предками;
+        обход на них останавливается.
+        """
+        tip = self.resolve(rev)
+        if tip in known:
+            return
+        seen = {tip}
+        stack = [[tip, self.commit(tip), 0]]
+        while stack:
+            top = stack[-1]
+            oid, (parents, timestamp), i = top
+            if i < len(parents):
+                top[2] += 1
+                parent = parents[i]
+                if parent not in seen and parent not in known:
+                    seen.add(parent)
+                    stack.append([parent, self.commit(parent), 0])
+            else:
+                stack.pop()
+                yield oid, parents, timestamp
+
+    def iter_filtered(self, rev: str, since: int = None, until: int = None, max_count: int = None,
+                      first_parent: bool = False) -> Iterator[Tuple[bytes, List[bytes], int]]:
+        """
+        Коммиты ревизии с фильтрами, как у git log: обход идёт от новых коммитов
+        к старым по времени и не продолжается за коммиты старше since; коммиты
+        новее until пропускаются; обход останавливается после max_count коммитов.
+        С first_parent обход идёт только по первым родителям, но, как и в git,
+        у коммитов остаются все родители. Отобранные коммиты выдаются так же,
+        родители — раньше потомков.
+        """
+        tip = self.resolve(rev)
+        info = {tip: self.commit(tip)}
+        heap = [(-info[tip][1], tip)]
+        selected = []
+        while heap and (max_count is None or len(selected) < max_count):
+            _, oid = heapq.heappop(heap)
+            parents, timestamp = info[oid]
+            if since is not None and timestamp < since:
+                continue
+            if until is None or timestamp <= until:
+                selected.append(oid)
+            for parent in parents[:1] if first_parent else parents:
+                if parent not in info:
+                    info[parent] = self.commit(parent)
+                    heapq.heappush(heap, (-info[parent][1], parent))
+
+        # Обход в глубину среди отобранных коммитов, начиная со старых
+        chosen = set(selected)
+        done = set()
+        for start in reversed(selected):
+            if start in done:
+                continue
+            done.add(start)
+            stack = [[start, 0]]
+            while stack:
+                top = stack[-1]
+                parents, timestamp = info[top[0]]
+                if top[1] < len(parents):
+                    parent = parents[top[1]]
+                    top[1] += 1
+                    if parent in chosen and parent not in done:
+                        done.add(parent)
+                        stack.append([parent, 0])
+                else:
+                    stack.pop()
+                    yield top[0], parents, timestamp
+
+
+def resolve_tip(repo_path: str, rev: str) -> str:
+    """Хеш коммита, на который указывает ревизия"""
+    with Repository(repo_path) as repo:
+        return repo.resolve(rev).hex()
+
+
+def list_refs(repo_path: str) -> List[str]:
+    with Repository(repo_path) as repo:
+        return repo.list_refs()
+
+
+def iter_commit_log(repo_path: str, rev: str, known=(), filters: dict = None) -> Iterator[Tuple[str, List[str], int]]:
+    """То же, что visualize_commits.iter_commit_log, но без запуска git"""
+    with Repository(repo_path) as repo:
+        if filters:
+            if filters.get("paths"):
+                raise ValueError("Фильтр по путям требует сравнения деревьев и доступен только через git")
+            commits = repo.iter_filtered(rev, parse_time(filters.get("since")), parse_time(filters.get("until")),
+                                         filters.get("max_count"), bool(filters.get("first_parent")))
+        else:
+            commits = repo.iter_commits(rev, known)
+        for oid, parents, timestamp in commits:
+            yield oid.hex(), [parent.hex() for parent in parents], timestamp
+
+
+def parse_time(value) -> Optional[int]:
+    """
+    Метка времени для фильтров since/until: число, дата или дата-время
+    (объект или строка ISO 8601, без часового пояса — UTC).
+    """
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Без git поддерживаются только даты ISO 8601: {value}")
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
@@ -0,0 +1,232 @@
+"""
+Потоковая запись графа коммитов в DOT и JSON без построения graphviz.Digraph.
+
+Для больших историй граф упрощается: линейные цепочки коммитов сворачиваются
+в один узел, глубина ограничивается числом коммитов от вершин, узлы группируются
+в кластеры по дате или по ветке. Раскладка выполняется выбранной программой
+Graphviz (для десятков тысяч узлов — sfdp), результат — PNG, SVG или PDF.
+"""
+import json
+from array import array
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+import graphviz
+from commit_table import CommitTable
+
+LAYOUT_ENGINES = ("dot", "sfdp", "neato", "fdp", "twopi", "circo")
+OUTPUT_FORMATS = ("png", "svg", "pdf", "dot", "json")
+CLUSTER_MODES = ("day", "month", "branch")
+
+# Формат ключа кластера по дате
+CLUSTER_DATE_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+
+# Длина сокращённого хеша в подписи свёрнутой цепочки
+SHORT_HASH = 7
+
+
+class GraphView:
+    """
+    Упрощённый граф поверх CommitTable: узел — коммит или свёрнутая цепочка.
+
+    Для каждого узла хранятся номера первого и последнего коммита и их число,
+    для каждого коммита — номер его узла (-1, если коммит не попал в граф).
+    Подписи и даты создаются только при записи узлов.
+    """
+
+    def __init__(self, table: CommitTable, collapse_chains: bool = False, max_depth: Optional[int] = None,
+                 cluster: Optional[str] = None):
+        if cluster is not None and cluster not in CLUSTER_MODES:
+            raise ValueError(f"Неизвестный способ группировки: {cluster}")
+        self.table = table
+        self.cluster = cluster
+        self.first = array("q")
+        self.last = array("q")
+        self.count = array("q")
+        self.edges = array("q")  # Пары (узел родителя, узел потомка) подряд
+
+        n = len(table)
+        children = array("q", bytes(8 * n))
+        for parent, _ in table.edges():
+            children[parent] += 1
+        keep = self._depth_mask(children, max_depth) if max_depth is not None else None
+
+        self.node_of = array("q", [-1]) * n
+        for i in range(n):
+            if keep is not None and not keep[i]:
+                continue
+            all_parents = table.parents(i)
+            parents = [p for p in all_parents if p >= 0 and (keep is None or keep[p])]
+            if collapse_chains and len(all_parents) == 1 and len(parents) == 1 and children[parents[0]] == 1:
+                # Продолжение линейной цепочки: единственный родитель с единственным потомком
+                node = self.node_of[parents[0]]
+                self.last[node] = i
+                self.count[node] += 1
+            else:
+                node = len(self.first)
+                self.first.append(i)
+                self.last.append(i)
+                self.count.append(1)
+                for parent in parents:
+                    self.edges.append(self.node_of[parent])
+                    self.edges.append(node)
+            self.node_of[i] = node
+
+    def _depth_mask(self, children: array, max_depth: int) -> bytearray:
+        """Отметки коммитов, отстоящих от вершин (коммитов без потомков) не больше чем на max_depth"""
+        n = len(self.table)
+        depth = array("q", [-1]) * n
+        queue = deque()
+        for i in range(n):
+            if children[i] == 0:
+                depth[i] = 0
+                queue.append(i)
+        while queue:
+            i = queue.popleft()
+            if depth[i] == max_depth:
+                continue
+            for parent in self.table.parents(i):
+                if parent >= 0 and depth[parent] < 0:
+                    depth[parent] = depth[i] + 1
+                    queue.append(parent)
+        return bytearray(d >= 0 for d in depth)
+
+    def __len__(self) -> int:
+        return len(self.first)
+
+    def iter_edges(self) -> Iterator[Tuple[int, int]]:
+        edges = self.edges
+        for k in range(0, len(edges), 2):
+            yield edges[k], edges[k + 1]
+
+    def label(self, node: int) -> str:
+        table = self.table
+        first, last = self.first[node], self.last[node]
+        if self.count[node] == 1:
+            return f"Commit: {table.oid(first)}\nDate: {table.date(first)}"
+        return (f"Commits: {self.count[node]} ({table.oid(first)[:SHORT_HASH]}..{table.oid(last)[:SHORT_HASH]})\n"
+                f"Date: {table.date(first)} .. {table.date(last)}")
+
+    def clusters(self) -> Dict[str, List[int]]:
+        """Узлы по кластерам в порядке первого появления кластера"""
+        if self.cluster == "branch":
+            keys = self._branch_keys()
+        else:
+            date_format = CLUSTER_DATE_FORMATS[self.cluster]
+            keys = (datetime.utcfromtimestamp(self.table.timestamps[self.last[node]]).strftime(date_format)
+                    for node in range(len(self)))
+        clusters = {}
+        for node, key in enumerate(keys):
+            clusters.setdefault(key, array("q")).append(node)
+        return clusters
+
+    def _branch_keys(self) -> List[str]:
+        """
+        Ветка узла — линия первых родителей, на которой он лежит. Линии
+        прокладываются от новых коммитов к старым: новая линия идёт по первым
+        родителям до уже размеченного коммита, поэтому основная линия вершины
+        занимает всю свою историю, а ветки, слитые в неё, получают имя
+        по коммиту слияния.
+        """
+        table = self.table
+        lane = array("q", [-1]) * len(table)
+        merged_into = {}
+        names = []
+        for i in range(len(table) - 1, -1, -1):
+            if self.node_of[i] < 0 or lane[i] >= 0:
+                continue
+            if i in merged_into:
+                names.append(f"merged in {table.oid(merged_into[i])[:SHORT_HASH]}")
+            else:
+                names.append("main" if not names else f"branch {table.oid(i)[:SHORT_HASH]}")
+            commit = i
+            while commit >= 0 and self.node_of[commit] >= 0 and lane[commit] < 0:
+                lane[commit] = len(names) - 1
+                parents = table.parents(commit)
+                for parent in parents[1:]:
+                    merged_into.setdefault(parent, commit)
+                commit = parents[0] if parents else -1
+        return [names[lane[self.last[node]]] for node in range(len(self))]
+
+
+def quote(text: str) -> str:
+    """Строка DOT в кавычках; переводы строк остаются как есть, как в graphviz.Digraph"""
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def write_dot(view: GraphView, file: TextIO) -> None:
+    """Записывает граф в формате DOT по мере обхода, без промежуточного Digraph"""
+    file.write("// Git Commit Dependencies\ndigraph {\n")
+    if view.cluster is None:
+        for node in range(len(view)):
+            file.write(f"\t{node} [label={quote(view.label(node))}]\n")
+    else:
+        for number, (key, nodes) in enumerate(view.clusters().items()):
+            file.write(f"\tsubgraph cluster_{number} {{\n\t\tlabel={quote(key)}\n")
+            for node in nodes:
+                file.write(f"\t\t{node} [label={quote(view.label(node))}]\n")
+            file.write("\t}\n")
+    for parent, child in view.iter_edges():
+        file.write(f"\t{parent} -> {child}\n")
+    file.write("}\n")
+
+
+def write_json(view: GraphView, file: TextIO) -> None:
+    """Записывает граф в JSON: список узлов с коммитами и датами и список рёбер"""
+    table = view.table
+    cluster_of = {}
+    if view.cluster is not None:
+        for key, nodes in view.clusters().items():
+            for node in nodes:
+                cluster_of[node] = key
+    file.write('{"nodes": [')
+    for node in range(len(view)):
+        first, last = view.first[node], view.last[node]
+        item = {
+            "id": node,
+            "first": table.oid(first),
+            "last": table.oid(last),
+            "count": view.count[node],
+            "first_date": table.date(first),
+            "last_date": table.date(last),
+        }
+        if view.cluster is not None:
+            item["cluster"] = cluster_of[node]
+        file.write(("" if node == 0 else ",\n") + json.dumps(item))
+    file.write('],\n"edges": [')
+    for k, (parent, child) in enumerate(view.iter_edges()):
+        file.write(("" if k == 0 else ",") + f"[{parent},{child}]")
+    file.write("]}\n")
+
+
+def write_graph(table: CommitTable, output_file: str, output_format: str = "png",
+                collapse_chains: bool = False, max_depth: Optional[int] = None, cluster: Optional[str] = None) -> str:
+    """
+    Записывает исходный текст графа и возвращает путь к нему: DOT-файл
+    по пути output_file (как graphviz.render) или output_file.json для формата json.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Неизвестный формат вывода: {output_format}")
+    view = GraphView(table, collapse_chains, max_depth, cluster)
+    path = f"{output_file}.json" if output_format == "json" else output_file
+    with open(path, "w", encoding="utf-8") as file:
+        if output_format == "json":
+            write_json(view, file)
+        else:
+            write_dot(view, file)
+    return path
+
+
+def render_commits(table: CommitTable, output_file: str, output_format: str = "png", engine: str = "dot",
+                   **options) -> str:
+    """Записывает граф коммитов и выполняет раскладку; возвращает путь к результату"""
+    return layout(write_graph(table, output_file, output_format, **options), output_format, engine)
+
+
+def layout(dot_file: str, output_format: str = "png", engine: str = "dot") -> str:
+    """Выполняет раскладку DOT-файла программой Graphviz; форматам dot и json она не нужна"""
+    if engine not in LAYOUT_ENGINES:
+        raise ValueError(f"Неизвестная программа раскладки: {engine}")
+    if output_format in ("dot", "json"):
+        return dot_file
+    return graphviz.render(engine, output_format, dot_file)
@@ -0,0 +1,175 @@
+"""
+Замеры этапов построения графа: время, число запущенных процессов (git,
+Graphviz) и пик памяти Python. Замеры включаются только явно: пока в процессе
+нет активного StageTimer, stage() ничего не делает.
+
+Этапы конвейера:
+- history — чтение истории: блок stage("history") в process_repository
+  (resolve_tip, extend_table, get_commits_by_tag для фильтров);
+- graph — запись графа: write_graph или копия из кэша в process_repository;
+- layout — раскладка Graphviz: layout в layout_result.
+"""
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource  # Есть только в Unix
+except ImportError:
+    resource = None
+
+STAGES = ("history", "graph", "layout")
+
+_active = None  # StageTimer, в который записываются замеры этого процесса
+_hook_installed = False
+
+
+def _audit(event: str, args: tuple) -> None:
+    """Считает запуски подпроцессов (событие аудита subprocess.Popen)"""
+    if event == "subprocess.Popen" and _active is not None:
+        _active.subprocesses += 1
+
+
+class StageTimer:
+    """
+    Замеры этапов в текущем процессе. Используется как контекстный менеджер:
+    внутри блока with замеры stage() записываются в этот объект.
+
+    Для каждого этапа хранятся число вызовов, время в секундах, число
+    запущенных подпроцессов и, если memory, наибольший пик памяти в байтах
+    по tracemalloc (заметно замедляет работу).
+    """
+
+    def __init__(self, memory: bool = False):
+        global _hook_installed
+        self.memory = memory
+        self.stages = {}
+        self.subprocesses = 0
+        self._open = []
+        self._previous = None
+        self._started_tracing = False
+        if not _hook_installed:
+            # Хук аудита нельзя удалить, поэтому он ставится один раз на процесс
+            sys.addaudithook(_audit)
+            _hook_installed = True
+
+    def __enter__(self) -> "StageTimer":
+        global _active
+        self._previous = _active
+        _active = self
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        global _active
+        _active = self._previous
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def record(self, name: str, seconds: float, subprocesses: int, peak_memory: Optional[int]) -> None:
+        item = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "subprocesses": 0, "peak_memory": None})
+        item["calls"] += 1
+        item["seconds"] += seconds
+        item["subprocesses"] += subprocesses
+        if peak_memory is not None:
+            item["peak_memory"] = max(item["peak_memory"] or 0, peak_memory)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Замеряет блок как этап name. Вложенный замер того же этапа (например,
+    get_commits_by_tag внутри history) не учитывается повторно.
+    """
+    timer = _active
+    if timer is None or name in timer._open:
+        yield
+        return
+    timer._open.append(name)
+    memory = timer.memory and tracemalloc.is_tracing()
+    if memory:
+        tracemalloc.reset_peak()
+    subprocesses = timer.subprocesses
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+        timer._open.remove(name)
+        timer.record(name, seconds, timer.subprocesses - subprocesses, peak)
+
+
+def profiled(name: str):
+    """Декоратор: каждый вызов функции замеряется как этап name"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return function(*args, **kwargs)
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def merge_stages(total: Dict[str, dict], stages: Dict[str, dict]) -> Dict[str, dict]:
+    """Добавляет замеры stages к сумме total (пик памяти — наибольший)"""
+    for name, item in stages.items():
+        target = total.setdefault(name, {"calls": 0, "seconds": 0.0, "subprocesses": 0, "peak_memory": None})
+        target["calls"] += item["calls"]
+        target["seconds"] += item["seconds"]
+        target["subprocesses"] += item["subprocesses"]
+        if item["peak_memory"] is not None:
+            target["peak_memory"] = max(target["peak_memory"] or 0, item["peak_memory"])
+    return total
+
+
+def max_rss() -> Optional[dict]:
+    """Наибольший размер резидентной памяти процесса и его завершённых потомков в КиБ (только Unix)"""
+    if resource is None:
+        return None
+    scale = 1024 if sys.platform == "darwin" else 1  # В macOS ru_maxrss в байтах
+    return {
+        "self_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        "children_kib": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+
+def build_report(results: List[dict], seconds: float, settings: dict) -> dict:
+    """
+    Отчёт о запуске: параметры, общее время, суммы по этапам, замеры
+    каждого графа и память процесса.
+    """
+    graphs = []
+    total = {}
+    for result in results:
+        stats = result.get("stats") or {"commits": None, "stages": {}}
+        merge_stages(total, stats["stages"])
+        graphs.append({
+            "repository": result["repository"],
+            "tag": result["tag"],
+            "output": result.get("output"),
+            "error": result["error"],
+            "commits": stats["commits"],
+            "stages": stats["stages"],
+        })
+    return {
+        "settings": settings,
+        "seconds": seconds,
+        "stages": total,
+        "graphs": graphs,
+        "max_rss": max_rss(),
+    }
+
+
+def write_report(report: dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
@@ -2,21 +2,74 @@ import unittest
 from unittest.mock import patch, MagicMock
 import os
 import subprocess
+import tempfile
 from graphviz import Digraph
 import yaml
 from datetime import datetime
-from visualize_commits import get_commits_by_tag, build_dependency_graph, save_graph, load_config
+import visualize_commits
+from visualize_commits import get_commits_by_tag, load_config
+from commit_cache import CommitCache
+from graph_render import GraphView, write_dot, write_graph, layout
+import io
+import json
+from commit_table import CommitTable
+from commit_dag import CommitDAG
+import profiling
+import pstats
+from git_objects import Repository
 
 """
 python -m unittest test_visualize_commits.py
 """
 
+def mock_git_log(stdout, returncode=0, stderr=""):
+    """Создаёт mock процесса git, вывод которого читается построчно из канала"""
+    process = MagicMock()
+    process.__enter__.return_value = process
+    process.stdout = iter(stdout.splitlines(keepends=True))
+    process.stderr.read.return_value = stderr
+    process.wait.return_value = returncode
+    return process
+
+def git(repo_path, *args, date=None):
+    """Выполняет git в тестовом репозитории с фиксированными автором и датой"""
+    env = dict(os.environ, GIT_AUTHOR_NAME="test", GIT_AUTHOR_EMAIL="test@example.com",
+               GIT_COMMITTER_NAME="test", GIT_COMMITTER_EMAIL="test@example.com")
+    if date is not None:
+        env["GIT_AUTHOR_DATE"] = env["GIT_COMMITTER_DATE"] = f"{date} +0000"
+    result = subprocess.run(["git", "-C", repo_path, *args], env=env, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    return result.stdout.strip()
+
+def make_repo(repo_path):
+    """
+    Создаёт репозиторий с историей:
+    c1 - c2 - c4 (merge) - c5, где c3 — коммит ветки feature от c1, тег v1.0 на c5.
+    Возвращает хеши коммитов по именам.
+    """
+    git(repo_path, "init", "-q", "-b", "main")
+    commits = {}
+    for name, day in (("c1", 1), ("c2", 2)):
+        git(repo_path, "commit", "-q", "--allow-empty", "-m", name, date=f"2021-01-0{day}T00:00:00")
+        commits[name] = git(repo_path, "rev-parse", "HEAD")
+    git(repo_path, "checkout", "-q", "-b", "feature", commits["c1"])
+    git(repo_path, "commit", "-q", "--allow-empty", "-m", "c3", date="2021-01-03T00:00:00")
+    commits["c3"] = git(repo_path, "rev-parse", "HEAD")
+    git(repo_path, "checkout", "-q", "main")
+    git(repo_path, "merge", "-q", "--no-ff", "-m", "c4", "feature", date="2021-01-04T00:00:00")
+    commits["c4"] = git(repo_path, "rev-parse", "HEAD")
+    git(repo_path, "commit", "-q", "--allow-empty", "-m", "c5", date="2021-01-05T00:00:00")
+    commits["c5"] = git(repo_path, "rev-parse", "HEAD")
+    git(repo_path, "tag", "-a", "v1.0", "-m", "release", date="2021-01-05T00:00:00")
+    return commits
+
 class TestGitVisualizer(unittest.TestCase):
 
-    @patch("subprocess.run")
-    def test_get_commits_by_tag(self, mock_run):
-        # Подготовим mock данных
-        mock_run.return_value = MagicMock(stdout="abc123 1609459200\nxyz789 1609545600\n", returncode=0)
+    @patch("subprocess.Popen")
+    def test_get_commits_by_tag(self, mock_popen):
+        # Подготовим mock данных: git уже отдаёт коммиты от старых к новым
+        first, second = "789" * 13 + "a", "123" * 13 + "b"
+        mock_popen.return_value = mock_git_log(f"{first} 1609545600\n{second} {first} 1609459200\n")
 
         # Вызовем функцию
         repo_path = "mock_repo"
@@ -24,41 +77,38 @@ class TestGitVisualizer(unittest.TestCase):
         commits = get_commits_by_tag(repo_path, tag_name)
 
         # Проверяем результат
-        self.assertEqual(commits[0][0], "xyz789")
-        self.assertEqual(commits[1][0], "abc123")
-        self.assertEqual(commits[0][1], "2021-01-02 00:00:00")  # Дата для 'xyz789'
-        self.assertEqual(commits[1][1], "2021-01-01 00:00:00")  # Дата для 'abc123'
-
-    @patch("subprocess.run")
-    def test_build_dependency_graph(self, mock_run):
-        """Тестируем создание графа зависимостей"""
-        # Моки для получения коммитов и их родительских коммитов
-        mock_run.return_value = MagicMock(returncode=0, stdout="abc123 xyz789")
-
-        # Подготовка тестовых данных
-        commits = [("abc123", "2021-01-01 00:00:00"), ("xyz789", "2021-01-02 00:00:00")]
-        repo_path = "/path/to/repo"
-
-        # Построение графа
-        graph = build_dependency_graph(commits, repo_path)
-
-        # Проверяем, что граф был построен
-        self.assertIsInstance(graph, Digraph)
-        self.assertIn("Commit: abc123", graph.source)
-        self.assertIn("Commit: xyz789", graph.source)
-        self.assertIn("xyz789", graph.source)  # Проверяем, что есть связь
-
-    @patch("graphviz.Digraph.render")
-    def test_save_graph(self, mock_render):
-        """Тестируем сохранение графа в файл"""
-        graph = Digraph()
-        output_file = "output"
-
-        # Вызов функции
-        save_graph(graph, output_file)
-
-        # Проверка, что функция render была вызвана с правильными параметрами
-        mock_render.assert_called_with(output_file, format="png")
+        self.assertEqual(commits[0][0], first)
+        self.assertEqual(commits[1][0], second)
+        self.assertEqual(commits[0][1], "2021-01-02 00:00:00")  # Дата для первого коммита
+        self.assertEqual(commits[1][1], "2021-01-01 00:00:00")  # Дата для второго коммита
+        self.assertEqual(commits[0][2], [])  # У первого коммита нет родителей
+        self.assertEqual(commits[1][2], [first])
+        self.assertEqual(mock_popen.call_count, 1)  # Один вызов git на весь список
+
+    @patch("subprocess.Popen")
+    def test_get_commits_by_tag_error(self, mock_popen):
+        mock_popen.return_value = mock_git_log("", returncode=128, stderr="unknown revision")
+        with self.assertRaises(Exception) as context:
+            get_commits_by_tag("mock_repo", "missing")
+        self.assertIn("unknown revision", str(context.exception))
+
+    def test_get_commits_from_repository(self):
+        """Тестируем получение коммитов с родителями из настоящего репозитория"""
+        with tempfile.TemporaryDirectory() as repo_path:
+            hashes = make_repo(repo_path)
+            commits = get_commits_by_tag(repo_path, "v1.0")
+
+            names = {value: key for key, value in hashes.items()}
+            order = [names[commit] for commit, _, _ in commits]
+            parents = {names[commit]: [names[parent] for parent in commit_parents] for commit, _, commit_parents in commits}
+            self.assertEqual(len(commits), 5)
+            self.assertEqual(order[0], "c1")
+            self.assertEqual(order[-1], "c5")
+            self.assertEqual(parents, {"c1": [], "c2": ["c1"], "c3": ["c1"], "c4": ["c2", "c3"], "c5": ["c4"]})
+            self.assertEqual(commits[0][1], "2021-01-01 00:00:00")
+
+            # Ребра графа соответствуют только непосредственным родителям
+            self.assertEqual(len(list(commits.edges())), 5)
 
     def test_load_config(self):
         """Тестируем загрузку конфигурации из файла"""
@@ -83,5 +133,615 @@ class TestGitVisualizer(unittest.TestCase):
         os.remove("test_config.yaml")
 
 
+class TestCommitTable(unittest.TestCase):
+
+    def setUp(self):
+        self.hashes = [f"{i:040x}" for i in range(1, 5)]
+        a, b, c, d = self.hashes
+        self.outside = "f" * 40
+        # d — слияние b и c; c ссылается на коммит вне таблицы
+        self.table = CommitTable.from_log([
+            (a, [], 1609459200),
+            (b, [a], 1609545600),
+            (c, [a, self.outside], 1609632000),
+            (d, [b, c], 1609718400),
+        ])
+
+    def test_columns(self):
+        self.assertEqual(len(self.table), 4)
+        self.assertEqual(len(self.table.oids), 4 * 20)
+        self.assertEqual(list(self.table.parents(3)), [1, 2])
+        self.assertEqual(self.table.find(self.hashes[2]), 2)
+        self.assertIsNone(self.table.find(self.outside))
+
+    def test_items_compatible_with_tuples(self):
+        a, b, c, d = self.hashes
+        self.assertEqual(self.table[0], (a, "2021-01-01 00:00:00", []))
+        self.assertEqual(self.table[-1], (d, "2021-01-04 00:00:00", [b, c]))
+        self.assertEqual(self.table[2][2], [a, self.outside])  # Порядок родителей сохраняется
+        self.assertEqual([commit for commit, _, _ in self.table], self.hashes)
+        with self.assertRaises(IndexError):
+            self.table[4]
+
+    def test_edges_skip_outside_parents(self):
+        self.assertEqual(sorted(self.table.edges()), [(0, 1), (0, 2), (1, 3), (2, 3)])
+
+
+class TestNativeBackend(unittest.TestCase):
+    """Чтение истории из каталога .git без запуска git сверяется с выводом git"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_path = self.tmp_dir.name
+        self.hashes = make_repo(self.repo_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assert_same_history(self, rev="v1.0"):
+        expected = get_commits_by_tag(self.repo_path, rev, backend="git")
+        actual = get_commits_by_tag(self.repo_path, rev, backend="native")
+        self.assertEqual(sorted(actual), sorted(expected))
+        # Родители всегда идут раньше потомков
+        position = {commit: i for i, (commit, _, _) in enumerate(actual)}
+        for i, (_, _, parents) in enumerate(actual):
+            self.assertTrue(all(position[parent] < i for parent in parents))
+        return actual
+
+    def test_loose_objects(self):
+        commits = self.assert_same_history()
+        self.assertEqual(commits[-1][0], self.hashes["c5"])
+        self.assertEqual(self.assert_same_history("main")[-1][0], self.hashes["c5"])
+        self.assertEqual(self.assert_same_history(self.hashes["c3"])[-1][0], self.hashes["c3"])
+
+    def test_packed_objects_with_commit_graph(self):
+        git(self.repo_path, "gc", "-q")
+        with Repository(self.repo_path) as repo:
+            self.assertTrue(repo.packs)
+            self.assertIsNotNone(repo.graph)
+        self.assert_same_history()
+
+    def test_split_commit_graph_and_octopus_merge(self):
+        git(self.repo_path, "commit-graph", "write", "--reachable", "--split=no-merge")
+        git(self.repo_path, "branch", "b1", self.hashes["c1"])
+        git(self.repo_path, "branch", "b2", self.hashes["c2"])
+        git(self.repo_path, "checkout", "-q", "b1")
+        git(self.repo_path, "commit", "-q", "--allow-empty", "-m", "b1")
+        git(self.repo_path, "checkout", "-q", "b2")
+        git(self.repo_path, "commit", "-q", "--allow-empty", "-m", "b2")
+        git(self.repo_path, "checkout", "-q", "main")
+        git(self.repo_path, "merge", "-q", "-m", "octopus", "b1", "b2")
+        git(self.repo_path, "commit-graph", "write", "--reachable", "--split=no-merge")
+
+        with Repository(self.repo_path) as repo:
+            self.assertEqual(len(repo.graph.layers), 2)
+        commits = self.assert_same_history("main")
+        self.assertEqual(len(commits[-1][2]), 3)
+
+    def test_delta_objects(self):
+        text = "".join(f"line {i}\n" for i in range(2000))
+        with open(os.path.join(self.repo_path, "data.txt"), "w") as file:
+            file.write(text)
+        git(self.repo_path, "add", "data.txt")
+        git(self.repo_path, "commit", "-q", "-m", "first")
+        with open(os.path.join(self.repo_path, "data.txt"), "a") as file:
+            file.write("last line\n")
+        git(self.repo_path, "commit", "-q", "-am", "second")
+        git(self.repo_path, "gc", "-q", "--aggressive")
+
+        with Repository(self.repo_path) as repo:
+            for rev in ("HEAD~1", "HEAD"):
+                blob = git(self.repo_path, "rev-parse", f"{rev}:data.txt")
+                kind, data = repo.read_object(bytes.fromhex(blob))
+                self.assertEqual(kind, "blob")
+                self.assertEqual(data.decode().strip(), git(self.repo_path, "cat-file", "blob", blob))
+        self.assert_same_history("main")
+
+    def test_unknown_revision(self):
+        with self.assertRaises(Exception) as context:
+            get_commits_by_tag(self.repo_path, "missing", backend="native")
+        self.assertIn("missing", str(context.exception))
+
+
+class TestCommitCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_path = os.path.join(self.tmp_dir.name, "repo")
+        os.makedirs(self.repo_path)
+        self.hashes = make_repo(self.repo_path)
+        self.cache = CommitCache(os.path.join(self.tmp_dir.name, "cache"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def add_release(self):
+        git(self.repo_path, "commit", "-q", "--allow-empty", "-m", "c6", date="2021-01-06T00:00:00")
+        git(self.repo_path, "tag", "v2.0")
+        return git(self.repo_path, "rev-parse", "HEAD")
+
+    def assert_incremental(self, backend):
+        first = get_commits_by_tag(self.repo_path, "v1.0", backend, cache=self.cache)
+        self.assertEqual(list(first), list(get_commits_by_tag(self.repo_path, "v1.0", backend)))
+        c6 = self.add_release()
+
+        # Дочитывается только новый коммит
+        with patch("visualize_commits.iter_commit_log", wraps=visualize_commits.iter_commit_log) as log, \
+                patch("git_objects.iter_commit_log", wraps=visualize_commits.git_objects.iter_commit_log) as native_log:
+            second = get_commits_by_tag(self.repo_path, "v2.0", backend, cache=self.cache)
+            walked = log if backend == "git" else native_log
+            self.assertEqual(walked.call_count, 1)
+        self.assertEqual(sorted(second), sorted(get_commits_by_tag(self.repo_path, "v2.0", backend)))
+        table, tips = self.cache.load(self.repo_path)
+        self.assertEqual(len(table), 6)
+        self.assertEqual(tips, [self.hashes["c5"], c6])
+
+        # История старой ветки уже есть в кеше: репозиторий не читается
+        with patch("visualize_commits.iter_commit_log") as log, patch("git_objects.iter_commit_log") as native_log:
+            feature = get_commits_by_tag(self.repo_path, self.hashes["c3"], backend, cache=self.cache)
+            log.assert_not_called()
+            native_log.assert_not_called()
+        self.assertEqual(sorted(feature), sorted(get_commits_by_tag(self.repo_path, self.hashes["c3"], backend)))
+        self.assertEqual(feature[-1][0], self.hashes["c3"])
+
+    def test_incremental_git(self):
+        self.assert_incremental("git")
+
+    def test_incremental_native(self):
+        self.assert_incremental("native")
+
+    def test_git_receives_cached_tips(self):
+        get_commits_by_tag(self.repo_path, "v1.0", cache=self.cache)
+        self.add_release()
+        with patch("visualize_commits.iter_commit_log", wraps=visualize_commits.iter_commit_log) as log:
+            get_commits_by_tag(self.repo_path, "v2.0", cache=self.cache)
+        self.assertEqual(log.call_args.kwargs["exclude"], [self.hashes["c5"]])
+
+    def test_pruned_tip_is_dropped(self):
+        """Вершина кеша, удалённая git gc, не ломает чтение и исключается из кеша."""
+        git(self.repo_path, "checkout", "-q", "-b", "temp")
+        git(self.repo_path, "commit", "-q", "--allow-empty", "-m", "temp", date="2021-01-06T00:00:00")
+        temp = git(self.repo_path, "rev-parse", "HEAD")
+        get_commits_by_tag(self.repo_path, "temp", cache=self.cache)
+        git(self.repo_path, "checkout", "-q", "main")
+        git(self.repo_path, "branch", "-q", "-D", "temp")
+        git(self.repo_path, "reflog", "expire", "--expire=now", "--all")
+        git(self.repo_path, "gc", "-q", "--prune=now")
+        self.assertEqual(visualize_commits.existing_tips(self.repo_path, [temp, self.hashes["c5"]]),
+                         [self.hashes["c5"]])
+
+        c6 = self.add_release()
+        commits = get_commits_by_tag(self.repo_path, "v2.0", cache=self.cache)
+        self.assertEqual(sorted(commits), sorted(get_commits_by_tag(self.repo_path, "v2.0")))
+        table, tips = self.cache.load(self.repo_path)
+        self.assertEqual(tips, [c6])
+        # Коммиты c1..c5 не дублируются, в таблице остаётся и коммит удалённой ветки
+        self.assertEqual(len(table), 7)
+
+    def test_corrupt_cache_is_miss(self):
+        get_commits_by_tag(self.repo_path, "v1.0", cache=self.cache)
+        path = os.path.join(self.cache.repo_dir(self.repo_path), "dag.bin")
+        with open(path, "rb") as file:
+            data = file.read()
+        for broken in (data[:-3], data[:10], data + b"x", b"not json\n" + data, b""):
+            with open(path, "wb") as file:
+                file.write(broken)
+            table, tips = self.cache.load(self.repo_path)
+            self.assertEqual((len(table), tips), (0, []))
+        commits = get_commits_by_tag(self.repo_path, "v1.0", cache=self.cache)
+        self.assertEqual(len(commits), 5)
+        self.assertEqual(len(self.cache.load(self.repo_path)[0]), 5)
+
+    @patch("visualize_commits.layout", side_effect=lambda path, output_format, engine: f"{path}.{output_format}")
+    def test_main_reuses_graph(self, mock_layout):
+        output = os.path.join(self.tmp_dir.name, "out")
+        config_file = os.path.join(self.tmp_dir.name, "config.yaml")
+        with open(config_file, "w") as file:
+            yaml.dump({"repository_path": self.repo_path, "tag_name": "v1.0", "graph_output_path": output,
+                       "cache_dir": self.cache.cache_dir, "render": {"format": "svg", "engine": "sfdp"}}, file)
+
+        visualize_commits.main(config_file)
+        with open(output) as file:
+            source = file.read()
+        os.remove(output)
+        with patch("visualize_commits.write_graph") as mock_write, patch("visualize_commits.extend_table") as mock_get:
+            visualize_commits.main(config_file)
+            mock_write.assert_not_called()
+            mock_get.assert_not_called()
+        with open(output) as file:
+            self.assertEqual(file.read(), source)
+        self.assertEqual(source.count("->"), 5)
+        mock_layout.assert_called_with(output, "svg", "sfdp")
+
+class TestGraphRender(unittest.TestCase):
+
+    def setUp(self):
+        # a - b - c - d - g (слияние) - h, ветка e - f от b, слита в g
+        names = "abcdefgh"
+        parents = {"a": [], "b": ["a"], "c": ["b"], "d": ["c"], "e": ["b"], "f": ["e"], "g": ["d", "f"], "h": ["g"]}
+        self.oid = {name: name * 40 if name in "abcdef" else f"{ord(name):040x}" for name in names}
+        self.table = CommitTable.from_log(
+            (self.oid[name], [self.oid[parent] for parent in parents[name]], 86400 * i)
+            for i, name in enumerate(names)
+        )
+
+    def render(self, **options):
+        file = io.StringIO()
+        write_dot(GraphView(self.table, **options), file)
+        return file.getvalue()
+
+    def test_dot_matches_digraph(self):
+        # Потоковая запись даёт тот же DOT, что и прежний граф graphviz.Digraph
+        dot = Digraph(comment="Git Commit Dependencies")
+        for i in range(len(self.table)):
+            dot.node(str(i), f"Commit: {self.table.oid(i)}\nDate: {self.table.date(i)}")
+        for parent, child in self.table.edges():
+            dot.edge(str(parent), str(child))
+        self.assertEqual(self.render(), dot.source)
+
+    def test_collapse_chains(self):
+        view = GraphView(self.table, collapse_chains=True)
+        # Узлы: a-b, c-d, e-f, g-h
+        self.assertEqual(len(view), 4)
+        self.assertEqual(list(view.count), [2, 2, 2, 2])
+        self.assertEqual(sorted(view.iter_edges()), [(0, 1), (0, 2), (1, 3), (2, 3)])
+        self.assertIn("Commits: 2 (aaaaaaa..bbbbbbb)", view.label(0))
+
+    def test_max_depth(self):
+        view = GraphView(self.table, max_depth=2)
+        kept = {self.table.oid(view.first[node]) for node in range(len(view))}
+        self.assertEqual(kept, {self.oid[name] for name in "hgdf"})
+        self.assertEqual(len(list(view.iter_edges())), 3)
+
+    def test_cluster_by_date_and_branch(self):
+        source = self.render(cluster="day")
+        self.assertEqual(source.count("subgraph cluster_"), 8)
+        self.assertIn('label="1970-01-01"', source)
+
+        clusters = GraphView(self.table, cluster="branch").clusters()
+        self.assertEqual(set(clusters), {"main", f"merged in {self.oid['g'][:7]}"})
+        self.assertEqual(len(clusters["main"]), 6)
+        with self.assertRaises(ValueError):
+            GraphView(self.table, cluster="week")
+
+    def test_json_output(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_graph(self.table, os.path.join(tmp_dir, "graph"), "json", collapse_chains=True)
+            self.assertEqual(layout(path, "json"), path)
+            with open(path) as file:
+                graph = json.load(file)
+        self.assertEqual(len(graph["nodes"]), 4)
+        self.assertEqual(graph["nodes"][0]["first"], self.oid["a"])
+        self.assertEqual(graph["nodes"][0]["count"], 2)
+        self.assertEqual(len(graph["edges"]), 4)
+
+    @patch("graphviz.render", return_value="graph.svg")
+    def test_layout_engine(self, mock_render):
+        self.assertEqual(layout("graph", "svg", "sfdp"), "graph.svg")
+        mock_render.assert_called_with("sfdp", "svg", "graph")
+        with self.assertRaises(ValueError):
+            layout("graph", "svg", "unknown")
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repos = []
+        for name in ("first", "second"):
+            repo_path = os.path.join(self.tmp_dir.name, name)
+            os.makedirs(repo_path)
+            make_repo(repo_path)
+            git(repo_path, "commit", "-q", "--allow-empty", "-m", "c6", date="2021-01-06T00:00:00")
+            git(repo_path, "tag", "v2.0")
+            self.repos.append(repo_path)
+        self.output = os.path.join(self.tmp_dir.name, "out", "{repo}-{tag}")
+        os.makedirs(os.path.dirname(self.output))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def options(self, **changes):
+        options = {"output_template": self.output, "single": False, "backend": "git", "cache_dir": None,
+                   "render": visualize_commits.render_options({"render": {"format": "dot"}})}
+        options.update(changes)
+        return options
+
+    def test_expand_revisions(self):
+        repo_path = self.repos[0]
+        for backend in ("git", "native"):
+            self.assertEqual(visualize_commits.expand_revisions(repo_path, ["v*"], backend), ["v1.0", "v2.0"])
+            self.assertEqual(visualize_commits.expand_revisions(repo_path, ["refs/heads/*", "main", "v1.0"], backend),
+                             ["refs/heads/feature", "refs/heads/main", "main", "v1.0"])
+
+    def test_output_path(self):
+        self.assertEqual(visualize_commits.output_path("graphs/{repo}/{tag}", "/src/konfig/", "release/1", False),
+                         "graphs/konfig/release_1")
+        self.assertEqual(visualize_commits.output_path("graph", "/src/konfig", "v1", True), "graph")
+        self.assertEqual(visualize_commits.output_path("graph", "/src/konfig", "v1", False), "graph_konfig_v1")
+
+    def test_repository_specs(self):
+        config = {"repository_path": ["a", "b"], "tag_name": "v*",
+                  "repositories": ["c", {"path": "d", "tags": ["v1.0", "v2.0"]}]}
+        self.assertEqual(visualize_commits.repository_specs(config),
+                         [("a", ["v*"]), ("b", ["v*"]), ("c", ["v*"]), ("d", ["v1.0", "v2.0"])])
+
+    def test_duplicate_repositories(self):
+        """Повторы репозитория объединяются, одинаковые имена каталогов различаются хешем пути."""
+        other = os.path.join(self.tmp_dir.name, "other", "first")
+        os.makedirs(other)
+        make_repo(other)
+        config = {"repository_path": [self.repos[0], other], "tag_name": "v1.0",
+                  "repositories": [{"path": self.repos[0] + os.sep, "tags": ["v2.0", "v1.0"]}]}
+        specs = visualize_commits.repository_specs(config)
+        self.assertEqual(specs, [(self.repos[0], ["v1.0", "v2.0"]), (other, ["v1.0"])])
+        names = visualize_commits.repository_names([path for path, _ in specs])
+        self.assertNotEqual(names[self.repos[0]], names[other])
+        self.assertTrue(names[other].startswith("first-"))
+        self.assertEqual(visualize_commits.repository_names([self.repos[1]]), {self.repos[1]: "second"})
+
+        results = visualize_commits.run_batch(specs, self.options(repo_names=names))
+        outputs = [result["output"] for result in results]
+        self.assertEqual(len(outputs), 3)
+        self.assertEqual(len(set(outputs)), 3)
+
+    def test_unmatched_pattern_is_error(self):
+        results = visualize_commits.process_repository(self.repos[0], ["release-*", "v1.0"], self.options())
+        self.assertEqual([(result["tag"], result["error"] is None) for result in results],
+                         [("release-*", False), ("v1.0", True)])
+        self.assertIn("не совпал", results[0]["error"])
+
+    def test_tags_share_history(self):
+        repo_path = self.repos[0]
+        with patch("visualize_commits.iter_commit_log", wraps=visualize_commits.iter_commit_log) as log:
+            results = visualize_commits.process_repository(repo_path, ["v*"], self.options())
+        self.assertEqual([result["error"] for result in results], [None, None])
+        # Для второго тега читается только история, недостижимая из первого
+        v1 = git(repo_path, "rev-parse", "v1.0^{commit}")
+        self.assertEqual(log.call_args_list[1].kwargs["exclude"], [v1])
+        with open(results[1]["source"]) as file:
+            self.assertEqual(file.read().count("->"), 6)
+        with open(results[0]["source"]) as file:
+            self.assertEqual(file.read().count("->"), 5)
+
+    def test_run_batch_in_pool(self):
+        specs = [(self.repos[0], ["v*"]), (os.path.join(self.tmp_dir.name, "missing"), ["v1.0"]),
+                 (self.repos[1], ["v2.0", "unknown"])]
+        results = visualize_commits.run_batch(specs, self.options(), jobs=2)
+        self.assertEqual([(os.path.basename(result["repository"]), result["tag"]) for result in results],
+                         [("first", "v1.0"), ("first", "v2.0"), ("missing", "v1.0"), ("second", "v2.0"), ("second", "unknown")])
+        self.assertEqual([result["error"] is None for result in results], [True, True, False, True, False])
+        self.assertTrue(os.path.isfile(self.output.format(repo="second", tag="v2.0")))
+
+    def test_main_batch(self):
+        config_file = os.path.join(self.tmp_dir.name, "config.yaml")
+        with open(config_file, "w") as file:
+            yaml.dump({"repositories": [{"path": repo_path, "tags": ["v*"]} for repo_path in self.repos],
+                       "graph_output_path": self.output, "jobs": 2, "render": {"format": "json"}}, file)
+        with patch("builtins.print") as mock_print:
+            visualize_commits.main(config_file)
+        mock_print.assert_called_with("Построено графов: 4, ошибок: 0")
+        self.assertTrue(os.path.isfile(self.output.format(repo="first", tag="v2.0") + ".json"))
+
+
+class TestHistoryFilters(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_path = self.tmp_dir.name
+        self.hashes = make_repo(self.repo_path)
+        with open(os.path.join(self.repo_path, "a.txt"), "w") as file:
+            file.write("a\n")
+        git(self.repo_path, "add", "a.txt")
+        git(self.repo_path, "commit", "-q", "-m", "c6", date="2021-01-06T00:00:00")
+        self.hashes["c6"] = git(self.repo_path, "rev-parse", "HEAD")
+        self.names = {value: key for key, value in self.hashes.items()}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def history(self, backend, **filters):
+        """Коммиты и их родители по именам"""
+        commits = get_commits_by_tag(self.repo_path, "main", backend, filters=filters)
+        return {self.names[commit]: [self.names[parent] for parent in parents] for commit, _, parents in commits}
+
+    def assert_history(self, expected, **filters):
+        for backend in ("git", "native"):
+            self.assertEqual(self.history(backend, **filters), expected, backend)
+
+    def test_max_count(self):
+        self.assert_history({"c5": ["c4"], "c6": ["c5"]}, max_count=2)
+
+    def test_since_until(self):
+        self.assert_history({"c4": ["c2", "c3"], "c5": ["c4"], "c6": ["c5"]}, since="2021-01-03T12:00:00+00:00")
+        self.assert_history({"c1": [], "c2": ["c1"]}, until="2021-01-02T12:00:00+00:00")
+
+    def test_first_parent(self):
+        # Второй родитель слияния остаётся вне выборки, ребра к нему в графе нет
+        self.assert_history({"c1": [], "c2": ["c1"], "c4": ["c2", "c3"], "c5": ["c4"], "c6": ["c5"]}, first_parent=True)
+        commits = get_commits_by_tag(self.repo_path, "main", filters={"first_parent": True})
+        self.assertEqual(len(list(commits.edges())), 4)
+
+    def test_paths_only_in_git(self):
+        self.assertEqual(self.history("git", paths=["a.txt"]), {"c6": []})
+        with self.assertRaises(ValueError):
+            self.history("native", paths=["a.txt"])
+
+    def test_filtered_graph_keeps_inner_edges(self):
+        commits = get_commits_by_tag(self.repo_path, "main", filters={"max_count": 3})
+        self.assertEqual(len(commits), 3)
+        self.assertEqual(sorted(commits.edges()), [(0, 1), (1, 2)])
+
+    @patch("subprocess.Popen")
+    def test_filters_passed_to_git(self, mock_popen):
+        mock_popen.return_value = mock_git_log("")
+        get_commits_by_tag("mock_repo", "v1.0", filters={"since": "2 weeks ago", "max_count": 10, "paths": ["src"]})
+        command = mock_popen.call_args.args[0]
+        self.assertIn("--since=2 weeks ago", command)
+        self.assertIn("--max-count=10", command)
+        self.assertEqual(command[-3:], ["v1.0", "--", "src"])
+
+    def test_history_filters_config(self):
+        self.assertEqual(visualize_commits.history_filters({"filters": {"paths": "src", "since": None}}),
+                         {"paths": ["src"]})
+        with self.assertRaises(ValueError):
+            visualize_commits.history_filters({"filters": {"author": "me"}})
+
+
+class TestCommitDAG(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_path = self.tmp_dir.name
+        self.hashes = make_repo(self.repo_path)
+        # Ветка от c2 с ещё одним слиянием feature: у c3 и c6 два лучших общих предка
+        git(self.repo_path, "checkout", "-q", "-b", "side", self.hashes["c2"])
+        git(self.repo_path, "merge", "-q", "--no-ff", "-m", "c6", "feature", date="2021-01-06T00:00:00")
+        self.hashes["c6"] = git(self.repo_path, "rev-parse", "HEAD")
+        self.names = {value: key for key, value in self.hashes.items()}
+        self.dag, _ = visualize_commits.load_dag(self.repo_path, ["v1.0", "side"])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def node(self, name):
+        return self.dag.index(self.hashes[name])
+
+    def test_generation(self):
+        generations = {name: self.dag.generation[self.node(name)] for name in self.hashes}
+        self.assertEqual(generations, {"c1": 1, "c2": 2, "c3": 2, "c4": 3, "c5": 4, "c6": 3})
+
+    def test_is_ancestor_matches_git(self):
+        for a in self.hashes:
+            for b in self.hashes:
+                code = subprocess.run(["git", "-C", self.repo_path, "merge-base", "--is-ancestor",
+                                       self.hashes[a], self.hashes[b]]).returncode
+                self.assertEqual(self.dag.is_ancestor(self.node(a), self.node(b)), code == 0, (a, b))
+
+    def test_merge_bases_match_git(self):
+        for a, b in (("c5", "c6"), ("c3", "c2"), ("c4", "c5"), ("c1", "c1")):
+            expected = git(self.repo_path, "merge-base", "--all", self.hashes[a], self.hashes[b]).split()
+            bases = [self.dag.table.oid(i) for i in self.dag.merge_bases(self.node(a), self.node(b))]
+            self.assertEqual(sorted(bases), sorted(expected), (a, b))
+        bases = self.dag.merge_bases(self.node("c5"), self.node("c6"))
+        self.assertEqual(sorted(self.names[self.dag.table.oid(i)] for i in bases), ["c2", "c3"])
+
+    def test_between_matches_rev_list(self):
+        expected = git(self.repo_path, "rev-list", "side..v1.0").split()
+        between = [self.dag.table.oid(i) for i in self.dag.between(self.node("c6"), self.node("c5"))]
+        self.assertEqual(sorted(between), sorted(expected))
+        self.assertEqual([self.names[commit] for commit in between], ["c5", "c4"])
+
+    def test_throughput_and_stats(self):
+        self.assertEqual(self.dag.throughput(), [(f"2021-01-0{day}", 1) for day in range(1, 7)])
+        stats = self.dag.stats()
+        self.assertEqual((stats["commits"], stats["merges"], stats["roots"], stats["heads"]), (6, 2, 1, 2))
+
+    def test_random_dag_matches_brute_force(self):
+        import random
+        rng = random.Random(1)
+        log = []
+        for i in range(300):
+            parents = sorted({rng.randrange(i) for _ in range(rng.choice((1, 1, 2, 3)))}) if i else []
+            log.append((f"{i:040x}", [f"{p:040x}" for p in parents], i * 3600))
+        table = CommitTable.from_log(log)
+        dag = CommitDAG(table)
+        ancestors = [table.ancestors(i) for i in range(len(table))]
+        for _ in range(2000):
+            a, b = rng.randrange(len(table)), rng.randrange(len(table))
+            self.assertEqual(dag.is_ancestor(a, b), bool(ancestors[b][a]))
+            common = [c for c in range(len(table)) if ancestors[a][c] and ancestors[b][c]]
+            best = [c for c in common if not any(o != c and ancestors[o][c] for o in common)]
+            self.assertEqual(dag.merge_bases(a, b), best)
+
+    def test_query_cli(self):
+        with patch("builtins.print") as mock_print:
+            visualize_commits.cli(["query", "--repo", self.repo_path, "--config", "missing.yaml",
+                                   "merge-base", "v1.0", "side"])
+        printed = sorted(call.args[0] for call in mock_print.call_args_list)
+        self.assertEqual(printed, sorted([self.hashes["c2"], self.hashes["c3"]]))
+        self.assertEqual(visualize_commits.query_dag(self.repo_path, "ancestor", [self.hashes["c1"], "side"]),
+                         ["yes"])
+        self.assertEqual(visualize_commits.query_dag(self.repo_path, "throughput", ["side", "v1.0"]),
+                         ["2021-01-04 1", "2021-01-05 1"])
+        self.assertEqual(visualize_commits.query_dag(self.repo_path, "stats", ["side"])[0], "commits: 4")
+        with self.assertRaises(ValueError):
+            visualize_commits.query_dag(self.repo_path, "ancestor", ["v1.0"])
+
+    def test_query_uses_cache(self):
+        cache = CommitCache(os.path.join(self.repo_path, ".cache"))
+        visualize_commits.load_dag(self.repo_path, ["v1.0"], cache=cache)
+        with patch("visualize_commits.iter_commit_log", side_effect=AssertionError("git log вызван")):
+            lines = visualize_commits.query_dag(self.repo_path, "stats", ["v1.0"], cache=cache)
+        self.assertEqual(lines[0], "commits: 5")
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo_path = os.path.join(self.tmp_dir.name, "repo")
+        os.makedirs(self.repo_path)
+        make_repo(self.repo_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_stage_timer(self):
+        with profiling.StageTimer(memory=True) as timer:
+            with profiling.stage("history"):
+                with profiling.stage("history"):  # Вложенный замер того же этапа не учитывается
+                    subprocess.run(["git", "--version"], stdout=subprocess.PIPE)
+                data = [0] * 100000
+            del data
+        with profiling.stage("graph"):  # Вне StageTimer замеров нет
+            pass
+        self.assertEqual(list(timer.stages), ["history"])
+        history = timer.stages["history"]
+        self.assertEqual((history["calls"], history["subprocesses"]), (1, 1))
+        self.assertGreater(history["peak_memory"], 100000 * 8)
+
+    def test_profiled_functions(self):
+        with profiling.StageTimer() as timer:
+            get_commits_by_tag(self.repo_path, "v1.0")
+        self.assertEqual(list(timer.stages), ["history"])
+        self.assertEqual(timer.stages["history"]["calls"], 1)
+        self.assertGreaterEqual(timer.stages["history"]["subprocesses"], 1)
+
+    def test_main_writes_report(self):
+        report_path = os.path.join(self.tmp_dir.name, "report.json")
+        cprofile_path = os.path.join(self.tmp_dir.name, "run.prof")
+        config_path = os.path.join(self.tmp_dir.name, "config.yaml")
+        config = {
+            "repository_path": self.repo_path,
+            "tag_name": "v1.0",
+            "graph_output_path": os.path.join(self.tmp_dir.name, "graph"),
+            "render": {"format": "dot"},
+            "profile": {"enabled": True, "report": report_path, "memory": True, "cprofile": cprofile_path},
+        }
+        with open(config_path, "w") as file:
+            yaml.safe_dump(config, file)
+        with patch("builtins.print"):
+            visualize_commits.main(config_path)
+        with open(report_path, encoding="utf-8") as file:
+            report = json.load(file)
+        self.assertEqual(set(report["stages"]), {"history", "graph", "layout"})
+        graph = report["graphs"][0]
+        self.assertEqual((graph["tag"], graph["commits"], graph["error"]), ("v1.0", 5, None))
+        self.assertGreaterEqual(graph["stages"]["history"]["subprocesses"], 2)
+        self.assertIsNotNone(graph["stages"]["graph"]["peak_memory"])
+        self.assertEqual(report["settings"]["render"]["output_format"], "dot")
+        self.assertGreater(pstats.Stats(cprofile_path).total_calls, 0)
+
+    def test_profile_in_pool(self):
+        options = {"output_template": os.path.join(self.tmp_dir.name, "{tag}"), "single": False, "backend": "git",
+                   "cache_dir": None, "render": visualize_commits.render_options({"render": {"format": "dot"}}),
+                   "profile": {"memory": False}}
+        results = visualize_commits.run_batch([(self.repo_path, ["v1.0", "main"])], options, jobs=2)
+        self.assertEqual([result["stats"]["commits"] for result in results], [5, 5])
+        self.assertTrue(all("layout" in result["stats"]["stages"] for result in results))
+        self.assertIsNone(visualize_commits.profile_options({"profile": {"enabled": False}}))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,78 +1,267 @@
+import argparse
+import cProfile
+import fnmatch
+import hashlib
+import json
 import os
+import shutil
 import subprocess
-from datetime import datetime
-from typing import List, Tuple
-from graphviz import Digraph
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Iterator, List, Sequence, Tuple
 import yaml
+from commit_table import CommitTable
+from commit_cache import CommitCache
+from commit_dag import CommitDAG
+from graph_render import layout, write_graph
+from profiling import StageTimer, build_report, profiled, stage, write_report
+import git_objects
 
-def get_commits_by_tag(repo_path: str, tag_name: str) -> List[Tuple[str, str]]:
+# Способы чтения истории: запуск git или чтение каталога .git напрямую (git_objects);
+# auto выбирает git, если он установлен
+BACKENDS = ("git", "native", "auto")
+
+# Фильтры истории, которые передаются в запрос к git
+HISTORY_FILTERS = ("since", "until", "max_count", "first_parent", "paths")
+
+# Запросы к графу коммитов (подкоманда query) и число их аргументов-ревизий
+QUERIES = {"ancestor": 2, "merge-base": 2, "between": 2, "throughput": (1, 2), "stats": (0, 1)}
+
+def iter_commit_log(repo_path: str, rev: str, exclude: Sequence[str] = (),
+                    filters: dict = None) -> Iterator[Tuple[str, List[str], int]]:
     """
-    Получает список коммитов для указанного тега в репозитории.
+    Получает хеш, родителей и время всех коммитов ревизии одним вызовом git.
+
+    Вывод git разбирается построчно прямо из канала, не дожидаясь завершения
+    процесса. Коммиты идут от старых к новым, родители — раньше потомков.
+    Коммиты, достижимые из exclude, пропускаются; эти ревизии передаются
+    через stdin, чтобы длина командной строки не зависела от их числа.
+    Фильтры (см. filter_args) выполняет сам git.
     """
     git_command = [
         "git",
         "-C",
         repo_path,
         "log",
-        "--pretty=format:%H %ct",  # Получаем хеш коммита и время
-        tag_name,
+        "--topo-order",
+        "--reverse",
+        "--pretty=format:%H %P %ct",  # Хеш коммита, хеши родителей и время
+        *filter_args(filters),
+        rev,
     ]
-    result = subprocess.run(git_command, stdout=subprocess.PIPE, text=True)
+    if exclude:
+        git_command.append("--stdin")
+    if filters and filters.get("paths"):
+        git_command += ["--", *filters["paths"]]
+    with subprocess.Popen(git_command, stdin=subprocess.PIPE if exclude else None,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as process:
+        if exclude:
+            process.stdin.write("".join(f"^{tip}\n" for tip in exclude))
+            process.stdin.close()
+        for line in process.stdout:
+            parts = line.split()
+            if parts:
+                yield parts[0], parts[1:-1], int(parts[-1])
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise Exception(f"Ошибка при выполнении git команды: {stderr}")
+
+def filter_args(filters: dict = None) -> List[str]:
+    """
+    Параметры git log для фильтров истории: since, until (даты в любом
+    формате git), max_count, first_parent. При фильтре по путям (paths)
+    родители переписываются (--parents), чтобы рёбра графа соединяли
+    оставшиеся коммиты.
+    """
+    if not filters:
+        return []
+    args = []
+    if filters.get("since") is not None:
+        args.append(f"--since={filters['since']}")
+    if filters.get("until") is not None:
+        args.append(f"--until={filters['until']}")
+    if filters.get("max_count") is not None:
+        args.append(f"--max-count={int(filters['max_count'])}")
+    if filters.get("first_parent"):
+        args.append("--first-parent")
+    if filters.get("paths"):
+        args.append("--parents")
+    return args
+
+def choose_backend(backend: str) -> str:
+    """Проверяет способ чтения истории; auto заменяется на git, если он установлен"""
+    if backend == "auto":
+        return "git" if shutil.which("git") else "native"
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный способ чтения истории: {backend}")
+    return backend
+
+def resolve_tip(repo_path: str, rev: str, backend: str = "git") -> str:
+    """
+    Возвращает хеш коммита, на который указывает тег или другая ревизия.
+    """
+    if choose_backend(backend) == "native":
+        return git_objects.resolve_tip(repo_path, rev)
+    result = subprocess.run(
+        ["git", "-C", repo_path, "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    if result.returncode != 0:
+        raise Exception(f"Ошибка при выполнении git команды: ревизия {rev} не найдена {result.stderr}")
+    return result.stdout.strip()
 
+def existing_tips(repo_path: str, tips: Sequence[str]) -> List[str]:
+    """
+    Вершины из tips, объекты которых ещё есть в репозитории. После
+    принудительной отправки или удаления ветки git gc удаляет старую
+    вершину, и git log с ^<хеш> завершался бы ошибкой bad object.
+    Все вершины проверяются одним вызовом git cat-file --batch-check.
+    """
+    if not tips:
+        return []
+    result = subprocess.run(
+        ["git", "-C", repo_path, "cat-file", "--batch-check=%(objectname) %(objecttype)"],
+        input="".join(f"{tip}\n" for tip in tips), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
     if result.returncode != 0:
         raise Exception(f"Ошибка при выполнении git команды: {result.stderr}")
+    found = {line.split()[0] for line in result.stdout.splitlines() if line.endswith(" commit")}
+    return [tip for tip in tips if tip in found]
 
-    commits = result.stdout.splitlines()
-    commit_data = [
-        (
-            c.split()[0],  # Хеш коммита
-            datetime.utcfromtimestamp(int(c.split()[1])).strftime("%Y-%m-%d %H:%M:%S"),  # Преобразуем метку времени в дату
-        )
-        for c in commits
-    ]
-    return commit_data[::-1]  # Возвращаем коммиты в обратном порядке (по порядку, от старого к новому)
-
-def build_dependency_graph(commits: List[Tuple[str, str]], repo_path: str) -> Digraph:
+@profiled("history")
+def get_commits_by_tag(repo_path: str, tag_name: str, backend: str = "git", cache: CommitCache = None,
+                       filters: dict = None) -> CommitTable:
     """
-    Строит граф зависимостей для коммитов.
+    Получает коммиты для указанного тега в репозитории.
+
+    Коммиты хранятся в компактной таблице CommitTable в порядке от старых к новым;
+    элемент таблицы — (хеш, дата, хеши родителей). С кешем читаются только
+    коммиты, которых в нём ещё нет. С фильтрами история неполна, поэтому кеш
+    не используется; родители за границей выборки остаются вне таблицы.
     """
-    dot = Digraph(comment="Git Commit Dependencies")  # Создаем объект для графа
+    backend = choose_backend(backend)
+    if cache is not None and not filters:
+        return get_commits_cached(repo_path, resolve_tip(repo_path, tag_name, backend), backend, cache)
+    if backend == "native":
+        log = git_objects.iter_commit_log(repo_path, tag_name, filters=filters)
+    else:
+        log = iter_commit_log(repo_path, tag_name, filters=filters)
+    return CommitTable.from_log(log)
 
-    # Для каждого коммита добавляем узел в граф
-    for i, (commit, date) in enumerate(commits):
-        dot.node(str(i), f"Commit: {commit}\nDate: {date}")
+def history_filters(config: dict) -> dict:
+    """Фильтры истории из раздела filters конфигурации (пустые значения отбрасываются)"""
+    filters = config.get("filters") or {}
+    unknown = set(filters) - set(HISTORY_FILTERS)
+    if unknown:
+        raise ValueError(f"Неизвестные фильтры истории: {', '.join(sorted(unknown))}")
+    result = {key: value for key, value in filters.items() if value not in (None, False, [], "")}
+    if "paths" in result:
+        result["paths"] = as_list(result["paths"])
+    return result
 
-        # Формируем команду для получения родительских коммитов
-        git_command = [
-            "git",
-            "-C",
-            repo_path,
-            "log",
-            "--pretty=format:%H",
-            "--parents",  # Показываем родительские коммиты
-            commit,
-        ]
-        result = subprocess.run(git_command, stdout=subprocess.PIPE, text=True)
+def get_commits_cached(repo_path: str, tip: str, backend: str, cache: CommitCache) -> CommitTable:
+    """
+    Получает коммиты, достижимые из вершины tip (хеш коммита), через кеш.
 
-        if result.returncode != 0:
-            raise Exception(f"Ошибка при получении родительских коммитов для {commit}")
+    Из репозитория читаются только коммиты, недостижимые из сохранённых в кеше
+    вершин; они дописываются в таблицу кеша, и кеш сохраняется.
+    """
+    table, tips = cache.load(repo_path)
+    if extend_table(repo_path, table, tips, tip, backend):
+        cache.save(repo_path, table, tips + [tip])
+    return select_history(table, tip)
 
-        parent_commits = result.stdout.split()
+def extend_table(repo_path: str, table: CommitTable, tips: List[str], tip: str, backend: str) -> bool:
+    """
+    Дописывает в таблицу коммиты вершины tip, недостижимые из вершин tips
+    (таблица содержит историю tips). Возвращает False, если вершина
+    уже есть в таблице и репозиторий не читался.
 
-        # Добавляем ребра между коммитами и их родителями
-        for parent in parent_commits[1:]:  # Пропускаем сам коммит
-            parent_index = next((index for index, c in enumerate(commits) if c[0] == parent), None)
-            if parent_index is not None:
-                dot.edge(str(parent_index), str(i))  # Добавляем ребро между коммитом и родителем
+    Вершины, которых больше нет в репозитории, удаляются из списка tips
+    на месте (existing_tips). Без них git может снова выдать коммиты, которые
+    уже есть в таблице; такие коммиты пропускаются.
+    """
+    if table.find(tip) is not None:
+        return False
+    dropped = False
+    if choose_backend(backend) == "native":
+        log = git_objects.iter_commit_log(repo_path, tip, known=table.index)
+    else:
+        present = existing_tips(repo_path, tips)
+        dropped = len(present) < len(tips)
+        tips[:] = present
+        log = iter_commit_log(repo_path, tip, exclude=tips)
+    for commit, parents, timestamp in log:
+        if not table:
+            table.oid_size = len(commit) // 2
+        elif dropped and table.find(commit) is not None:
+            continue
+        table.append(commit, parents, timestamp)
+    return True
 
-    return dot  # Возвращаем построенный граф
+def load_dag(repo_path: str, revisions: Sequence[str], backend: str = "git",
+             cache: CommitCache = None) -> Tuple[CommitDAG, List[str]]:
+    """
+    Строит граф коммитов по истории всех ревизий и возвращает его вместе
+    с хешами вершин ревизий. Каждая следующая ревизия дочитывает только
+    новые коммиты; с кешем история берётся из него и дополняется.
+    """
+    backend = choose_backend(backend)
+    table, tips = cache.load(repo_path) if cache is not None else (CommitTable(), [])
+    changed = False
+    heads = []
+    for rev in revisions:
+        tip = resolve_tip(repo_path, rev, backend)
+        if extend_table(repo_path, table, tips, tip, backend):
+            tips = tips + [tip]
+            changed = True
+        heads.append(tip)
+    if cache is not None and changed:
+        cache.save(repo_path, table, tips)
+    return CommitDAG(table), heads
 
-def save_graph(graph: Digraph, output_file: str) -> None:
+def query_dag(repo_path: str, command: str, revisions: Sequence[str], backend: str = "git",
+              cache: CommitCache = None) -> List[str]:
     """
-    Сохраняет граф в файл в формате PNG.
+    Выполняет запрос к графу коммитов и возвращает строки ответа:
+    - ancestor A B — является ли A предком B (yes/no);
+    - merge-base X Y — лучшие общие предки;
+    - between A B — коммиты из B, недостижимые из A (A..B), от новых к старым;
+    - throughput [A] B — число коммитов по дням в истории B (или в A..B);
+    - stats [REV] — сведения о графе истории REV (по умолчанию HEAD).
     """
-    graph.render(output_file, format="png")  # Сохраняем граф в формате PNG
-    print(f"Граф успешно сохранён в файл {output_file}.png")
+    if command not in QUERIES:
+        raise ValueError(f"Неизвестный запрос: {command}")
+    counts = QUERIES[command]
+    counts = counts if isinstance(counts, tuple) else (counts,)
+    if len(revisions) not in counts:
+        raise ValueError(f"Запрос {command}: неверное число ревизий ({len(revisions)})")
+    if command == "stats" and not revisions:
+        revisions = ["HEAD"]
+    dag, heads = load_dag(repo_path, revisions, backend, cache)
+    nodes = [dag.index(tip) for tip in heads]
+    table = dag.table
+    if command == "ancestor":
+        return ["yes" if dag.is_ancestor(*nodes) else "no"]
+    if command == "merge-base":
+        return [table.oid(i) for i in dag.merge_bases(*nodes)]
+    if command == "between":
+        return [f"{table.oid(i)} {table.date(i)}" for i in dag.between(*nodes)]
+    if command == "throughput":
+        start = nodes[0] if len(nodes) == 2 else None
+        return [f"{day} {count}" for day, count in dag.throughput(dag.between(start, nodes[-1]))]
+    history = select_history(table, heads[0])
+    if history is not table:
+        dag = CommitDAG(history)  # В кеше есть коммиты других вершин
+    return [f"{key}: {value}" for key, value in dag.stats().items()]
+
+def select_history(table: CommitTable, tip: str) -> CommitTable:
+    """История вершины tip из общей таблицы"""
+    mask = table.ancestors(table.find(tip))
+    if mask.count(0) == 0:
+        return table  # В таблице только история этой вершины
+    return table.select(mask)
 
 def load_config(config_file: str) -> dict:
     """
@@ -85,32 +274,357 @@ def main(config_file: str) -> None:
     """
     Основная логика программы:
     - Загружает настройки из конфигурационного файла,
-    - Получает коммиты для указанного тега,
-    - Строит граф зависимостей и сохраняет его в файл.
+    - Получает коммиты для указанных тегов каждого репозитория,
+    - Строит графы зависимостей и сохраняет их в файлы.
+
+    Граф записывается потоково (graph_render) и упрощается по параметрам
+    раздела render. Если задан cache_dir, разобранная история и исходный текст
+    графа сохраняются на диске: при неизменной вершине тега граф берётся из кеша.
+
+    Репозитории обрабатываются параллельно в пуле из jobs процессов: история
+    репозитория читается один раз для всех его тегов, а раскладка каждого
+    графа выполняется отдельной задачей того же пула.
+
+    Раздел profile включает замеры этапов: отчёт JSON и, по желанию,
+    профиль cProfile основного процесса (при jobs > 1 работа идёт в других
+    процессах, поэтому для профиля лучше jobs: 1).
     """
     config = load_config(config_file)
-    repo_path = config["repository_path"]
-    tag_name = config["tag_name"]
-    graph_output_path = config["graph_output_path"]
+    specs = repository_specs(config)
+    single = len(specs) == 1 and len(specs[0][1]) == 1 and not is_pattern(specs[0][1][0])
+    options = {
+        "output_template": config["graph_output_path"],
+        "single": single,
+        "backend": config.get("backend", "git"),
+        "cache_dir": config.get("cache_dir"),
+        "render": render_options(config),
+        "filters": history_filters(config),
+        "repo_names": repository_names([repo_path for repo_path, _ in specs]),
+    }
+    profile = profile_options(config)
+    if profile is not None:
+        options["profile"] = {"memory": profile["memory"]}
+    profiler = cProfile.Profile() if profile is not None and profile["cprofile"] else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    results = run_batch(specs, options, config.get("jobs", 1))
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(profile["cprofile"])
+    seconds = time.perf_counter() - start
+
+    for result in results:
+        if result["error"] is not None:
+            print(f"Ошибка: {result['repository']} {result['tag']}: {result['error']}")
+        else:
+            print(f"Граф успешно сохранён в файл {result['output']}")
+    if not single:
+        failed = sum(1 for result in results if result["error"] is not None)
+        print(f"Построено графов: {len(results) - failed}, ошибок: {failed}")
+    if profile is not None:
+        settings = {key: options[key] for key in ("backend", "cache_dir", "render", "filters")}
+        settings["jobs"] = config.get("jobs", 1)
+        write_report(build_report(results, seconds, settings), profile["report"])
+        print(f"Отчёт о замерах сохранён в файл {profile['report']}")
+
+def as_list(value) -> list:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+def repository_specs(config: dict) -> List[Tuple[str, List[str]]]:
+    """
+    Список (путь к репозиторию, теги или шаблоны ссылок) из конфигурации.
+
+    repository_path и tag_name могут быть строкой или списком; в разделе
+    repositories у каждого репозитория можно указать свои теги:
+    repositories: [{path: ..., tags: ["v*"]}, "путь/без/своих/тегов"].
+
+    Репозиторий, указанный несколько раз (в том числе под разными путями),
+    обрабатывается одной задачей со всеми его тегами: иначе задачи писали бы
+    одни и те же графы и файлы кеша.
+    """
+    default_tags = as_list(config.get("tag_name"))
+    items = [(path, default_tags) for path in as_list(config.get("repository_path"))]
+    for item in config.get("repositories") or []:
+        if isinstance(item, str):
+            items.append((item, default_tags))
+        else:
+            items.append((item["path"], as_list(item.get("tags", default_tags))))
+    specs = []
+    positions = {}
+    for path, tags in items:
+        key = os.path.realpath(path)
+        if key not in positions:
+            positions[key] = len(specs)
+            specs.append((path, list(tags)))
+        else:
+            merged = specs[positions[key]][1]
+            merged.extend(tag for tag in tags if tag not in merged)
+    return specs
+
+def is_pattern(name: str) -> bool:
+    return any(char in name for char in "*?[")
+
+def list_refs(repo_path: str, backend: str = "git") -> List[str]:
+    """Полные имена всех ссылок репозитория (refs/heads/..., refs/tags/...)"""
+    if choose_backend(backend) == "native":
+        return git_objects.list_refs(repo_path)
+    result = subprocess.run(["git", "-C", repo_path, "for-each-ref", "--format=%(refname)"],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Ошибка при выполнении git команды: {result.stderr}")
+    return result.stdout.split()
+
+def expand_patterns(repo_path: str, patterns: List[str], backend: str = "git") -> List[Tuple[str, List[str]]]:
+    """
+    Ревизии каждого шаблона: "v*" сопоставляется с именами тегов, "refs/heads/*" —
+    с полными именами ссылок; имена без символов шаблона остаются как есть.
+    Шаблон, не совпавший ни с одной ссылкой, получает пустой список.
+    """
+    refs = None
+    expanded = []
+    for pattern in patterns:
+        if not is_pattern(pattern):
+            matched = [pattern]
+        else:
+            if refs is None:
+                refs = list_refs(repo_path, backend)
+            if pattern.startswith("refs/"):
+                matched = [ref for ref in refs if fnmatch.fnmatchcase(ref, pattern)]
+            else:
+                tags = (ref[len("refs/tags/"):] for ref in refs if ref.startswith("refs/tags/"))
+                matched = [tag for tag in tags if fnmatch.fnmatchcase(tag, pattern)]
+        expanded.append((pattern, matched))
+    return expanded
+
+def expand_revisions(repo_path: str, patterns: List[str], backend: str = "git") -> List[str]:
+    """Раскрывает шаблоны (см. expand_patterns) в список ревизий без повторов"""
+    revisions = []
+    for _, matched in expand_patterns(repo_path, patterns, backend):
+        revisions.extend(rev for rev in matched if rev not in revisions)
+    return revisions
+
+def repository_names(paths: Sequence[str]) -> dict:
+    """
+    Имена репозиториев для путей графов: имя каталога, а если оно совпадает
+    у нескольких репозиториев (a/proj и b/proj), к нему добавляется хеш пути.
+    """
+    bases = {path: os.path.basename(os.path.normpath(path)) for path in paths}
+    counts = {}
+    for base in bases.values():
+        counts[base] = counts.get(base, 0) + 1
+    names = {}
+    for path, base in bases.items():
+        if counts[base] > 1:
+            base += "-" + hashlib.sha1(os.path.realpath(path).encode("utf-8")).hexdigest()[:8]
+        names[path] = base
+    return names
+
+def output_path(template: str, repo_path: str, tag: str, single: bool, repo_name: str = None) -> str:
+    """
+    Путь графа: шаблон может содержать {repo} (repo_name или имя каталога
+    репозитория) и {tag}; без них к пути дописываются имя репозитория и тег.
+    """
+    names = {
+        "repo": repo_name or os.path.basename(os.path.normpath(repo_path)),
+        "tag": tag.replace("/", "_"),
+    }
+    if "{repo}" in template or "{tag}" in template:
+        return template.format(**names)
+    if single:
+        return template
+    return f"{template}_{names['repo']}_{names['tag']}"
+
+def process_repository(repo_path: str, patterns: List[str], options: dict) -> List[dict]:
+    """
+    Записывает исходные тексты графов всех тегов одного репозитория.
+
+    Все теги разделяют одну таблицу коммитов: для каждого следующего тега
+    читаются только коммиты, недостижимые из предыдущих. С фильтрами истории
+    каждый тег читается отдельным запросом, а кеш не используется. Возвращает
+    результаты по тегам: {"repository", "tag", "source", "error"}.
+
+    Если в options задан profile, у каждого результата есть stats — число
+    коммитов и замеры этапов (см. profiling); в history первого тега входят
+    также чтение ссылок и кеша.
+    """
+    backend = options["backend"]
+    render = options["render"]
+    filters = options.get("filters")
+    cache = CommitCache(options["cache_dir"]) if options["cache_dir"] and not filters else None
+    variant = render_variant(render)
+    profile = options.get("profile")
+    timer = StageTimer(profile["memory"]) if profile else None
+    results = []
 
     # Проверяем, существует ли указанный путь к репозиторию
     if not os.path.exists(repo_path):
-        print(f"Ошибка: Путь к репозиторию '{repo_path}' не существует.")
-        return
+        error = f"Путь к репозиторию '{repo_path}' не существует."
+        return [{"repository": repo_path, "tag": ", ".join(patterns), "source": None, "error": error}]
+    try:
+        with timer or nullcontext(), stage("history"):
+            expanded = expand_patterns(repo_path, patterns, backend)
+            table, tips = cache.load(repo_path) if cache is not None else (CommitTable(), [])
+    except Exception as error:
+        return [{"repository": repo_path, "tag": ", ".join(patterns), "source": None, "error": str(error)}]
+    revisions = []
+    for pattern, matched in expanded:
+        if not matched:
+            error = f"Шаблон '{pattern}' не совпал ни с одной ссылкой"
+            results.append({"repository": repo_path, "tag": pattern, "source": None, "error": error})
+        revisions.extend(rev for rev in matched if rev not in revisions)
+    changed = False
 
-    # Получаем коммиты для указанного тега
-    commits = get_commits_by_tag(repo_path, tag_name)
+    for tag in revisions:
+        result = {"repository": repo_path, "tag": tag, "source": None, "error": None}
+        results.append(result)
+        graph_output_path = output_path(options["output_template"], repo_path, tag, options["single"],
+                                        options.get("repo_names", {}).get(repo_path))
+        source_path = f"{graph_output_path}.json" if render["output_format"] == "json" else graph_output_path
+        commits = None
+        try:
+            with timer or nullcontext():
+                with stage("history"):
+                    tip = resolve_tip(repo_path, tag, backend)
+                    cached = cache.get_graph(repo_path, tip, variant) if cache is not None else None
+                    if cached is None:
+                        if filters:
+                            commits = get_commits_by_tag(repo_path, tip, backend, filters=filters)
+                        else:
+                            if extend_table(repo_path, table, tips, tip, backend):
+                                tips = tips + [tip]
+                                changed = True
+                            commits = select_history(table, tip)
+                with stage("graph"):
+                    if cached is not None:
+                        # Вершина тега не изменилась: граф уже построен, остаётся только раскладка
+                        shutil.copyfile(cached, source_path)
+                    else:
+                        # Записываем граф зависимостей коммитов прямо в файл, без объекта Digraph
+                        write_graph(commits, graph_output_path, render["output_format"],
+                                    render["collapse_chains"], render["max_depth"], render["cluster"])
+                        if cache is not None:
+                            cache.put_graph(repo_path, tip, source_path, variant)
+            result["source"] = source_path
+        except Exception as error:
+            result["error"] = str(error)
+        if timer is not None:
+            result["stats"] = {"commits": len(commits) if commits is not None else None, "stages": timer.stages}
+            timer = StageTimer(profile["memory"])
 
-    # Если коммиты не найдены, выводим сообщение
-    if not commits:
-        print(f"Не найдено коммитов для тега {tag_name}")
-        return
+    if cache is not None and changed:
+        cache.save(repo_path, table, tips)
+    return results
+
+def layout_result(result: dict, render: dict, profile: dict = None) -> dict:
+    """Раскладка одного графа; ошибка Graphviz записывается в результат"""
+    timer = StageTimer(profile["memory"]) if profile and "stats" in result else None
+    try:
+        with timer or nullcontext(), stage("layout"):
+            result["output"] = layout(result["source"], render["output_format"], render["engine"])
+    except Exception as error:
+        result["error"] = str(error)
+    if timer is not None:
+        result["stats"]["stages"].update(timer.stages)
+    return result
+
+def run_batch(specs: List[Tuple[str, List[str]]], options: dict, jobs: int = 1) -> List[dict]:
+    """
+    Обрабатывает репозитории и раскладывает графы. При jobs > 1 задачи
+    выполняются в пуле процессов: раскладка графов репозитория ставится
+    в пул, как только его история обработана.
+    """
+    render = options["render"]
+    profile = options.get("profile")
+    if jobs <= 1:
+        results = []
+        for repo_path, patterns in specs:
+            for result in process_repository(repo_path, patterns, options):
+                results.append(layout_result(result, render, profile) if result["error"] is None else result)
+        return results
+
+    # Результаты собираются в порядке репозиториев и тегов, а не завершения задач
+    per_repository = [None] * len(specs)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = {pool.submit(process_repository, repo_path, patterns, options): i
+                   for i, (repo_path, patterns) in enumerate(specs)}
+        for future in as_completed(pending):
+            per_repository[pending[future]] = [
+                pool.submit(layout_result, result, render, profile) if result["error"] is None else result
+                for result in future.result()
+            ]
+        return [item.result() if isinstance(item, Future) else item for items in per_repository for item in items]
+
+def render_options(config: dict) -> dict:
+    """
+    Параметры отрисовки из раздела render конфигурации: формат (png, svg, pdf,
+    dot, json), программа раскладки (dot, sfdp, ...), сворачивание линейных
+    цепочек, группировка (day, month, branch) и ограничение глубины.
+    """
+    render = config.get("render") or {}
+    return {
+        "output_format": render.get("format", "png"),
+        "engine": render.get("engine", "dot"),
+        "collapse_chains": bool(render.get("collapse_chains", False)),
+        "cluster": render.get("cluster"),
+        "max_depth": render.get("max_depth"),
+    }
 
-    # Строим граф зависимостей коммитов
-    graph = build_dependency_graph(commits, repo_path)
-    # Сохраняем граф в файл
-    save_graph(graph, graph_output_path)
+def profile_options(config: dict) -> dict:
+    """
+    Параметры замеров из раздела profile конфигурации или None, если замеры
+    выключены: файл отчёта JSON, замер памяти (tracemalloc) и файл cProfile.
+    """
+    profile = config.get("profile") or {}
+    if not profile.get("enabled"):
+        return None
+    return {
+        "report": profile.get("report") or "profile_report.json",
+        "memory": bool(profile.get("memory", False)),
+        "cprofile": profile.get("cprofile"),
+    }
+
+def render_variant(render: dict) -> str:
+    """Ключ кеша графа: параметры, от которых зависит исходный текст графа"""
+    key = [render["output_format"] == "json", render["collapse_chains"], render["cluster"], render["max_depth"]]
+    return hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()[:12]
+
+def parse_args(argv: Sequence[str] = None) -> argparse.Namespace:
+    """
+    Разбирает командную строку. Без подкоманды (или с render) строятся графы
+    по конфигурации; query отвечает на вопросы об истории без построения графа.
+    """
+    parser = argparse.ArgumentParser(description="Граф зависимостей коммитов git")
+    commands = parser.add_subparsers(dest="command")
+    render = commands.add_parser("render", help="построить графы по конфигурации")
+    render.add_argument("config", nargs="?", default="config.yaml", help="файл конфигурации")
+    query = commands.add_parser("query", help="запрос к графу коммитов")
+    query.add_argument("query", choices=list(QUERIES), help="вид запроса")
+    query.add_argument("revisions", nargs="*", help="ревизии: теги, ветки или хеши")
+    query.add_argument("--config", default="config.yaml", help="файл конфигурации (backend, cache_dir)")
+    query.add_argument("--repo", help="путь к репозиторию (по умолчанию первый из конфигурации)")
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args.config = "config.yaml"  # Путь к вашему конфигурационному файлу
+    return args
+
+def cli(argv: Sequence[str] = None) -> None:
+    args = parse_args(argv)
+    if args.command != "query":
+        main(args.config)
+        return
+    config = load_config(args.config) if os.path.isfile(args.config) else {}
+    repo_path = args.repo
+    if repo_path is None:
+        specs = repository_specs(config)
+        if not specs:
+            raise SystemExit("Ошибка: не указан репозиторий (--repo или repository_path в конфигурации)")
+        repo_path = specs[0][0]
+    cache = CommitCache(config["cache_dir"]) if config.get("cache_dir") else None
+    for line in query_dag(repo_path, args.query, args.revisions, config.get("backend", "git"), cache):
+        print(line)
 
 if __name__ == "__main__":
-    config_file = "config.yaml"  # Путь к вашему конфигурационному файлу
-    main(config_file)
+    cli()
@@ -0,0 +1,56 @@
+import argparse
+import time
+import yaml
+from bench_translator import DOCUMENTS
+from config_parser import parse_config
+from config_translator import ConfigTranslator
+
+"""
+python bench_parser.py
+python bench_parser.py --scale 0.25 --repeat 5 --documents wide
+"""
+
+# Способы загрузки: разбор конфигурационного языка и загрузка эквивалентного YAML
+VARIANTS = {
+    "parser": lambda config_text, yaml_text: parse_config(config_text),
+    "safe_load": lambda config_text, yaml_text: yaml.safe_load(yaml_text),
+}
+if yaml.__with_libyaml__:
+    VARIANTS["libyaml"] = lambda config_text, yaml_text: yaml.load(yaml_text, Loader=yaml.CSafeLoader)
+
+
+def best_time(function, repeat):
+    """Лучшее время из repeat запусков"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора конфигурационного языка и загрузки YAML")
+    parser.add_argument("--scale", type=float, default=1.0, help="Множитель размера документов wide и deep")
+    parser.add_argument("--repeat", type=int, default=3, help="Число запусков, берётся лучшее время")
+    parser.add_argument("--documents", nargs="+", default=["wide", "deep"], choices=list(DOCUMENTS))
+    args = parser.parse_args()
+
+    print(f"{'документ':>10}{'конфиг, КиБ':>14}{'YAML, КиБ':>12}" + "".join(f"{variant + ', с':>16}" for variant in VARIANTS)
+          + f"{'парсер, МиБ/с':>16}{'к safe_load':>14}")
+    for name in args.documents:
+        yaml_text = yaml.safe_dump(DOCUMENTS[name](args.scale), sort_keys=False)
+        config_text = ConfigTranslator(None, None).translate_data(yaml.safe_load(yaml_text))
+        if ConfigTranslator(None, None).translate_data(parse_config(config_text)) != config_text:
+            raise AssertionError(f"{name}: parsed document does not translate back to the same text")
+        times = {variant: best_time(lambda: function(config_text, yaml_text), args.repeat)
+                 for variant, function in VARIANTS.items()}
+        print(f"{name:>10}{len(config_text) / 1024:>14.1f}{len(yaml_text) / 1024:>12.1f}"
+              + "".join(f"{times[variant]:>16.3f}" for variant in VARIANTS)
+              + f"{len(config_text) / 2**20 / times['parser']:>16.2f}"
+              + f"{times['safe_load'] / times['parser']:>13.1f}x")
+
+
+if __name__ == "__main__":
+    main()
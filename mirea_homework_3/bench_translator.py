@@ -0,0 +1,109 @@
+import argparse
+import os
+import re
+import tempfile
+import time
+import yaml
+import config_translator
+from config_translator import ConfigTranslator
+
+"""
+python bench_translator.py
+python bench_translator.py --scale 0.2 --repeat 5
+"""
+
+
+class BaselineTranslator(ConfigTranslator):
+    """Прежний вариант: чисто питоновский загрузчик и re.match с некомпилированным шаблоном для каждого ключа"""
+    loader = yaml.SafeLoader
+
+    def validate_name(self, name):
+        pattern = r'^[_a-zA-Z][_a-zA-Z0-9]*$'
+        if not re.match(pattern, name):
+            raise ValueError(f"Invalid name: {name}")
+
+
+class PureLoaderTranslator(ConfigTranslator):
+    """Быстрая проверка имён, но чисто питоновский загрузчик"""
+    loader = yaml.SafeLoader
+
+
+def small_document(scale):
+    """Небольшой конфиг из нескольких разделов, как db_config.yaml"""
+    return {
+        "port": 5432,
+        "host": "localhost",
+        "credentials": {"username": "admin", "password": "secret"},
+        "replicas": ["db1", "db2", "db3"],
+        "limits": {"connections": 100, "timeout": 2.5, "ref": "^port"},
+    }
+
+
+def wide_document(scale):
+    """Много однотипных разделов: одни и те же ключи повторяются тысячи раз"""
+    return {f"service_{i}": {"name": f"svc{i}", "port": 8000 + i, "hosts": ["a", "b"],
+                             "env": {"level": i, "debug": False, "path": "/srv"}}
+            for i in range(int(20000 * scale))}
+
+
+def deep_document(scale):
+    """Цепочки глубоко вложенных словарей"""
+    def chain(depth):
+        node = {"leaf": 1}
+        for level in range(depth):
+            node = {"level": level, "items": [level, "x"], "child": node}
+        return node
+    return {f"chain_{i}": chain(100) for i in range(max(1, int(200 * scale)))}
+
+
+DOCUMENTS = {"small": small_document, "wide": wide_document, "deep": deep_document}
+
+# Варианты перевода: класс транслятора и метод
+VARIANTS = {
+    "baseline": (BaselineTranslator, "translate"),
+    "fast names": (PureLoaderTranslator, "translate"),
+    "libyaml": (ConfigTranslator, "translate"),
+    "libyaml stream": (ConfigTranslator, "translate_stream"),
+}
+
+
+def run(input_file, output_file, variant, repeat):
+    """Лучшее время перевода из repeat запусков"""
+    translator_class, method = VARIANTS[variant]
+    best = None
+    for _ in range(repeat):
+        config_translator.is_valid_name.cache_clear()
+        translator = translator_class(input_file, output_file)
+        start = time.perf_counter()
+        getattr(translator, method)()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк перевода YAML в учебный конфигурационный язык")
+    parser.add_argument("--scale", type=float, default=1.0, help="Множитель размера документов wide и deep")
+    parser.add_argument("--repeat", type=int, default=3, help="Число запусков, берётся лучшее время")
+    parser.add_argument("--documents", nargs="+", default=list(DOCUMENTS), choices=list(DOCUMENTS))
+    args = parser.parse_args()
+
+    print(f"libyaml: {'есть' if yaml.__with_libyaml__ else 'нет'}")
+    print(f"{'документ':>10}{'КиБ':>10}" + "".join(f"{variant + ', с':>18}" for variant in VARIANTS)
+          + f"{'ускорение':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file = os.path.join(tmp_dir, "input.yaml")
+        output_file = os.path.join(tmp_dir, "output.txt")
+        for name in args.documents:
+            with open(input_file, "w", encoding="utf-8") as file:
+                yaml.safe_dump(DOCUMENTS[name](args.scale), file, sort_keys=False)
+            # Маленький документ переводится многократно, чтобы время было измеримым
+            repeat = args.repeat * 100 if name == "small" else args.repeat
+            times = {variant: run(input_file, output_file, variant, repeat) for variant in VARIANTS}
+            print(f"{name:>10}{os.path.getsize(input_file) / 1024:>10.1f}"
+                  + "".join(f"{times[variant]:>18.4f}" for variant in VARIANTS)
+                  + f"{times['baseline'] / times['libyaml']:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import json
+import re
+import sys
+import yaml
+from config_translator import is_valid_name
+
+"""
+python config_parser.py db_config_translated.txt
+python config_parser.py network_config_translated.txt --output network_config.yaml
+python config_parser.py db_config_translated.txt --format json
+"""
+
+# Пробелы между элементами коллекций, в том числе переводы строк
+BLANK = re.compile(r"[ \t\r\n]*")
+# Пробелы внутри строки
+SPACES = re.compile(r"[ \t]*")
+# Начало записи верхнего уровня: имя is
+ENTRY = re.compile(r"([^\s=(){},]+)[ \t]+is(?=[ \t\r\n]|\Z)[ \t]*")
+# Начало записи словаря: имя =
+FIELD = re.compile(r"([^\s=(){},]+)[ \t]*=[ \t]*")
+# Скаляр верхнего уровня занимает всю строку
+LINE = re.compile(r"[^\n]*")
+# Скаляр внутри коллекции заканчивается разделителем или концом строки
+ITEM = re.compile(r"[^,)}\n]*")
+# Имя перед словом is или знаком = (для сообщений об ошибках)
+NAME = re.compile(r"[^\s=(){},]*")
+
+# Числа в том виде, в каком их записывает str(): 42, -7, 2.5, 1e+20, inf, nan
+INTEGER = re.compile(r"[-+]?[0-9]+")
+FLOAT = re.compile(r"[-+]?(?:(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?|[0-9]+[eE][-+]?[0-9]+|inf|nan)")
+# Первые символы чисел: остальные скаляры сразу считаются строками
+NUMBER_START = frozenset("0123456789+-.in")
+# Логические значения транслятор записывает как str(True) и str(False)
+KEYWORDS = {"True": True, "False": False}
+
+# Символы, которые закрывают коллекции, и их открывающие пары
+CLOSING = {"(": ")", "{": "}"}
+
+
+class ConfigSyntaxError(ValueError):
+    """Синтаксическая ошибка с позицией в тексте: строка и столбец начинаются с 1."""
+
+    def __init__(self, message, source, line, column):
+        super().__init__(f"{source}:{line}:{column}: {message}")
+        self.message = message
+        self.source = source
+        self.line = line
+        self.column = column
+
+
+def parse_scalar(text):
+    """Число, логическое значение или строка — обратно к translate_scalar."""
+    if text in KEYWORDS:
+        return KEYWORDS[text]
+    if text and text[0] in NUMBER_START:
+        if INTEGER.fullmatch(text):
+            return int(text)
+        if FLOAT.fullmatch(text):
+            return float(text)
+    return text
+
+
+class ConfigParser:
+    """
+    Разбор учебного конфигурационного языка, в который переводит
+    ConfigTranslator: записи «имя is значение», списки ( a, b ), словари
+    { ключ = значение, ... }, числа и строки без кавычек.
+
+    Текст читается за один проход без возвратов: каждый метод разбирает
+    конструкцию с позиции pos и возвращает значение и позицию после неё.
+    Лексемы (имена, скаляры, пробелы) выделяются скомпилированными
+    регулярными выражениями, поэтому цикл на Python идёт по лексемам,
+    а не по символам.
+
+    Строки записываются транслятором без кавычек, поэтому обратно
+    не восстанавливаются строки, похожие на числа или True/False, пустые
+    строки в коллекциях, строки с пробелами по краям, а внутри коллекций —
+    строки с символами , ) } и строки, начинающиеся с ( или {.
+    """
+
+    def __init__(self, text, source="<string>"):
+        self.text = text
+        self.source = source
+
+    def parse(self):
+        """Разбирает весь текст в словарь верхнего уровня."""
+        text = self.text
+        end = len(text)
+        result = {}
+        pos = BLANK.match(text, 0).end()
+        while pos < end:
+            match = ENTRY.match(text, pos)
+            if match is None:
+                self.expected_entry(pos)
+            name = match.group(1)
+            self.check_name(name, pos, result)
+            value, pos = self.value(match.end(), LINE)
+            result[name] = value
+            pos = SPACES.match(text, pos).end()
+            if pos < end and text[pos] not in "\r\n":
+                raise self.error("expected end of line after value", pos)
+            pos = BLANK.match(text, pos).end()
+        return result
+
+    def value(self, pos, scalar):
+        """Список, словарь или скаляр; scalar — выражение, выделяющее скаляр в этом месте."""
+        char = self.text[pos:pos + 1]
+        if char == "(":
+            return self.list(pos)
+        if char == "{":
+            return self.dict(pos)
+        end = scalar.match(self.text, pos).end()
+        return parse_scalar(self.text[pos:end].rstrip(" \t\r")), end
+
+    def list(self, start):
+        """( значение, значение ); пустой список записывается как (  )."""
+        text = self.text
+        pos = BLANK.match(text, start + 1).end()
+        if text.startswith(")", pos):
+            return [], pos + 1
+        result = []
+        while True:
+            value, pos = self.value(pos, ITEM)
+            result.append(value)
+            pos = BLANK.match(text, pos).end()
+            char = text[pos:pos + 1]
+            if char == ")":
+                return result, pos + 1
+            if char != ",":
+                raise self.unclosed(start, pos, "','")
+            pos = BLANK.match(text, pos + 1).end()
+
+    def dict(self, start):
+        """{ ключ = значение, ... }; транслятор пишет каждую запись на отдельной строке."""
+        text = self.text
+        pos = BLANK.match(text, start + 1).end()
+        if text.startswith("}", pos):
+            return {}, pos + 1
+        result = {}
+        while True:
+            match = FIELD.match(text, pos)
+            if match is None:
+                self.expected_field(start, pos)
+            name = match.group(1)
+            self.check_name(name, pos, result)
+            value, pos = self.value(match.end(), ITEM)
+            result[name] = value
+            pos = BLANK.match(text, pos).end()
+            char = text[pos:pos + 1]
+            if char == "}":
+                return result, pos + 1
+            if char != ",":
+                raise self.unclosed(start, pos, "','")
+            pos = BLANK.match(text, pos + 1).end()
+
+    def check_name(self, name, pos, names):
+        if not is_valid_name(name):
+            raise self.error(f"Invalid name: {name}", pos)
+        if name in names:
+            raise self.error(f"Duplicate name: {name}", pos)
+
+    def expected_entry(self, pos):
+        """Ошибка в начале записи верхнего уровня: неверное имя или нет слова is."""
+        name_end = NAME.match(self.text, pos).end()
+        if name_end == pos:
+            raise self.error("expected name", pos)
+        raise self.error("expected 'is' after name", SPACES.match(self.text, name_end).end())
+
+    def expected_field(self, start, pos):
+        """Ошибка в начале записи словаря."""
+        if pos >= len(self.text):
+            raise self.unclosed(start, pos, "name")
+        name_end = NAME.match(self.text, pos).end()
+        if name_end == pos:
+            raise self.error("expected name", pos)
+        raise self.error("expected '=' after name", SPACES.match(self.text, name_end).end())
+
+    def unclosed(self, start, pos, expected):
+        """Ошибка внутри коллекции, открытой в позиции start."""
+        closing = CLOSING[self.text[start]]
+        if pos >= len(self.text):
+            line, column = self.position(start)
+            return self.error(f"unclosed '{self.text[start]}' opened at line {line}, column {column}", pos)
+        return self.error(f"expected {expected} or '{closing}'", pos)
+
+    def position(self, pos):
+        """Строка и столбец позиции; считаются только для сообщений об ошибках."""
+        line_start = self.text.rfind("\n", 0, pos) + 1
+        return self.text.count("\n", 0, pos) + 1, pos - line_start + 1
+
+    def error(self, message, pos):
+        line, column = self.position(pos)
+        return ConfigSyntaxError(message, self.source, line, column)
+
+
+def parse_config(text, source="<string>"):
+    """Разбирает текст конфигурационного языка в словарь."""
+    return ConfigParser(text, source).parse()
+
+
+def load_config(path):
+    """Загружает файл, созданный ConfigTranslator."""
+    with open(path, "r", encoding="utf-8") as file:
+        return parse_config(file.read(), path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Config language to YAML/JSON parser")
+    parser.add_argument("input", help="File in the config language")
+    parser.add_argument("-o", "--output", help="Output file (default: standard output)")
+    parser.add_argument("--format", choices=["yaml", "json"], default="yaml", help="Output format")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        data = load_config(args.input)
+    except (OSError, ConfigSyntaxError) as e:
+        print(f"Error: {e}")
+        return 1
+    if args.format == "json":
+        text = json.dumps(data, ensure_ascii=False, indent=2) + "\n"
+    else:
+        text = yaml.safe_dump(data, allow_unicode=True, sort_keys=False)
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,127 @@
 import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
 import yaml
 import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from yaml.composer import ComposerError
+from yaml.events import (AliasEvent, CollectionEndEvent, CollectionStartEvent, MappingEndEvent,
+                         MappingStartEvent, ScalarEvent, SequenceEndEvent, SequenceStartEvent, StreamEndEvent)
+from yaml.nodes import ScalarNode
+
+try:
+    # Загрузчик на основе libyaml (C) в несколько раз быстрее чисто питоновского
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Теги коллекций, которые потоковый режим переводит так же, как safe_load
+DEFAULT_SEQUENCE_TAGS = (None, "!", "tag:yaml.org,2002:seq")
+DEFAULT_MAPPING_TAGS = (None, "!", "tag:yaml.org,2002:map")
+MERGE_TAG = "tag:yaml.org,2002:merge"
+
+# Допустимое имя: латинские буквы, цифры и подчёркивание, не с цифры
+NAME_PATTERN = re.compile(r'^[_a-zA-Z][_a-zA-Z0-9]*$')
+
+# Суффикс выходного файла в пакетном режиме: db_config.yaml -> db_config_translated.txt
+OUTPUT_SUFFIX = "_translated.txt"
+YAML_EXTENSIONS = (".yaml", ".yml")
+
+# Версия транслятора: при изменении формата вывода записи кеша переводов устаревают
+TRANSLATOR_VERSION = 1
+
+
+class EventReader:
+    """
+    События парсера YAML с подстановкой псевдонимов.
+
+    События узла с якорем (&name) запоминаются, пока узел не закончится, и
+    повторяются вместо псевдонима (*name). В памяти остаются только узлы
+    с якорями, а не весь документ.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.anchors = {}
+        self.recorders = []  # [якорь, события, глубина] для узлов с якорем, которые ещё читаются
+        self.replaying = []  # Итераторы по событиям подставляемых псевдонимов
+
+    def get(self):
+        event, replayed = self._next()
+        if isinstance(event, AliasEvent):
+            events = self.anchors.get(event.anchor)
+            if events is None:
+                raise ComposerError(None, None, f"found undefined alias {event.anchor!r}", event.start_mark)
+            self.replaying.append(iter(events))
+            event, replayed = self._next()
+
+        for recorder in self.recorders:
+            recorder[1].append(event)
+            if isinstance(event, CollectionStartEvent):
+                recorder[2] += 1
+            elif isinstance(event, CollectionEndEvent):
+                recorder[2] -= 1
+        while self.recorders and self.recorders[-1][2] == 0:
+            anchor, events, _ = self.recorders.pop()
+            self.anchors[anchor] = events
+
+        anchor = getattr(event, "anchor", None)
+        if anchor is not None and not replayed:
+            if isinstance(event, CollectionStartEvent):
+                self.recorders.append([anchor, [event], 1])
+            else:
+                self.anchors[anchor] = [event]
+        return event
+
+    def _next(self):
+        while self.replaying:
+            event = next(self.replaying[-1], None)
+            if event is not None:
+                return event, True
+            self.replaying.pop()
+        return self.loader.get_event(), False
+
+    def construct_scalar(self, event):
+        """Значение скаляра так же, как его построил бы safe_load"""
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = self.loader.resolve(ScalarNode, event.value, event.implicit)
+        node = ScalarNode(tag, event.value, event.start_mark, event.end_mark, event.style)
+        constructor = self.loader.yaml_constructors.get(tag, self.loader.yaml_constructors[None])
+        return constructor(self.loader, node)
+
+
+@lru_cache(maxsize=1 << 16)
+def is_valid_name(name):
+    """Проверяет имя; результат запоминается, ведь одни и те же ключи повторяются на каждом уровне."""
+    return NAME_PATTERN.match(name) is not None
 
 
 class ConfigTranslator:
-    def __init__(self, input_file, output_file):
+    # Загрузчик YAML: CSafeLoader, если PyYAML собран с libyaml, иначе SafeLoader
+    loader = SafeLoader
+
+    def __init__(self, input_file, output_file, constants=None):
         self.input_file = input_file
         self.output_file = output_file
-        self.constants = {}
+        # Общие константы копируются: константы файла не должны попадать в другие файлы
+        self.constants = dict(constants or {})
+        self.shared = set(self.constants)  # Имена общих констант, не переопределённые в файле
+        self.dependencies = {}  # Использованные общие константы: имя -> значение
 
     def validate_name(self, name):
         """Проверяет, соответствует ли имя требованиям синтаксиса."""
-        pattern = r'^[_a-zA-Z][_a-zA-Z0-9]*$'  # Разрешить строчные буквы
-        if not re.match(pattern, name):
+        if not is_valid_name(name):
             raise ValueError(f"Invalid name: {name}")
 
     def translate_value(self, value, indent=0):
         """Преобразует значение с учётом вложенности и форматирования."""
         spacing = " " * indent
-        if isinstance(value, (int, float)):
-            return str(value)
-        elif isinstance(value, list):
+        if isinstance(value, list):
             translated_items = ", ".join(self.translate_value(item) for item in value)
             return f"( {translated_items} )"
         elif isinstance(value, dict):
@@ -29,18 +130,35 @@ class ConfigTranslator:
                 for key, val in value.items()
             )
             return f"{{\n{translated_items}\n{spacing}}}"
+        return self.translate_scalar(value)
+
+    def translate_scalar(self, value):
+        """Преобразует число или строку (в том числе ссылку на константу)."""
+        if isinstance(value, (int, float)):
+            return str(value)
         elif isinstance(value, str):
             # Если строка — это ссылка на константу
             if value.startswith("^"):
-                const_name = value[1:]
-                if const_name not in self.constants:
-                    raise ValueError(f"Undefined constant: {const_name}")
-                return str(self.constants[const_name])
+                return str(self.resolve_constant(value[1:]))
             # Простая строка
             return value  # Убираем кавычки
         else:
             raise ValueError(f"Unsupported value type: {type(value)}")
 
+    def resolve_constant(self, name):
+        """Значение константы по ссылке ^name; использованные общие константы запоминаются."""
+        if name not in self.constants:
+            raise ValueError(f"Undefined constant: {name}")
+        value = self.constants[name]
+        if name in self.shared:
+            self.dependencies[name] = value
+        return value
+
+    def define_constant(self, name, value):
+        """Константа файла; она скрывает общую константу с тем же именем."""
+        self.constants[name] = value
+        self.shared.discard(name)
+
     def translate_name(self, name):
         """Переводит имя, проверяя его синтаксис."""
         self.validate_name(name)
@@ -49,38 +167,459 @@ class ConfigTranslator:
     def translate(self):
         """Выполняет основное преобразование."""
         with open(self.input_file, "r", encoding="utf-8") as file:
-            data = yaml.safe_load(file)
+            data = yaml.load(file, Loader=self.loader)
+        text = self.translate_data(data)
 
+        # Запись через временный файл: выходной файл не бывает записан наполовину
+        tmp_file = self.output_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tmp_file, self.output_file)
+
+    def translate_data(self, data):
+        """Переводит загруженный документ (словарь верхнего уровня) в текст конфигурационного языка."""
         result = []
         for key, value in data.items():
             self.validate_name(key)
             if isinstance(value, str) and value.startswith("^"):
-                const_name = value[1:]
-                if const_name not in self.constants:
-                    raise ValueError(f"Undefined constant: {const_name}")
-                result.append(f"{key} is {self.constants[const_name]}")
+                result.append(f"{key} is {self.resolve_constant(value[1:])}")
             else:
                 translated_value = self.translate_value(value)
                 result.append(f"{key} is {translated_value}")
                 if isinstance(value, (int, float)):
-                    self.constants[key] = value
+                    self.define_constant(key, value)
+        return "\n".join(result)
+
+    def translate_stream(self):
+        """
+        Выполняет преобразование в потоковом режиме: документ не загружается
+        целиком, а перевод пишется в файл по мере чтения событий парсера.
+        Память зависит от глубины вложенности, а не от размера документа.
+
+        Результат совпадает с translate(). Отличия: повторяющиеся ключи и
+        ключи слияния (<<) не поддерживаются, а узлы с якорями хранятся
+        в памяти до конца документа. Файл записывается через временный
+        и при ошибке не создаётся.
+        """
+        tmp_file = self.output_file + ".tmp"
+        try:
+            with open(self.input_file, "r", encoding="utf-8") as source, \
+                    open(tmp_file, "w", encoding="utf-8") as out:
+                loader = self.loader(source)
+                try:
+                    self._stream_document(EventReader(loader), out)
+                finally:
+                    loader.dispose()
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        os.replace(tmp_file, self.output_file)
+
+    def _stream_document(self, reader, out):
+        """Переводит единственный документ потока; верхний уровень — словарь."""
+        reader.get()  # StreamStartEvent
+        event = reader.get()
+        if isinstance(event, StreamEndEvent):
+            raise ValueError("Empty YAML document")
+        document_mark = event.start_mark
+        event = reader.get()
+        if not isinstance(event, MappingStartEvent) or event.tag not in DEFAULT_MAPPING_TAGS:
+            raise ValueError("Top-level YAML value must be a mapping")
+
+        names = set()
+        first = True
+        while True:
+            event = reader.get()
+            if isinstance(event, MappingEndEvent):
+                break
+            key = self._stream_key(reader, event, names)
+            if not first:
+                out.write("\n")
+            first = False
+            event = reader.get()
+            if isinstance(event, ScalarEvent):
+                value = reader.construct_scalar(event)
+                if isinstance(value, str) and value.startswith("^"):
+                    out.write(f"{key} is {self.resolve_constant(value[1:])}")
+                    continue
+                out.write(f"{key} is {self.translate_scalar(value)}")
+                if isinstance(value, (int, float)):
+                    self.define_constant(key, value)
+            else:
+                out.write(f"{key} is ")
+                self._stream_value(reader, event, 0, out)
+
+        reader.get()  # DocumentEndEvent
+        event = reader.get()
+        if not isinstance(event, StreamEndEvent):
+            raise ComposerError("expected a single document in the stream", document_mark,
+                                "but found another document", event.start_mark)
 
-        with open(self.output_file, "w", encoding="utf-8") as file:
-            file.write("\n".join(result))
+    def _stream_key(self, reader, event, names):
+        """Проверяет ключ словаря; повторы и ключи слияния потоковый режим не поддерживает."""
+        if not isinstance(event, ScalarEvent):
+            raise ValueError(f"Invalid name: complex key{event.start_mark}")
+        if event.tag is None and reader.loader.resolve(ScalarNode, event.value, event.implicit) == MERGE_TAG:
+            raise ValueError("Merge keys (<<) are not supported in streaming mode")
+        key = reader.construct_scalar(event)
+        self.validate_name(key)
+        if key in names:
+            raise ValueError(f"Duplicate key {key} is not supported in streaming mode")
+        names.add(key)
+        return key
+
+    def _stream_value(self, reader, event, indent, out):
+        """Записывает значение по событиям так же, как его переводит translate_value."""
+        if isinstance(event, ScalarEvent):
+            out.write(self.translate_scalar(reader.construct_scalar(event)))
+        elif isinstance(event, SequenceStartEvent):
+            if event.tag not in DEFAULT_SEQUENCE_TAGS:
+                raise ValueError(f"Unsupported tag in streaming mode: {event.tag}")
+            out.write("( ")
+            first = True
+            while True:
+                event = reader.get()
+                if isinstance(event, SequenceEndEvent):
+                    break
+                if not first:
+                    out.write(", ")
+                first = False
+                # Элементы списка, как в translate_value, переводятся без отступа
+                self._stream_value(reader, event, 0, out)
+            out.write(" )")
+        elif isinstance(event, MappingStartEvent):
+            if event.tag not in DEFAULT_MAPPING_TAGS:
+                raise ValueError(f"Unsupported tag in streaming mode: {event.tag}")
+            spacing = " " * indent
+            out.write("{\n")
+            names = set()
+            first = True
+            while True:
+                event = reader.get()
+                if isinstance(event, MappingEndEvent):
+                    break
+                key = self._stream_key(reader, event, names)
+                if not first:
+                    out.write(",\n")
+                first = False
+                out.write(f"{spacing}    {key} = ")
+                self._stream_value(reader, reader.get(), indent + 4, out)
+            out.write(f"\n{spacing}}}")
+        else:
+            raise ValueError(f"Unexpected YAML event: {event}")
 
     @staticmethod
-    def parse_args():
+    def parse_args(argv=None):
         """Разбирает аргументы командной строки."""
         parser = argparse.ArgumentParser(description="YAML to Config Translator")
-        parser.add_argument("-i", "--input", required=True, help="Input YAML file")
-        parser.add_argument("-o", "--output", required=True, help="Output file")
-        return parser.parse_args()
+        parser.add_argument("-i", "--input", help="Input YAML file")
+        parser.add_argument("-o", "--output", help="Output file")
+        parser.add_argument("--stream", action="store_true",
+                            help="Translate by YAML events without loading the whole document")
+        parser.add_argument("-b", "--batch", nargs="+",
+                            help="Directories or glob patterns of YAML files to translate in parallel")
+        parser.add_argument("--output-dir", help=f"Output directory for batch mode (default: next to inputs, "
+                                                 f"with suffix {OUTPUT_SUFFIX})")
+        parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Worker processes for batch mode")
+        parser.add_argument("-c", "--constants", help="YAML file with shared numeric constants for ^name references")
+        parser.add_argument("--cache", help="Translation cache file: unchanged inputs are skipped")
+        args = parser.parse_args(argv)
+        if args.batch is None and (args.input is None or args.output is None):
+            parser.error("either -i/--input and -o/--output or -b/--batch is required")
+        return args
 
 
-if __name__ == "__main__":
-    args = ConfigTranslator.parse_args()
-    translator = ConfigTranslator(args.input, args.output)
+def load_constants(path):
+    """Загружает общие константы: словарь имя -> число верхнего уровня файла YAML."""
+    with open(path, "r", encoding="utf-8") as file:
+        data = yaml.load(file, Loader=SafeLoader) or {}
+    if not isinstance(data, dict):
+        raise ValueError(f"Constants file must contain a mapping: {path}")
+    translator = ConfigTranslator(path, None)
+    for name, value in data.items():
+        translator.validate_name(name)
+        if not isinstance(value, (int, float)):
+            raise ValueError(f"Constant {name} must be a number")
+    return data
+
+
+def collect_inputs(patterns):
+    """
+    Входные файлы пакетного режима: каталоги просматриваются рекурсивно
+    (файлы .yaml и .yml), остальное — шаблоны glob. Возвращает пары
+    (путь, путь относительно каталога или шаблона) без повторов, по порядку.
+    """
+    inputs = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(YAML_EXTENSIONS):
+                        path = os.path.join(root, name)
+                        inputs.setdefault(os.path.normpath(path), os.path.relpath(path, pattern))
+        else:
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    inputs.setdefault(os.path.normpath(path), os.path.basename(path))
+    return list(inputs.items())
+
+
+def output_path(input_file, relative, output_dir=None):
+    """Путь выходного файла: имя входного без расширения и OUTPUT_SUFFIX."""
+    stem = os.path.splitext(relative if output_dir else input_file)[0] + OUTPUT_SUFFIX
+    return os.path.join(output_dir, stem) if output_dir else stem
+
+
+class TranslationCache:
+    """
+    Кеш переводов в файле JSON. Для каждого входного файла хранятся хеш
+    содержимого, размер и время изменения входа и выхода, версия транслятора
+    и использованные общие константы с их значениями. Файл не переводится
+    заново, если всё это не изменилось: сначала сравнивается stat, при его
+    расхождении — хеш содержимого.
+
+    Константы образуют граф зависимостей: константа -> файлы, которые на неё
+    ссылаются. Изменение общей константы делает устаревшими только эти файлы.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") == TRANSLATOR_VERSION:
+            self.entries = data["entries"]
+
+    @staticmethod
+    def key(input_file):
+        return os.path.abspath(input_file)
+
+    def get(self, input_file):
+        return self.entries.get(self.key(input_file))
+
+    def update(self, results):
+        """Запоминает записи переведённых файлов и забывает файлы с ошибками."""
+        for result in results:
+            if result["entry"] is not None:
+                self.entries[self.key(result["input"])] = result["entry"]
+            else:
+                self.entries.pop(self.key(result["input"]), None)
+
+    def dependents(self):
+        """Граф зависимостей: имя общей константы -> входные файлы, которые на неё ссылаются."""
+        graph = {}
+        for input_file, entry in self.entries.items():
+            for name in entry["constants"]:
+                graph.setdefault(name, []).append(input_file)
+        return graph
+
+    def invalidated(self, constants):
+        """Входные файлы, которые устарели из-за изменения общих констант."""
+        stale = set()
+        for name, files in self.dependents().items():
+            for input_file in files:
+                if not same_constant(constants, name, self.entries[input_file]["constants"][name]):
+                    stale.add(input_file)
+        return sorted(stale)
+
+    def save(self):
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as file:
+            json.dump({"version": TRANSLATOR_VERSION, "entries": self.entries}, file, indent=1)
+        os.replace(tmp_file, self.path)
+
+
+def same_constant(constants, name, value):
+    """Совпадает ли общая константа с сохранённым значением (1 и 1.0 переводятся по-разному)."""
+    return name in constants and type(constants[name]) is type(value) and constants[name] == value
+
+
+def file_stat(path):
+    info = os.stat(path)
+    return [info.st_size, info.st_mtime_ns]
+
+
+def file_digest(path):
+    """Хеш SHA-256 содержимого файла."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def check_entry(entry, input_file, output_file, constants):
+    """
+    Проверяет запись кеша. Возвращает запись (с обновлённым stat входа, если
+    изменилось только оно) или None, если файл нужно перевести.
+    """
+    if entry is None or entry["version"] != TRANSLATOR_VERSION or entry["output"] != output_file:
+        return None
+    for name, value in entry["constants"].items():
+        if not same_constant(constants, name, value):
+            return None
     try:
-        translator.translate()
+        if file_stat(output_file) != entry["output_stat"]:
+            return None  # Выход удалён или изменён
+        stat = file_stat(input_file)
+    except OSError:
+        return None
+    if stat == entry["stat"]:
+        return entry
+    if file_digest(input_file) != entry["hash"]:
+        return None
+    return dict(entry, stat=stat)
+
+
+# Общие константы процесса-исполнителя: передаются один раз при запуске процесса
+_shared_constants = {}
+
+
+def _init_worker(constants):
+    global _shared_constants
+    _shared_constants = constants
+
+
+def _translate_file(input_file, output_file, stream=False, entry=None, use_cache=False):
+    """
+    Переводит один файл пакета; ошибка возвращается, а не выбрасывается.
+    С кешем неизменённый файл пропускается, а для переведённого
+    возвращается новая запись кеша.
+    """
+    result = {"input": input_file, "output": output_file, "error": None, "skipped": False, "entry": None}
+    try:
+        if use_cache:
+            fresh = check_entry(entry, input_file, output_file, _shared_constants)
+            if fresh is not None:
+                result["skipped"] = True
+                result["entry"] = fresh
+                return result
+            stat, digest = file_stat(input_file), file_digest(input_file)
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        translator = ConfigTranslator(input_file, output_file, _shared_constants)
+        if stream:
+            translator.translate_stream()
+        else:
+            translator.translate()
+        if use_cache:
+            result["entry"] = {
+                "version": TRANSLATOR_VERSION,
+                "hash": digest,
+                "stat": stat,
+                "output": output_file,
+                "output_stat": file_stat(output_file),
+                "constants": translator.dependencies,
+            }
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def output_conflicts(tasks):
+    """
+    Ошибки для пар (вход, выход), у которых выходной файл совпадает с выходом
+    другого входа (d1/c.yaml и d2/c.yaml в одном --output-dir, e.yaml и e.yml):
+    номер пары -> текст ошибки. Такие файлы не переводятся вовсе, иначе один
+    выход молча перезаписал бы другой, а процессы пула писали бы в один .tmp.
+    """
+    claims = {}
+    for number, (input_file, output_file) in enumerate(tasks):
+        claims.setdefault(os.path.normcase(os.path.abspath(output_file)), []).append(number)
+    errors = {}
+    for numbers in claims.values():
+        if len(numbers) > 1:
+            for number in numbers:
+                others = ", ".join(tasks[other][0] for other in numbers if other != number)
+                errors[number] = f"Output conflict: {tasks[number][1]} is also the output of {others}"
+    return errors
+
+
+def translate_files(tasks, jobs=1, constants=None, stream=False, cache=None):
+    """
+    Переводит пары (вход, выход) в пуле из jobs процессов. Ошибка в одном
+    файле не прерывает остальные; файлы с общим выходом (output_conflicts)
+    считаются ошибками. Возвращает результаты в порядке tasks:
+    {"input", "output", "error", "skipped", "entry"}. Кеш обновляется и сохраняется.
+    """
+    use_cache = cache is not None
+    conflicts = output_conflicts(tasks)
+    runnable = [task for number, task in enumerate(tasks) if number not in conflicts]
+    entries = [cache.get(input_file) if use_cache else None for input_file, _ in runnable]
+    if jobs <= 1 or len(runnable) <= 1:
+        _init_worker(constants or {})
+        translated = [_translate_file(input_file, output_file, stream, entry, use_cache)
+                      for (input_file, output_file), entry in zip(runnable, entries)]
+    else:
+        chunk_size = max(1, len(runnable) // (jobs * 8))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(constants or {},)) as pool:
+            inputs, outputs = zip(*runnable)
+            translated = list(pool.map(_translate_file, inputs, outputs, [stream] * len(runnable), entries,
+                                       [use_cache] * len(runnable), chunksize=chunk_size))
+    translated = iter(translated)
+    results = []
+    for number, (input_file, output_file) in enumerate(tasks):
+        if number in conflicts:
+            results.append({"input": input_file, "output": output_file, "error": conflicts[number],
+                            "skipped": False, "entry": None})
+        else:
+            results.append(next(translated))
+    if use_cache:
+        cache.update(results)
+        cache.save()
+    return results
+
+
+def translate_batch(inputs, output_dir=None, jobs=1, constants=None, stream=False, cache=None):
+    """Переводит входные файлы collect_inputs; выходные пути — по output_path."""
+    tasks = [(path, output_path(path, relative, output_dir)) for path, relative in inputs]
+    return translate_files(tasks, jobs, constants, stream, cache)
+
+
+def format_summary(results):
+    """Итог пакетного перевода: число переведённых и неизменённых файлов и список ошибок."""
+    failures = [(result["input"], result["error"]) for result in results if result["error"] is not None]
+    skipped = sum(1 for result in results if result["skipped"])
+    lines = [f"Translated: {len(results) - len(failures) - skipped}, unchanged: {skipped}, failed: {len(failures)}"]
+    lines += [f"  {input_file}: {error}" for input_file, error in failures]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    args = ConfigTranslator.parse_args(argv)
+    try:
+        constants = load_constants(args.constants) if args.constants else {}
     except Exception as e:
         print(f"Error: {e}")
+        return 1
+    cache = TranslationCache(args.cache) if args.cache else None
+    if args.batch is None:
+        results = translate_files([(args.input, args.output)], 1, constants, args.stream, cache)
+        if results[0]["error"] is not None:
+            print(f"Error: {results[0]['error']}")
+            return 1
+        if results[0]["skipped"]:
+            print(f"Up to date: {args.output}")
+        return 0
+
+    inputs = collect_inputs(args.batch)
+    if not inputs:
+        print("Error: no input files found")
+        return 1
+    if cache is not None:
+        stale = cache.invalidated(constants)
+        if stale:
+            print(f"Changed constants invalidate {len(stale)} file(s)")
+    results = translate_batch(inputs, args.output_dir, args.jobs, constants, args.stream, cache)
+    print(format_summary(results))
+    return 1 if any(result["error"] is not None for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,12 @@
+import importlib.util
 import unittest
 import tempfile
+from unittest.mock import patch
 import os
+import tracemalloc
+import yaml
+import config_translator
+from config_parser import ConfigSyntaxError, load_config, main as parser_main, parse_config
 from config_translator import ConfigTranslator
 
 
@@ -126,6 +132,360 @@ nested is {
 }"""
         self.assertEqual(output.strip(), expected_output.strip())
 
+    def translate_both(self, content):
+        """Переводит вход обычным и потоковым способом, возвращает оба результата."""
+        self.write_input(content)
+        results = []
+        for method in ("translate", "translate_stream"):
+            translator = ConfigTranslator(self.input_file.name, self.output_file.name)
+            getattr(translator, method)()
+            results.append(self.read_output())
+        return results
+
+    def test_stream_matches_translate(self):
+        """Потоковый режим даёт тот же результат, что и обычный."""
+        full, streamed = self.translate_both("""
+constant: 5
+top_ref: "^constant"
+flag: true
+empty_list: []
+empty_dict: {}
+nested:
+  array:
+    - "^constant"
+    - {inner: 1.5, deep: [a, b]}
+  dict: &shared
+    key: "^constant"
+    other: [1, [2, 3]]
+copy: *shared
+        """)
+        self.assertEqual(streamed, full)
+        self.assertIn("copy is {\n    key = 5,", streamed)
+
+    def test_stream_errors(self):
+        """Ошибки потокового режима; выходной файл при ошибке не создаётся."""
+        os.unlink(self.output_file.name)
+        cases = {
+            "reference: \"^undefined_constant\"\n": "Undefined constant",
+            "bad:\n  invalid-name: 1\n": "Invalid name",
+            "dup:\n  a: 1\n  a: 2\n": "Duplicate key",
+            "base: &b {x: 1}\nmerged:\n  <<: *b\n": "Merge keys",
+            "- 1\n": "must be a mapping",
+            "value: null\n": "Unsupported value type",
+        }
+        for content, message in cases.items():
+            with open(self.input_file.name, "w", encoding="utf-8") as file:
+                file.write(content)
+            translator = ConfigTranslator(self.input_file.name, self.output_file.name)
+            with self.assertRaises(ValueError) as context:
+                translator.translate_stream()
+            self.assertIn(message, str(context.exception))
+            self.assertFalse(os.path.exists(self.output_file.name))
+            self.assertFalse(os.path.exists(self.output_file.name + ".tmp"))
+        open(self.output_file.name, "w").close()
+
+    def test_stream_memory(self):
+        """Пик памяти потокового режима не растёт вместе с документом."""
+        self.write_input("c: 1\n" + "".join(
+            f"service_{k}:\n  ports: [80, {k}]\n  env:\n    level: {k}\n    ref: ^c\n" for k in range(500)))
+        peaks = []
+        for method in ("translate", "translate_stream"):
+            translator = ConfigTranslator(self.input_file.name, self.output_file.name)
+            tracemalloc.start()
+            getattr(translator, method)()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self.assertLess(peaks[1] * 10, peaks[0])
+
+
+class TestBatchTranslation(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp_dir.name, "configs")
+        self.files = {
+            "db.yaml": "port: ^base_port\nhost: localhost\n",
+            "nested/web.yml": "local: 3\nworkers: ^local\ntimeout: ^timeout\n",
+            "broken.yaml": "invalid-name: 1\n",
+            "leak.yaml": "uses_local: ^local\n",
+            "notes.txt": "not yaml",
+        }
+        for name, content in self.files.items():
+            path = os.path.join(self.source, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(content)
+        self.constants_file = os.path.join(self.tmp_dir.name, "constants.yaml")
+        with open(self.constants_file, "w", encoding="utf-8") as file:
+            file.write("base_port: 8000\ntimeout: 2.5\n")
+        self.output_dir = os.path.join(self.tmp_dir.name, "out")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read(self, *parts):
+        with open(os.path.join(self.output_dir, *parts), "r", encoding="utf-8") as file:
+            return file.read()
+
+    def test_collect_inputs(self):
+        inputs = config_translator.collect_inputs([self.source, os.path.join(self.source, "*.yaml")])
+        self.assertEqual([relative for _, relative in inputs],
+                         ["broken.yaml", "db.yaml", "leak.yaml", os.path.join("nested", "web.yml")])
+
+    def test_batch_in_pool(self):
+        """Ошибки собираются в итог, остальные файлы переводятся; общие константы видны всем файлам."""
+        inputs = config_translator.collect_inputs([self.source])
+        constants = config_translator.load_constants(self.constants_file)
+        for jobs in (1, 2):
+            results = config_translator.translate_batch(inputs, self.output_dir, jobs, constants)
+            errors = {os.path.basename(result["input"]): result["error"] for result in results if result["error"]}
+            self.assertEqual(sorted(errors), ["broken.yaml", "leak.yaml"])
+            self.assertIn("Invalid name", errors["broken.yaml"])
+            # Константа local из web.yml не видна в других файлах
+            self.assertIn("Undefined constant: local", errors["leak.yaml"])
+            self.assertEqual(self.read("db_translated.txt"), "port is 8000\nhost is localhost")
+            self.assertEqual(self.read("nested", "web_translated.txt"), "local is 3\nworkers is 3\ntimeout is 2.5")
+            self.assertFalse(os.path.exists(os.path.join(self.output_dir, "broken_translated.txt")))
+            self.assertEqual([name for name in os.listdir(self.output_dir) if name.endswith(".tmp")], [])
+        summary = config_translator.format_summary(results)
+        self.assertTrue(summary.startswith("Translated: 2, unchanged: 0, failed: 2"))
+
+    def test_cli(self):
+        with patch("builtins.print") as mock_print:
+            code = config_translator.main(["--batch", os.path.join(self.source, "*.yaml"), "--constants",
+                                           self.constants_file, "--jobs", "2", "--stream"])
+        self.assertEqual(code, 1)
+        self.assertIn("Translated: 1, unchanged: 0, failed: 2", mock_print.call_args.args[0])
+        with open(os.path.join(self.source, "db_translated.txt"), encoding="utf-8") as file:
+            self.assertEqual(file.read(), "port is 8000\nhost is localhost")
+
+    def test_output_conflicts(self):
+        """Файлы с одинаковым выходным путём не перезаписывают друг друга, а попадают в ошибки."""
+        for name in ("d1/c.yaml", "d2/c.yaml", "d2/e.yaml", "d2/e.yml"):
+            path = os.path.join(self.tmp_dir.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(f"source: {name.replace('/', '_').replace('.', '_')}\n")
+        with open(os.path.join(self.tmp_dir.name, "d1", "ok.yaml"), "w", encoding="utf-8") as file:
+            file.write("ok: 1\n")
+        for jobs in ("1", "2"):
+            with patch("builtins.print") as mock_print:
+                code = config_translator.main(["-b", os.path.join(self.tmp_dir.name, "d1", "*.yaml"),
+                                               os.path.join(self.tmp_dir.name, "d2", "*.y*ml"),
+                                               "--output-dir", self.output_dir, "--jobs", jobs])
+            self.assertEqual(code, 1)
+            summary = mock_print.call_args.args[0]
+            self.assertIn("failed: 4", summary)
+            self.assertEqual(summary.count("Output conflict"), 4)
+            self.assertEqual(os.listdir(self.output_dir), ["ok_translated.txt"])
+
+    def test_invalid_constants_file(self):
+        with open(self.constants_file, "w", encoding="utf-8") as file:
+            file.write("name: text\n")
+        with self.assertRaises(ValueError):
+            config_translator.load_constants(self.constants_file)
+
+
+class TestTranslationCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp_dir.name, "configs")
+        os.makedirs(self.source)
+        self.write("a.yaml", "port: ^base_port\n")
+        self.write("b.yaml", "timeout: ^timeout\nlocal: 1\nuse_local: ^local\n")
+        self.write("c.yaml", "name: plain\n")
+        self.cache_file = os.path.join(self.tmp_dir.name, "cache.json")
+        self.constants = {"base_port": 8000, "timeout": 2.5}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, content):
+        with open(os.path.join(self.source, name), "w", encoding="utf-8") as file:
+            file.write(content)
+
+    def run_batch(self, jobs=1):
+        cache = config_translator.TranslationCache(self.cache_file)
+        results = config_translator.translate_batch(config_translator.collect_inputs([self.source]), None, jobs,
+                                                    self.constants, cache=cache)
+        self.assertEqual([result["error"] for result in results], [None] * 3)
+        return {os.path.basename(result["input"]): result["skipped"] for result in results}
+
+    def test_unchanged_files_are_skipped(self):
+        self.assertEqual(self.run_batch(), {"a.yaml": False, "b.yaml": False, "c.yaml": False})
+        output = os.path.join(self.source, "a_translated.txt")
+        stat = os.stat(output)
+        with patch.object(ConfigTranslator, "translate", side_effect=AssertionError("перевод не нужен")):
+            self.assertEqual(self.run_batch(jobs=2), {"a.yaml": True, "b.yaml": True, "c.yaml": True})
+        self.assertEqual(os.stat(output).st_mtime_ns, stat.st_mtime_ns)
+
+        # Изменилось только время изменения: файл не переводится, но хеш проверяется
+        os.utime(os.path.join(self.source, "c.yaml"), ns=(1, 1))
+        with patch.object(ConfigTranslator, "translate", side_effect=AssertionError("перевод не нужен")):
+            self.assertTrue(self.run_batch()["c.yaml"])
+
+        self.write("c.yaml", "name: changed\n")
+        os.remove(os.path.join(self.source, "a_translated.txt"))
+        self.assertEqual(self.run_batch(), {"a.yaml": False, "b.yaml": True, "c.yaml": False})
+
+    def test_constant_changes_invalidate_dependents(self):
+        self.run_batch()
+        cache = config_translator.TranslationCache(self.cache_file)
+        graph = {name: [os.path.basename(path) for path in files] for name, files in cache.dependents().items()}
+        # local определена в самом файле и не считается зависимостью
+        self.assertEqual(graph, {"base_port": ["a.yaml"], "timeout": ["b.yaml"]})
+
+        self.constants["timeout"] = 3
+        self.assertEqual([os.path.basename(path) for path in cache.invalidated(self.constants)], ["b.yaml"])
+        self.assertEqual(self.run_batch(), {"a.yaml": True, "b.yaml": False, "c.yaml": True})
+        with open(os.path.join(self.source, "b_translated.txt"), encoding="utf-8") as file:
+            self.assertEqual(file.read(), "timeout is 3\nlocal is 1\nuse_local is 1")
+
+    def test_version_change_invalidates_cache(self):
+        self.run_batch()
+        with patch.object(config_translator, "TRANSLATOR_VERSION", config_translator.TRANSLATOR_VERSION + 1):
+            self.assertEqual(self.run_batch(), {"a.yaml": False, "b.yaml": False, "c.yaml": False})
+
+    def test_cli_single_file(self):
+        input_file = os.path.join(self.source, "c.yaml")
+        output_file = os.path.join(self.tmp_dir.name, "c.txt")
+        argv = ["-i", input_file, "-o", output_file, "--cache", self.cache_file]
+        with patch("builtins.print") as mock_print:
+            self.assertEqual(config_translator.main(argv), 0)
+            mock_print.assert_not_called()
+            self.assertEqual(config_translator.main(argv), 0)
+        mock_print.assert_called_once_with(f"Up to date: {output_file}")
+
+
+class TestFastPath(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.tmp_dir.name, "input.yaml")
+        self.output_file = os.path.join(self.tmp_dir.name, "output.txt")
+        with open(self.input_file, "w", encoding="utf-8") as file:
+            yaml.safe_dump({"base": 7, **{f"item_{i}": {"name": f"n{i}", "port": i, "ref": "^base", "flags": [True, 1.5]}
+                                          for i in range(50)}}, file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def translate(self, loader):
+        translator = ConfigTranslator(self.input_file, self.output_file)
+        translator.loader = loader
+        translator.translate()
+        with open(self.output_file, encoding="utf-8") as file:
+            return file.read()
+
+    def test_default_loader(self):
+        expected = yaml.CSafeLoader if yaml.__with_libyaml__ else yaml.SafeLoader
+        self.assertIs(ConfigTranslator.loader, expected)
+
+    def test_fallback_without_libyaml(self):
+        """Без libyaml модуль использует чисто питоновский SafeLoader."""
+        spec = importlib.util.spec_from_file_location("config_translator_fallback", config_translator.__file__)
+        module = importlib.util.module_from_spec(spec)
+        with patch.dict(yaml.__dict__):
+            yaml.__dict__.pop("CSafeLoader", None)
+            spec.loader.exec_module(module)
+        self.assertIs(module.ConfigTranslator.loader, yaml.SafeLoader)
+
+    @unittest.skipUnless(yaml.__with_libyaml__, "PyYAML собран без libyaml")
+    def test_loaders_agree(self):
+        self.assertEqual(self.translate(yaml.CSafeLoader), self.translate(yaml.SafeLoader))
+
+    def test_names_are_memoized(self):
+        config_translator.is_valid_name.cache_clear()
+        self.translate(ConfigTranslator.loader)
+        info = config_translator.is_valid_name.cache_info()
+        # 51 ключ верхнего уровня и 4 повторяющихся вложенных ключа
+        self.assertEqual(info.misses, 55)
+        self.assertEqual(info.hits, 50 * 4 - 4)
+        translator = ConfigTranslator(self.input_file, self.output_file)
+        for name in ("valid_1", "_x", "A"):
+            translator.validate_name(name)
+        for name in ("1abc", "with-dash", ""):
+            with self.assertRaises(ValueError):
+                translator.validate_name(name)
+
+
+class TestConfigParser(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.base = os.path.dirname(os.path.abspath(__file__))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def translate(self, data):
+        return ConfigTranslator(None, None).translate_data(data)
+
+    def test_sample_files_round_trip(self):
+        """Разобранные файлы переводятся обратно в тот же текст."""
+        for name in ("db_config_translated.txt", "network_config_translated.txt"):
+            path = os.path.join(self.base, name)
+            with open(path, encoding="utf-8") as file:
+                text = file.read()
+            self.assertEqual(self.translate(load_config(path)), text)
+        self.assertEqual(load_config(os.path.join(self.base, "network_config_translated.txt")),
+                         {"subnets": ["192.168.1.0/24", "192.168.2.0/24"],
+                          "firewall": {"rules": {"allow": [80, 443], "deny": [23]}}})
+
+    def test_structures_round_trip(self):
+        data = {
+            "name": "example service",
+            "port": 8080,
+            "ratio": -2.5e-10,
+            "big": 1e+20,
+            "debug": False,
+            "empty_list": [],
+            "empty_dict": {},
+            "items": [{"x": 1, "y": []}, {}, "two words", [1, [2, 3]]],
+            "nested": {"a": {"b": {"c": ["d", {"e": 1.5}]}}},
+            "title": "hello, world (x) {y}",
+        }
+        self.assertEqual(parse_config(self.translate(data)), data)
+
+    def test_yaml_round_trip(self):
+        """YAML -> конфигурационный язык -> данные совпадают с safe_load, ссылки на константы подставлены."""
+        content = "port: 5432\nhosts:\n  - a\n  - b\nlimits:\n  timeout: 2.5\n  port: ^port\n"
+        path = os.path.join(self.tmp_dir.name, "input.yaml")
+        output = os.path.join(self.tmp_dir.name, "output.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        ConfigTranslator(path, output).translate()
+        self.assertEqual(load_config(output), {"port": 5432, "hosts": ["a", "b"],
+                                               "limits": {"timeout": 2.5, "port": 5432}})
+
+    def test_error_positions(self):
+        cases = {
+            "a is 1\nb = 2": (2, 3, "expected 'is' after name"),
+            "a is 1\n1b is 2": (2, 1, "Invalid name: 1b"),
+            "a is 1\na is 2": (2, 1, "Duplicate name: a"),
+            "a is {\n    b 1\n}": (2, 7, "expected '=' after name"),
+            "a is ( 1 } )": (1, 10, "expected ',' or ')'"),
+            "a is ( 1, 2 ) x": (1, 15, "expected end of line after value"),
+            "a is {\n    b = ( 1, 2\n": (3, 1, "unclosed '(' opened at line 2, column 9"),
+        }
+        for text, (line, column, message) in cases.items():
+            with self.subTest(text=text):
+                with self.assertRaises(ConfigSyntaxError) as error:
+                    parse_config(text, "config.txt")
+                self.assertEqual((error.exception.line, error.exception.column), (line, column))
+                self.assertEqual(error.exception.message, message)
+                self.assertEqual(str(error.exception), f"config.txt:{line}:{column}: {message}")
+                self.assertIsInstance(error.exception, ValueError)
+
+    def test_cli(self):
+        output = os.path.join(self.tmp_dir.name, "db_config.yaml")
+        self.assertEqual(parser_main([os.path.join(self.base, "db_config_translated.txt"), "-o", output]), 0)
+        with open(output, encoding="utf-8") as file, open(os.path.join(self.base, "db_config.yaml")) as original:
+            self.assertEqual(yaml.safe_load(file), yaml.safe_load(original))
+        broken = os.path.join(self.tmp_dir.name, "broken.txt")
+        with open(broken, "w", encoding="utf-8") as file:
+            file.write("a is ( 1")
+        with patch("builtins.print") as printed:
+            self.assertEqual(parser_main([broken]), 1)
+        self.assertIn("unclosed '('", printed.call_args[0][0])
+
 
 if __name__ == "__main__":
     unittest.main()